@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai des générateurs de rapports (PDF et Excel) de server.py
+
+Alimente chaque générateur avec des cadets, inspections et présences synthétiques
+à plusieurs échelles et mesure le temps, le pic mémoire et la taille produite.
+Les résultats peuvent être comparés à une référence enregistrée pour signaler
+les régressions.
+
+Les PDF sont mesurés via les fonctions render_* (le travail exécuté dans le pool
+de rendu), appelées dans ce processus pour que tracemalloc voie les allocations.
+
+La feuille d'inspection est aussi mesurée de bout en bout par
+generate_inspection_sheet_pdf: envoi au pool (run_report_render), rendu parallèle
+par section au-delà de INSPECTION_SHEET_PARALLEL_MIN_CADETS, fusion pypdf et
+numérotation. Le pool est démarré avant les mesures; pour ce générateur, le pic
+mémoire ne couvre que ce processus (pas les processus de rendu).
+
+Exemples:
+    python benchmark_reports.py
+    python benchmark_reports.py --scales 50 500 --repeat 3
+    python benchmark_reports.py --save-baseline
+    python benchmark_reports.py --tolerance 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+sys.path.append(str(ROOT_DIR))
+
+# server.py exige ces variables à l'import; aucune connexion n'est ouverte par le banc
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'benchmark_reports')
+
+import server  # noqa: E402
+
+DEFAULT_SCALES = [50, 500, 5000]
+POOL_BENCHMARKS = {"generate_inspection_sheet_pdf"}
+
+# Une seule boucle pour toutes les mesures: le sémaphore du pool de rendu
+# (server.report_render_semaphore) reste lié à la boucle où il a attendu
+loop = asyncio.new_event_loop()
+
+def run_async(coroutine):
+    return loop.run_until_complete(coroutine)
+DEFAULT_BASELINE = ROOT_DIR / "benchmark_reports_baseline.json"
+
+NOMS = ["Tremblay", "Gagnon", "Roy", "Côté", "Bouchard", "Gauthier", "Morin", "Lavoie", "Fortin", "Gagné"]
+PRENOMS = ["Émile", "Léa", "Noah", "Florence", "William", "Alice", "Thomas", "Zoé", "Jacob", "Béatrice"]
+GRADES = ["cadet", "cadet_air", "caporal", "caporal_section", "sergent", "sergent_section", "adjudant_2e_classe"]
+UNIFORM_TYPES = ["C1 - Tenue de Parade", "C5 - Tenue d'Entraînement"]
+CRITERIA = [
+    "Port de la coiffure", "Boutons et insignes", "Pli du pantalon", "Cirage des bottes",
+    "Ceinture", "Chemise repassée", "Cheveux réglementaires", "Propreté générale"
+]
+COMMENTS = ["", "", "", "Bottes à recirer", "Excellente tenue", "Insignes mal placés, à corriger avant la parade"]
+
+# ============================================================================
+# DONNÉES SYNTHÉTIQUES
+# ============================================================================
+
+def make_sections(count: int) -> list:
+    return [{"id": str(uuid.uuid4()), "nom": f"Section {i + 1}"} for i in range(count)]
+
+def make_cadets(count: int, sections: list, rng: random.Random) -> list:
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "nom": f"{rng.choice(NOMS)}{i}",
+            "prenom": rng.choice(PRENOMS),
+            "grade": rng.choice(GRADES),
+            "role": "cadet",
+            "section_id": rng.choice(sections)["id"],
+            "actif": True
+        }
+        for i in range(count)
+    ]
+
+def make_inspections(count: int, cadets: list, sections: list, rng: random.Random) -> list:
+    """Inspections enrichies (format consommé par l'export Excel)"""
+    section_map = {s["id"]: s["nom"] for s in sections}
+    start = date.today() - timedelta(days=365)
+    inspections = []
+    for _ in range(count):
+        cadet = rng.choice(cadets)
+        criteria_scores = {c: rng.randint(0, 4) for c in CRITERIA}
+        total_score = sum(criteria_scores.values()) / (len(CRITERIA) * 4) * 100
+        inspections.append({
+            "date": (start + timedelta(days=rng.randint(0, 365))).isoformat(),
+            "cadet_id": cadet["id"],
+            "cadet_nom": cadet["nom"],
+            "cadet_prenom": cadet["prenom"],
+            "section_id": cadet["section_id"],
+            "section_nom": section_map[cadet["section_id"]],
+            "uniform_type": rng.choice(UNIFORM_TYPES),
+            "criteria_scores": criteria_scores,
+            "total_score": round(total_score, 1),
+            "max_score": 100,
+            "inspector_name": f"{rng.choice(PRENOMS)} {rng.choice(NOMS)}",
+            "commentaire": rng.choice(COMMENTS)
+        })
+    return inspections
+
+def make_stats(inspections: list) -> dict:
+    """Statistiques au format produit par aggregate_inspection_stats"""
+    scores = [i["total_score"] for i in inspections]
+
+    by_date, by_section, by_cadet = {}, {}, {}
+    for insp in inspections:
+        by_date.setdefault(insp["date"], []).append(insp["total_score"])
+        by_section.setdefault(insp["section_nom"], []).append(insp)
+        by_cadet.setdefault(insp["cadet_id"], []).append(insp)
+
+    cadets = []
+    for cadet_inspections in by_cadet.values():
+        first = cadet_inspections[0]
+        criteria_totals = {}
+        for insp in cadet_inspections:
+            for criterion, score in insp["criteria_scores"].items():
+                criteria_totals.setdefault(criterion, []).append(score)
+        cadets.append({
+            "nom": first["cadet_nom"],
+            "prenom": first["cadet_prenom"],
+            "section_name": first["section_nom"],
+            "average_score": sum(i["total_score"] for i in cadet_inspections) / len(cadet_inspections),
+            "inspection_count": len(cadet_inspections),
+            "weak_criteria": [
+                {"criterion": criterion, "average_percent": sum(values) / len(values) / 4 * 100}
+                for criterion, values in sorted(criteria_totals.items())
+                if sum(values) / len(values) < 2
+            ]
+        })
+
+    return {
+        "total_inspections": len(inspections),
+        "squadron_average": sum(scores) / len(scores),
+        "best_score": max(scores),
+        "worst_score": min(scores),
+        "cadets_inspected": len(by_cadet),
+        "daily_series": [
+            {"date": d, "average": sum(v) / len(v)} for d, v in sorted(by_date.items())
+        ],
+        "recent_comments": sorted(
+            [i for i in inspections if i["commentaire"]], key=lambda x: x["date"], reverse=True
+        )[:15],
+        "by_section": [
+            {
+                "section_name": name,
+                "total_inspections": len(items),
+                "average_score": sum(i["total_score"] for i in items) / len(items),
+                "cadets_count": len({i["cadet_id"] for i in items})
+            }
+            for name, items in sorted(by_section.items())
+        ],
+        "cadets_needing_attention": sorted(
+            [c for c in cadets if c["average_score"] < 60], key=lambda x: x["average_score"]
+        ),
+        "top_cadets": sorted(cadets, key=lambda x: x["average_score"], reverse=True)[:10]
+    }
+
+def make_presence_stats(count: int, rng: random.Random) -> dict:
+    statuses = [rng.choice(["present", "present", "present", "absent", "justified_absent", "sick"]) for _ in range(count)]
+    present = statuses.count("present")
+    return {
+        "total": count,
+        "present": present,
+        "absent": statuses.count("absent"),
+        "justified": statuses.count("justified_absent"),
+        "sick": statuses.count("sick"),
+        "rate": present / count * 100 if count else 0
+    }
+
+# ============================================================================
+# MESURES
+# ============================================================================
+
+def output_size(result) -> int:
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    result.seek(0, os.SEEK_END)
+    size = result.tell()
+    result.close()
+    return size
+
+def measure(func, repeat: int) -> dict:
+    """Meilleur temps sur `repeat` exécutions, pic mémoire mesuré par tracemalloc"""
+    best_time = None
+    peak = 0
+    size = 0
+    for _ in range(repeat):
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        _, run_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        size = output_size(result)
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+        peak = max(peak, run_peak)
+    return {"wall_time_s": round(best_time, 4), "peak_memory_kb": round(peak / 1024, 1), "output_kb": round(size / 1024, 1)}
+
+def warm_up_render_pool():
+    """Démarre les processus de rendu (spawn + import de server.py) hors des mesures"""
+    run_async(asyncio.gather(*[
+        server.run_report_render(server.report_payload, []) for _ in range(server.REPORT_RENDER_WORKERS)
+    ]))
+
+def build_benchmarks(scale: int, rng: random.Random) -> dict:
+    # 25 cadets par section: au-delà de INSPECTION_SHEET_PARALLEL_MIN_CADETS,
+    # la feuille d'inspection est rendue en plusieurs parties puis fusionnée
+    sections = make_sections(max(1, scale // 25))
+    cadets = make_cadets(scale, sections, rng)
+    inspections = make_inspections(scale, cadets, sections, rng)
+    stats = make_stats(inspections)
+    period_info = "Période: synthétique"
+
+    cadet = cadets[0]
+    cadet_inspections = sorted(
+        make_inspections(scale, [cadet], sections, rng), key=lambda x: x["date"], reverse=True
+    )
+    inspection_stats = {
+        "total": len(cadet_inspections),
+        "average": sum(i["total_score"] for i in cadet_inspections) / len(cadet_inspections),
+        "best": max(i["total_score"] for i in cadet_inspections),
+        "worst": min(i["total_score"] for i in cadet_inspections)
+    }
+
+    return {
+        "generate_cadets_list_pdf": lambda: server.render_cadets_list_pdf(cadets, sections, "Tous les cadets"),
+        "render_inspection_sheet_pdf": lambda: server.render_inspection_sheet_pdf(
+            cadets, UNIFORM_TYPES[0], CRITERIA, sections
+        ),
+        "generate_inspection_sheet_pdf": lambda: run_async(server.generate_inspection_sheet_pdf(
+            cadets, UNIFORM_TYPES[0], CRITERIA, sections
+        )),
+        "generate_inspection_stats_pdf": lambda: server.render_inspection_stats_pdf(stats, period_info, sections),
+        "generate_inspection_stats_excel": lambda: run_async(
+            server.generate_inspection_stats_excel(inspections, period_info)
+        ),
+        "generate_cadet_individual_pdf": lambda: server.render_cadet_individual_pdf(
+            cadet, sections[0]["nom"], cadet_inspections, make_presence_stats(scale, rng), inspection_stats
+        ),
+    }
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    """Retourne la liste des régressions (temps ou mémoire au-delà de la tolérance)"""
+    regressions = []
+    for scale, generators in results.items():
+        for name, metrics in generators.items():
+            reference = baseline.get(scale, {}).get(name)
+            if not reference:
+                continue
+            for metric in ("wall_time_s", "peak_memory_kb"):
+                limit = reference[metric] * (1 + tolerance)
+                if metrics[metric] > limit:
+                    regressions.append(
+                        f"{name} @ {scale}: {metric} {metrics[metric]} > {reference[metric]} (+{tolerance:.0%})"
+                    )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des générateurs de rapports")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Nombre de lignes synthétiques par échelle")
+    parser.add_argument("--repeat", type=int, default=1, help="Exécutions par mesure (meilleur temps retenu)")
+    parser.add_argument("--only", nargs="+", help="Limiter à certains générateurs")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Fichier de référence JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Marge tolérée avant régression (0.25 = 25%%)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = {}
+
+    if not args.only or POOL_BENCHMARKS.intersection(args.only):
+        warm_up_render_pool()
+
+    print(f"📊 Banc d'essai des rapports - échelles: {', '.join(map(str, args.scales))}")
+    print(f"{'Générateur':<34} {'Échelle':>8} {'Temps (s)':>10} {'Pic mém. (Ko)':>14} {'Taille (Ko)':>12}")
+
+    try:
+        for scale in args.scales:
+            results[str(scale)] = {}
+            for name, func in build_benchmarks(scale, rng).items():
+                if args.only and name not in args.only:
+                    continue
+                metrics = measure(func, args.repeat)
+                results[str(scale)][name] = metrics
+                print(f"{name:<34} {scale:>8} {metrics['wall_time_s']:>10.3f} "
+                      f"{metrics['peak_memory_kb']:>14.1f} {metrics['output_kb']:>12.1f}")
+    finally:
+        server.shutdown_report_render_executor()
+        loop.close()
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False))
+        print(f"💾 Référence enregistrée dans {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print("ℹ️  Aucune référence trouvée (utiliser --save-baseline pour en créer une)")
+        return 0
+
+    regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+    if regressions:
+        print("❌ Régressions détectées:")
+        for regression in regressions:
+            print(f"   - {regression}")
+        return 1
+
+    print("✅ Aucune régression par rapport à la référence")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script pour ajouter les clés de nom normalisées (name_key, nom_key) aux utilisateurs existants
+Utilisées par l'import Excel et la recherche de cadets (index sur name_key et nom_key)
+
+Le serveur ajoute déjà les clés manquantes au démarrage; ce script vérifie en plus
+tous les utilisateurs et corrige les clés périmées (même calcul que server.py)
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Ajouter le répertoire backend au chemin
+sys.path.append(str(Path(__file__).parent))
+
+# server.py charge le fichier .env et ouvre la connexion à la base de données
+import server  # noqa: E402
+
+async def migrate_name_keys():
+    """Calcule name_key et nom_key pour tous les utilisateurs dont les clés manquent ou sont périmées"""
+    print("🚀 Début de la migration des clés de nom...")
+
+    updated = await server.backfill_name_keys(recompute=True)
+
+    await server.db.users.create_index("name_key")
+    await server.db.users.create_index("nom_key")
+
+    print(f"🎉 Migration terminée ! {updated} utilisateurs mis à jour")
+
+async def main():
+    try:
+        await migrate_name_keys()
+    except Exception as e:
+        print(f"❌ Erreur lors de la migration : {e}")
+    finally:
+        server.client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,24 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Response, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import InsertOne, UpdateOne, ReturnDocument, monitoring
+from pymongo.errors import DuplicateKeyError
 import os
+import contextvars
+import cProfile
+import pstats
+import json
+import hashlib
 import logging
+import asyncio
+import threading
+import bisect
+import heapq
+import itertools
+import time
 from pathlib import Path
 import re
 import secrets
@@ -13,22 +27,127 @@ from typing import List, Optional, Dict, Any
 import uuid
 import unicodedata
 from datetime import datetime, timedelta, date, timezone
+from dateutil.relativedelta import relativedelta
 from passlib.context import CryptContext
 import jwt
 from enum import Enum
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import io
+import csv
+import codecs
 from io import BytesIO
-from fastapi.responses import StreamingResponse
-import pandas as pd
+from collections import OrderedDict
+from fastapi.responses import StreamingResponse, JSONResponse
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Instrumentation des requêtes MongoDB (comptage par requête HTTP, détection des N+1)
+# Nombre de commandes de même forme au-delà duquel un avertissement N+1 est journalisé
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_N_PLUS_ONE_THRESHOLD', 10))
+QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', '1') == '1'
+
+class RequestQueryStats:
+    """Commandes MongoDB émises pendant une requête HTTP (mises à jour depuis les threads de Motor)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Dict[tuple, int] = {}
+
+    def record_started(self, shape: tuple) -> None:
+        with self.lock:
+            self.count += 1
+            self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def record_finished(self, duration: float) -> None:
+        with self.lock:
+            self.duration += duration
+
+# Motor copie le contexte vers ses threads: l'écouteur voit les stats de la requête en cours
+current_query_stats: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar(
+    "current_query_stats", default=None
+)
+
+def command_shape(event: monitoring.CommandStartedEvent) -> tuple:
+    """Forme d'une commande: nom, collection et champs filtrés (sans les valeurs)"""
+    command = event.command
+    # getMore porte l'identifiant du curseur à la place du nom de collection
+    collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+    query = command.get("filter") or command.get("query")
+    if query is None:
+        for field in ("updates", "deletes"):
+            statements = command.get(field)
+            if statements:
+                query = statements[0].get("q")
+                break
+    if query is None and "pipeline" in command:
+        return (event.command_name, collection, tuple(next(iter(stage), "") for stage in command["pipeline"]))
+    return (event.command_name, collection, tuple(sorted(query)) if isinstance(query, dict) else ())
+
+class QueryStatsListener(monitoring.CommandListener):
+    """Attribue chaque commande à la requête HTTP courante"""
+
+    def started(self, event):
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record_started(command_shape(event))
+
+    def succeeded(self, event):
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record_finished(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record_finished(event.duration_micros / 1_000_000)
+
+class QueryStatsMiddleware:
+    """Journalise le nombre de commandes et le temps MongoDB de chaque requête HTTP"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestQueryStats()
+        token = current_query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_stats.reset(token)
+            if stats.count:
+                route = scope.get("route")
+                route_label = getattr(route, "path_format", None) or "unmatched"
+                # Le chemin brut n'apparaît que dans les journaux: les séries de métriques restent bornées
+                path = getattr(route, "path_format", None) or scope.get("path", "")
+                metrics.inc("cadet_db_commands_total", stats.count, route=route_label)
+                metrics.inc("cadet_db_seconds_total", stats.duration, route=route_label)
+                logger.info(
+                    f"{scope.get('method', '')} {path}: {stats.count} requêtes MongoDB, "
+                    f"{stats.duration * 1000:.1f} ms"
+                )
+                for shape, count in stats.shapes.items():
+                    if count > QUERY_N_PLUS_ONE_THRESHOLD:
+                        command_name, collection, fields = shape
+                        logger.warning(
+                            f"N+1 probable sur {scope.get('method', '')} {path}: {count}x {command_name} "
+                            f"{collection} ({', '.join(fields) or 'sans filtre'})"
+                        )
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    event_listeners=[QueryStatsListener()] if QUERY_STATS_ENABLED else []
+)
 db = client[os.environ['DB_NAME']]
 
 # Fonctions utilitaires pour la gestion des usernames
@@ -41,6 +160,14 @@ def normalize_text(text: str) -> str:
     # Convertir en minuscules et supprimer les caractères non alphanumériques
     return re.sub(r'[^a-z0-9]', '', ascii_text.lower())
 
+def make_name_key(prenom: Optional[str], nom: Optional[str]) -> str:
+    """Clé de nom indexée (prenom.nom normalisés): insensible aux accents, traits d'union et espaces"""
+    return f"{normalize_text(prenom or '')}.{normalize_text(nom or '')}"
+
+def make_name_keys(prenom: Optional[str], nom: Optional[str]) -> Dict[str, str]:
+    """Clés de nom indexées d'un utilisateur: name_key (prenom.nom) et nom_key (nom seul)"""
+    return {"name_key": make_name_key(prenom, nom), "nom_key": normalize_text(nom or '')}
+
 def generate_base_username(prenom: str, nom: str) -> str:
     """Génère un username de base à partir du prénom et nom"""
     # Prendre la première lettre du prénom + nom complet
@@ -92,6 +219,143 @@ security = HTTPBearer()
 app = FastAPI(title="Gestion Escadron Cadets", version="1.0.0")
 api_router = APIRouter(prefix="/api")
 
+# ============================================================================
+# MÉTRIQUES (format texte Prometheus, exposées sur /api/metrics)
+# ============================================================================
+
+# Bornes (secondes) des histogrammes de latence
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class MetricsRegistry:
+    """
+    Compteurs et histogrammes en mémoire du processus
+    L'enregistrement se limite à quelques opérations sur des dictionnaires;
+    la mise en forme n'a lieu qu'au moment de la collecte
+    """
+
+    def __init__(self):
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, list] = {}
+        self.in_flight = 0
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            # [compte par borne..., compte total, somme]
+            histogram = self.histograms[key] = [0] * (len(METRICS_LATENCY_BUCKETS) + 2) + [0.0]
+        histogram[bisect.bisect_left(METRICS_LATENCY_BUCKETS, value)] += 1
+        histogram[-2] += 1
+        histogram[-1] += value
+
+metrics = MetricsRegistry()
+
+def escape_metric_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_metric_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_metric_label(value)}"' for name, value in labels) + "}"
+
+def render_metrics() -> str:
+    """Sérialise le registre (et les métriques de rendu des rapports) au format Prometheus"""
+    lines = [
+        "# TYPE cadet_http_requests_in_flight gauge",
+        f"cadet_http_requests_in_flight {metrics.in_flight}"
+    ]
+    
+    counter_names = sorted({name for name, _ in metrics.counters})
+    for counter_name in counter_names:
+        lines.append(f"# TYPE {counter_name} counter")
+        for (name, labels), value in sorted(metrics.counters.items()):
+            if name == counter_name:
+                lines.append(f"{name}{format_metric_labels(labels)} {value:g}")
+    
+    histogram_names = sorted({name for name, _ in metrics.histograms})
+    for histogram_name in histogram_names:
+        lines.append(f"# TYPE {histogram_name} histogram")
+        for (name, labels), histogram in sorted(metrics.histograms.items()):
+            if name != histogram_name:
+                continue
+            cumulative = 0
+            for bound, count in zip(METRICS_LATENCY_BUCKETS, histogram):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_metric_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{format_metric_labels(labels + (('le', '+Inf'),))} {histogram[-2]}")
+            lines.append(f"{name}_count{format_metric_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_sum{format_metric_labels(labels)} {histogram[-1]:.6f}")
+    
+    # Rendus de rapports: déjà agrégés par record_report_render
+    render_series = (
+        ("cadet_report_renders_total", "count", "counter"),
+        ("cadet_report_render_seconds_total", "render_time_total", "counter"),
+        ("cadet_report_render_queue_seconds_total", "queue_time_total", "counter"),
+        ("cadet_report_render_seconds_max", "render_time_max", "gauge"),
+        ("cadet_report_render_bytes_total", "bytes_total", "counter"),
+    )
+    for metric_name, field, metric_type in render_series:
+        if not report_render_metrics:
+            break
+        lines.append(f"# TYPE {metric_name} {metric_type}")
+        for report, values in sorted(report_render_metrics.items()):
+            lines.append(f"{metric_name}{format_metric_labels((('report', report),))} {values[field]:g}")
+    
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latence par route (gabarit de chemin, pas le chemin brut),
+    tailles des requêtes/réponses, codes de statut et requêtes en cours
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        request_size = 0
+        response_size = 0
+        status_code = 500
+        
+        async def counting_receive():
+            nonlocal request_size
+            message = await receive()
+            if message["type"] == "http.request":
+                request_size += len(message.get("body", b""))
+            return message
+        
+        async def counting_send(message):
+            nonlocal response_size, status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+        
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            # FastAPI place la route trouvée dans le scope
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            metrics.observe("cadet_http_request_duration_seconds", elapsed, method=method, route=path)
+            metrics.inc("cadet_http_requests_total", method=method, route=path, status=str(status_code))
+            metrics.inc("cadet_http_request_size_bytes_total", request_size, method=method, route=path)
+            metrics.inc("cadet_http_response_size_bytes_total", response_size, method=method, route=path)
+
 # Enums
 class UserRole(str, Enum):
     CADET = "cadet"
@@ -307,6 +571,7 @@ class Activity(BaseModel):
     # Pour les activités ponctuelles  
     planned_date: Optional[str] = None  # Format: YYYY-MM-DD
     
+    participant_count: int = 0  # Nombre de cadets distincts (dénormalisé)
     created_by: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
     active: bool = True
@@ -331,7 +596,8 @@ class ActivityResponse(BaseModel):
     description: Optional[str]
     type: ActivityType
     cadet_ids: List[str]
-    cadet_names: List[str]  # Noms complets des cadets
+    cadet_names: List[str]  # Noms complets des cadets (vide si include_names=false)
+    participant_count: int
     recurrence_interval: Optional[int]
     recurrence_unit: Optional[str]
     next_date: Optional[str]  # Format: YYYY-MM-DD
@@ -434,10 +700,20 @@ class ConsecutiveAbsenceCalculation(BaseModel):
     last_absence_date: Optional[date] = None
 # Password utilities
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        metrics.inc("cadet_bcrypt_calls_total", operation="verify")
+        metrics.inc("cadet_bcrypt_seconds_total", time.perf_counter() - started, operation="verify")
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.hash(password)
+    finally:
+        metrics.inc("cadet_bcrypt_calls_total", operation="hash")
+        metrics.inc("cadet_bcrypt_seconds_total", time.perf_counter() - started, operation="hash")
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -528,6 +804,110 @@ async def require_inspection_permissions(current_user: User = Depends(get_curren
         detail="Accès refusé. Permissions d'inspection requises (chefs de section et supérieurs)."
     )
 
+# Chargement groupé des utilisateurs et sections (portée: une requête HTTP)
+class RequestLoader:
+    """
+    Chargeur groupé style DataLoader pour les boucles d'enrichissement
+    - Collecte les IDs nécessaires, les résout avec une seule requête $in par collection
+    - Mémorise les résultats (y compris les absents) jusqu'à la fin de la requête
+    """
+    # Champs volumineux ou sensibles inutiles à l'enrichissement
+    PROJECTIONS = {
+        "users": {"_id": 0, "photo_base64": 0, "hashed_password": 0, "invitation_token": 0},
+        "sections": {"_id": 0},
+    }
+
+    def __init__(self):
+        self._cache: Dict[str, Dict[str, Optional[dict]]] = {name: {} for name in self.PROJECTIONS}
+        self._pending: Dict[str, set] = {name: set() for name in self.PROJECTIONS}
+
+    def prime(self, collection: str, ids) -> None:
+        """Enregistre des IDs à résoudre lors du prochain chargement"""
+        cache = self._cache[collection]
+        self._pending[collection].update(i for i in ids if i and i not in cache)
+
+    async def load_many(self, collection: str, ids) -> Dict[str, dict]:
+        """Retourne {id: document} pour les IDs trouvés (une requête pour tous les IDs manquants)"""
+        self.prime(collection, ids)
+        missing = self._pending[collection]
+        if missing:
+            self._pending[collection] = set()
+            cache = self._cache[collection]
+            docs = await db[collection].find(
+                {"id": {"$in": list(missing)}}, self.PROJECTIONS[collection]
+            ).to_list(None)
+            for doc in docs:
+                cache[doc["id"]] = doc
+            for missing_id in missing:
+                cache.setdefault(missing_id, None)
+        cache = self._cache[collection]
+        return {i: cache[i] for i in ids if i and cache.get(i) is not None}
+
+    async def get(self, collection: str, doc_id: Optional[str]) -> Optional[dict]:
+        """Retourne un document (en profitant des IDs déjà enregistrés via prime)"""
+        if not doc_id:
+            return None
+        found = await self.load_many(collection, [doc_id])
+        return found.get(doc_id)
+
+    async def users(self, ids) -> Dict[str, dict]:
+        return await self.load_many("users", ids)
+
+    async def sections(self, ids) -> Dict[str, dict]:
+        return await self.load_many("sections", ids)
+
+async def get_request_loader() -> RequestLoader:
+    """Dépendance FastAPI: un chargeur par requête (mis en cache par FastAPI pour la requête)"""
+    return RequestLoader()
+
+# Versions des données (invalidation des caches, y compris entre workers)
+# Rappels locaux appelés après chaque incrément (caches en mémoire de ce worker)
+DATA_VERSION_LISTENERS: Dict[str, List[Any]] = {}
+
+async def bump_data_version(*collections: str) -> None:
+    """Incrémente le numéro de version des collections modifiées"""
+    for name in collections:
+        await db.data_versions.update_one(
+            {"collection": name},
+            {"$inc": {"version": 1}},
+            upsert=True
+        )
+        for listener in DATA_VERSION_LISTENERS.get(name, ()):
+            listener()
+
+async def get_data_versions(*collections: str) -> Dict[str, int]:
+    """Retourne la version courante de chaque collection (0 si jamais modifiée)"""
+    docs = await db.data_versions.find(
+        {"collection": {"$in": list(collections)}}, {"_id": 0}
+    ).to_list(None)
+    versions = {doc["collection"]: doc.get("version", 0) for doc in docs}
+    return {name: versions.get(name, 0) for name in collections}
+
+class LRUCache:
+    """Cache LRU en mémoire du processus (les clés incluent les versions des données)"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def discard(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
 # Email service (simplified - in production use proper email service)
 async def send_invitation_email(email: str, nom: str, prenom: str, token: str):
     # In production, use proper email service like SendGrid, AWS SES, etc.
@@ -570,30 +950,32 @@ async def login(request: LoginRequest):
     }
 
 @api_router.get("/version-info")
-async def get_version_info():
+async def get_version_info(request: Request):
     """
     Endpoint public pour vérifier les informations de version
-    Accessible sans authentification
+    Accessible sans authentification - servi depuis le cache des paramètres
     """
-    settings_doc = await db.settings.find_one({"type": "app_settings"})
-    
-    if not settings_doc:
-        # Retourner les valeurs par défaut si aucun paramètre n'existe
-        return {
-            "currentApkVersion": "1.0.0",
-            "minimumSupportedVersion": "1.0.0",
-            "apkDownloadUrl": "",
-            "forceUpdate": False,
-            "releaseNotes": []
-        }
-    
-    return {
-        "currentApkVersion": settings_doc.get("currentApkVersion", "1.0.0"),
-        "minimumSupportedVersion": settings_doc.get("minimumSupportedVersion", "1.0.0"),
-        "apkDownloadUrl": settings_doc.get("apkDownloadUrl", ""),
-        "forceUpdate": settings_doc.get("forceUpdate", False),
-        "releaseNotes": settings_doc.get("releaseNotes", [])
+    snapshot = await get_settings_snapshot()
+    etag = f'W/"settings-{snapshot.version}"'
+    headers = {
+        "Cache-Control": f"public, max-age={VERSION_INFO_MAX_AGE}",
+        "ETag": etag
     }
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    settings = snapshot.settings
+    return JSONResponse(
+        content={
+            "currentApkVersion": settings.currentApkVersion,
+            "minimumSupportedVersion": settings.minimumSupportedVersion,
+            "apkDownloadUrl": settings.apkDownloadUrl,
+            "forceUpdate": settings.forceUpdate,
+            "releaseNotes": settings.releaseNotes
+        },
+        headers=headers
+    )
 
 @api_router.post("/auth/invite")
 async def invite_user(
@@ -633,10 +1015,12 @@ async def invite_user(
     
     # Convertir datetime en string pour MongoDB
     user_dict = user_data.dict()
+    user_dict.update(make_name_keys(user_data.prenom, user_data.nom))
     user_dict['created_at'] = user_data.created_at.isoformat()
     if user_data.invitation_expires:
         user_dict['invitation_expires'] = user_data.invitation_expires.isoformat()
     await db.users.insert_one(user_dict)
+    await bump_data_version("users")
     
     # Envoyer l'email d'invitation seulement si email fourni
     if invitation.email and invitation_token:
@@ -707,6 +1091,7 @@ async def set_password(request: SetPasswordRequest):
             }
         }
     )
+    await bump_data_version("users")
     
     return {"message": "Mot de passe défini avec succès"}
 
@@ -720,16 +1105,33 @@ async def get_users(
     grade: Optional[str] = None,
     role: Optional[str] = None,
     section_id: Optional[str] = None,
+    q: Optional[str] = None,
     current_user: User = Depends(require_inspection_permissions)
 ):
     """
     Récupérer la liste des utilisateurs - accessible aux inspecteurs
-    Filtres optionnels : grade, role, section_id
+    Filtres optionnels : grade, role, section_id, q (début du prénom, du nom ou du username)
     """
     try:
         # Construire le filtre de base
         filter_dict = {}
         
+        if q:
+            # Chaque mot doit commencer le prénom, le nom ou le username
+            # (expressions ancrées uniquement: parcours d'intervalle sur les index)
+            term_filters = []
+            for word in q.split():
+                term = normalize_text(word)
+                clauses = [{"username": {"$regex": f"^{re.escape(word.lower())}"}}]
+                if term:
+                    clauses += [
+                        {"name_key": {"$regex": f"^{term}"}},
+                        {"nom_key": {"$regex": f"^{term}"}}
+                    ]
+                term_filters.append({"$or": clauses})
+            if term_filters:
+                filter_dict["$and"] = term_filters
+        
         # Ajouter les filtres optionnels
         if grade:
             filter_dict["grade"] = grade
@@ -781,6 +1183,7 @@ async def create_user(
         "id": str(uuid.uuid4()),
         "prenom": user.prenom,
         "nom": user.nom,
+        **make_name_keys(user.prenom, user.nom),
         "username": username,  # Username généré automatiquement
         "email": user.email,
         "password_hash": None,  # Pas de mot de passe initial
@@ -794,6 +1197,7 @@ async def create_user(
     }
     
     await db.users.insert_one(new_user)
+    await bump_data_version("users")
     
     # Envoyer l'invitation par email si un email est fourni
     if user.email:
@@ -836,6 +1240,117 @@ async def get_user_filters(current_user: User = Depends(require_admin_or_encadre
         "sections": section_options
     }
 
+# Recherche rapide de cadets (saisie semi-automatique)
+# Intervalle (secondes) entre deux vérifications de la version des utilisateurs en base
+USER_SEARCH_VERSION_CHECK_INTERVAL = float(os.environ.get("USER_SEARCH_VERSION_CHECK_INTERVAL", "2"))
+
+class UserSearchIndex:
+    """
+    Index de préfixes en mémoire sur les noms normalisés et les usernames
+    Tableau trié de (clé, id) parcouru par bisect: chaque utilisateur y figure sous
+    son prénom, son nom, prénom+nom, nom+prénom, son username et chaque mot des noms
+    """
+    FIELDS = {"_id": 0, "id": 1, "username": 1, "nom": 1, "prenom": 1, "grade": 1,
+              "role": 1, "section_id": 1, "subgroup_id": 1}
+
+    def __init__(self, users: List[dict], version: int):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.users = {user["id"]: user for user in users}
+        entries = set()
+        for user in users:
+            prenom = normalize_text(user.get("prenom") or "")
+            nom = normalize_text(user.get("nom") or "")
+            # Chaque mot des noms composés est aussi indexé ("emile" trouve Jean-Émile)
+            words = [normalize_text(word) for word in re.split(r"[\s\-']+", f"{user.get('prenom') or ''} {user.get('nom') or ''}")]
+            for key in (prenom, nom, prenom + nom, nom + prenom, normalize_text(user.get("username") or ""), *words):
+                if key:
+                    entries.add((key, user["id"]))
+        self.entries = sorted(entries)
+
+    def search(self, prefix: str, limit: int, restrict_section: bool = False,
+               section_id: Optional[str] = None) -> List[dict]:
+        """
+        restrict_section=True: seuls les utilisateurs de section_id sont retournés
+        (section_id None = utilisateurs sans section, comme pour les inspections)
+        """
+        results = []
+        seen = set()
+        position = bisect.bisect_left(self.entries, (prefix,))
+        while position < len(self.entries) and len(results) < limit:
+            key, user_id = self.entries[position]
+            if not key.startswith(prefix):
+                break
+            position += 1
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            user = self.users[user_id]
+            if restrict_section and user.get("section_id") != section_id:
+                continue
+            results.append(user)
+        return results
+
+user_search_index: Optional[UserSearchIndex] = None
+user_search_index_lock = asyncio.Lock()
+
+def invalidate_user_search_index() -> None:
+    """Force la revérification de la version au prochain appel (écritures de ce worker)"""
+    if user_search_index is not None:
+        user_search_index.checked_at = float("-inf")
+
+async def rebuild_user_search_index() -> UserSearchIndex:
+    global user_search_index
+    version = (await get_data_versions("users"))["users"]
+    users = await db.users.find({"actif": True}, UserSearchIndex.FIELDS).to_list(None)
+    user_search_index = UserSearchIndex(users, version)
+    return user_search_index
+
+async def get_user_search_index() -> UserSearchIndex:
+    """Même principe que get_settings_snapshot: reconstruit si la version a changé"""
+    index = user_search_index
+    if index is not None and time.monotonic() - index.checked_at < USER_SEARCH_VERSION_CHECK_INTERVAL:
+        return index
+    
+    async with user_search_index_lock:
+        index = user_search_index
+        if index is None:
+            return await rebuild_user_search_index()
+        if time.monotonic() - index.checked_at < USER_SEARCH_VERSION_CHECK_INTERVAL:
+            return index
+        
+        version = (await get_data_versions("users"))["users"]
+        if version != index.version:
+            return await rebuild_user_search_index()
+        index.checked_at = time.monotonic()
+        return index
+
+DATA_VERSION_LISTENERS.setdefault("users", []).append(invalidate_user_search_index)
+
+@api_router.get("/users/search")
+async def search_users(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Recherche de cadets par début de prénom, de nom ou de username
+    - Insensible aux accents, espaces et traits d'union ("jean tr" trouve Jean Tremblay)
+    - Les chefs de section ne voient que leur section
+    """
+    if not current_user.has_admin_privileges:
+        await require_inspection_permissions(current_user)
+    
+    prefix = normalize_text(q)
+    if not prefix:
+        return []
+    
+    index = await get_user_search_index()
+    # Un chef de section sans section ne voit que les cadets sans section
+    if is_section_leader(current_user):
+        return index.search(prefix, limit, restrict_section=True, section_id=current_user.section_id)
+    return index.search(prefix, limit)
+
 @api_router.get("/users/{user_id}", response_model=User)
 async def get_user(user_id: str, current_user: User = Depends(get_current_user)):
     # Les utilisateurs peuvent voir leur propre profil
@@ -876,6 +1391,11 @@ async def update_user(
         update_data["nom"] = user_update.nom.strip()
     if user_update.prenom is not None:
         update_data["prenom"] = user_update.prenom.strip()
+    if "nom" in update_data or "prenom" in update_data:
+        update_data.update(make_name_keys(
+            update_data.get("prenom", existing_user.get("prenom")),
+            update_data.get("nom", existing_user.get("nom"))
+        ))
     if user_update.email is not None:
         # Vérifier que l'email n'est pas déjà utilisé par un autre utilisateur
         if user_update.email:
@@ -949,6 +1469,7 @@ async def update_user(
             {"id": user_id},
             {"$set": update_data}
         )
+        await bump_data_version("users")
     
     return {"message": "Utilisateur mis à jour avec succès"}
 
@@ -978,10 +1499,7 @@ async def delete_user(
         await db.presences.delete_many({"cadet_id": user_id})
         
         # Supprimer l'utilisateur des activités
-        await db.activities.update_many(
-            {"cadet_ids": user_id},
-            {"$pull": {"cadet_ids": user_id}}
-        )
+        await remove_activity_participants([user_id])
         
         # Supprimer l'utilisateur
         result = await db.users.delete_one({"id": user_id})
@@ -991,6 +1509,7 @@ async def delete_user(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Utilisateur non trouvé"
             )
+        await bump_data_version("users", "presences")
         
         return {"message": f"Utilisateur {existing_user['prenom']} {existing_user['nom']} supprimé définitivement avec toutes ses données"}
     
@@ -1069,6 +1588,8 @@ async def generate_initial_password(
             }
         }
     )
+    # username et actif sont lus par l'organigramme, la recherche et les rapports en cache
+    await bump_data_version("users")
     
     return GeneratePasswordResponse(
         user_id=user_id,
@@ -1112,6 +1633,7 @@ async def change_password(
     new_hashed_password = get_password_hash(request.new_password)
     
     # Mettre à jour le mot de passe et retirer le flag must_change_password
+    # (pas de bump_data_version: aucun cache ne contient ces champs, get_current_user lit la base)
     await db.users.update_one(
         {"id": current_user.id},
         {
@@ -1150,6 +1672,7 @@ async def create_section(
     section_dict = section_data.dict()
     section_dict['created_at'] = section_data.created_at.isoformat()
     await db.sections.insert_one(section_dict)
+    await bump_data_version("sections")
     return section_data
 
 @api_router.get("/sections", response_model=List[Section])
@@ -1183,6 +1706,7 @@ async def update_section(
         {"id": section_id},
         {"$set": update_data}
     )
+    await bump_data_version("sections")
     
     return {"message": "Section mise à jour avec succès"}
 
@@ -1215,6 +1739,7 @@ async def delete_section(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Section non trouvée"
             )
+        await bump_data_version("sections", "users")
         
         return {"message": f"Section {existing_section['nom']} supprimée définitivement"}
     
@@ -1281,6 +1806,7 @@ async def create_subgroup(
     subgroup_dict = new_subgroup.dict()
     subgroup_dict['created_at'] = new_subgroup.created_at.isoformat()
     await db.subgroups.insert_one(subgroup_dict)
+    await bump_data_version("subgroups")
     
     return new_subgroup
 
@@ -1336,6 +1862,7 @@ async def update_subgroup(
             {"id": subgroup_id},
             {"$set": update_data}
         )
+        await bump_data_version("subgroups")
     
     return {"message": "Sous-groupe mis à jour avec succès"}
 
@@ -1369,6 +1896,7 @@ async def delete_subgroup(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Sous-groupe non trouvé"
             )
+        await bump_data_version("users", "subgroups")
         
         return {"message": f"Sous-groupe {existing_subgroup['nom']} supprimé définitivement"}
     
@@ -1463,6 +1991,7 @@ async def create_presence(
     presence_dict['date'] = presence_data.date.isoformat()
     presence_dict['heure_enregistrement'] = presence_data.heure_enregistrement.isoformat()
     await db.presences.insert_one(presence_dict)
+    await bump_data_version("presences")
     
     return presence_data
 
@@ -1527,6 +2056,9 @@ async def create_bulk_presences(
         except Exception as e:
             errors.append(f"Erreur pour cadet {presence_create.cadet_id}: {str(e)}")
     
+    if created_presences:
+        await bump_data_version("presences")
+    
     return {
         "created_count": len(created_presences),
         "created_ids": created_presences,
@@ -1670,6 +2202,7 @@ async def update_presence(
         {"id": presence_id},
         {"$set": update_data}
     )
+    await bump_data_version("presences")
     
     return {"message": "Présence mise à jour avec succès"}
 
@@ -1718,19 +2251,52 @@ async def get_presence_stats(
     )
 
 # Routes pour les activités pré-définies
+async def validate_activity_cadets(cadet_ids: List[str], active_only: bool = False) -> None:
+    """Vérifie en une seule requête de comptage que tous les cadets existent"""
+    unique_ids = list(set(cadet_ids))
+    if not unique_ids:
+        return
+    
+    filter_dict = {"id": {"$in": unique_ids}}
+    if active_only:
+        filter_dict["actif"] = True
+    if await db.users.count_documents(filter_dict) == len(unique_ids):
+        return
+    
+    # Chemin d'erreur seulement: identifier le premier cadet manquant
+    found_ids = set(await db.users.distinct("id", filter_dict))
+    missing_id = next(cadet_id for cadet_id in cadet_ids if cadet_id not in found_ids)
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=f"Cadet {missing_id} non trouvé"
+    )
+
+async def remove_activity_participants(cadet_ids: List[str]) -> None:
+    """Retire des cadets de toutes les activités en gardant participant_count à jour"""
+    await db.activities.update_many(
+        {"cadet_ids": {"$in": cadet_ids}},
+        [
+            {"$set": {"cadet_ids": {"$filter": {
+                "input": "$cadet_ids",
+                "cond": {"$not": [{"$in": ["$$this", cadet_ids]}]}
+            }}}},
+            {"$set": {"participant_count": {"$size": {"$setUnion": ["$cadet_ids", []]}}}}
+        ]
+    )
+
+def activity_participant_count(activity: dict) -> int:
+    """participant_count stocké, ou calculé pour les activités créées avant son ajout"""
+    if "participant_count" in activity:
+        return activity["participant_count"]
+    return len(set(activity["cadet_ids"]))
+
 @api_router.post("/activities", response_model=Activity)
 async def create_activity(
     activity: ActivityCreate,
     current_user: User = Depends(require_admin_or_encadrement)
 ):
     # Vérifier que tous les cadets existent (peu importe leur statut d'activation)
-    for cadet_id in activity.cadet_ids:
-        cadet = await db.users.find_one({"id": cadet_id})
-        if not cadet:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Cadet {cadet_id} non trouvé"
-            )
+    await validate_activity_cadets(activity.cadet_ids)
     
     # Créer l'activité
     activity_data = Activity(
@@ -1742,6 +2308,7 @@ async def create_activity(
         recurrence_unit=activity.recurrence_unit,
         next_date=activity.next_date,
         planned_date=activity.planned_date,
+        participant_count=len(set(activity.cadet_ids)),
         created_by=current_user.id
     )
     
@@ -1754,21 +2321,35 @@ async def create_activity(
 @api_router.get("/activities", response_model=List[ActivityResponse])
 async def get_activities(
     active_only: bool = True,
-    current_user: User = Depends(require_admin_or_encadrement)
+    include_names: bool = True,
+    current_user: User = Depends(require_admin_or_encadrement),
+    loader: RequestLoader = Depends(get_request_loader)
 ):
+    """
+    Liste des activités
+    - include_names=false: aucun participant n'est résolu, la liste s'affiche
+      avec participant_count seulement
+    """
     filter_dict = {}
     if active_only:
         filter_dict["active"] = True
     
-    activities = await db.activities.find(filter_dict).to_list(1000)
+    activities = await db.activities.find(filter_dict, {"_id": 0}).to_list(1000)
+    
+    # Résoudre tous les participants en une seule requête
+    cadets_by_id = {}
+    if include_names:
+        cadets_by_id = await loader.users(
+            [cadet_id for activity in activities for cadet_id in activity["cadet_ids"]]
+        )
     
     # Enrichir avec les noms des cadets
     enriched_activities = []
     for activity in activities:
         # Récupérer les noms des cadets (actifs et non actifs)
         cadet_names = []
-        for cadet_id in activity["cadet_ids"]:
-            cadet = await db.users.find_one({"id": cadet_id})
+        for cadet_id in (activity["cadet_ids"] if include_names else []):
+            cadet = cadets_by_id.get(cadet_id)
             if cadet:
                 status_indicator = "" if cadet.get("actif", False) else " (non confirmé)"
                 cadet_names.append(f"{cadet['prenom']} {cadet['nom']}{status_indicator}")
@@ -1802,6 +2383,7 @@ async def get_activities(
             type=ActivityType(activity["type"]),
             cadet_ids=activity["cadet_ids"],
             cadet_names=cadet_names,
+            participant_count=activity_participant_count(activity),
             recurrence_interval=activity.get("recurrence_interval"),
             recurrence_unit=activity.get("recurrence_unit"),
             next_date=next_date,
@@ -1814,10 +2396,117 @@ async def get_activities(
     
     return enriched_activities
 
+# Occurrences des activités récurrentes
+# Horizon (jours) des occurrences calculées pour chaque activité
+ACTIVITY_OCCURRENCE_HORIZON_DAYS = int(os.environ.get("ACTIVITY_OCCURRENCE_HORIZON_DAYS", 365))
+ACTIVITY_RECURRENCE_UNITS = {"days", "weeks", "months"}
+
+# Clé: (id de l'activité, empreinte de sa planification, jour courant)
+activity_occurrences_cache = LRUCache(max_entries=1024)
+
+def parse_activity_date(value) -> Optional[date]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+def expand_activity_occurrences(activity: dict, start: date, end: date) -> List[date]:
+    """
+    Dates d'une activité comprises entre start et end (inclus)
+    - Ponctuelle: planned_date
+    - Récurrente: next_date puis tous les recurrence_interval jours/semaines/mois
+      (chaque occurrence est calculée depuis next_date pour éviter la dérive des fins de mois)
+    """
+    if activity.get("type") != ActivityType.RECURRING.value:
+        planned = parse_activity_date(activity.get("planned_date") or activity.get("next_date"))
+        return [planned] if planned and start <= planned <= end else []
+    
+    anchor = parse_activity_date(activity.get("next_date"))
+    if not anchor:
+        return []
+    interval = activity.get("recurrence_interval")
+    unit = activity.get("recurrence_unit")
+    if not interval or interval < 1 or unit not in ACTIVITY_RECURRENCE_UNITS:
+        return [anchor] if start <= anchor <= end else []
+    
+    step = interval * (7 if unit == "weeks" else 1)
+    index = 0
+    if start > anchor and unit != "months":
+        # Sauter directement à la première occurrence >= start
+        index = -(-(start - anchor).days // step)
+    
+    occurrences = []
+    while True:
+        if unit == "months":
+            occurrence = anchor + relativedelta(months=index * interval)
+        else:
+            occurrence = anchor + timedelta(days=index * step)
+        if occurrence > end:
+            return occurrences
+        if occurrence >= start:
+            occurrences.append(occurrence)
+        index += 1
+
+def get_activity_occurrences(activity: dict, today: date) -> List[date]:
+    """Occurrences à venir d'une activité, matérialisées au premier accès puis mises en cache"""
+    fingerprint = (
+        activity.get("type"), str(activity.get("next_date")), str(activity.get("planned_date")),
+        activity.get("recurrence_interval"), activity.get("recurrence_unit")
+    )
+    key = (activity["id"], fingerprint, today)
+    occurrences = activity_occurrences_cache.get(key)
+    if occurrences is None:
+        occurrences = expand_activity_occurrences(
+            activity, today, today + timedelta(days=ACTIVITY_OCCURRENCE_HORIZON_DAYS)
+        )
+        activity_occurrences_cache.set(key, occurrences)
+    return occurrences
+
+@api_router.get("/activities/upcoming")
+async def get_upcoming_activities(
+    limit: int = Query(10, ge=1, le=100),
+    cadet_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Prochaines occurrences des activités d'un cadet (par défaut: l'utilisateur connecté)
+    Une seule requête sur l'index multiclé cadet_ids, puis expansion des récurrences en mémoire
+    """
+    if cadet_id and cadet_id != current_user.id:
+        await require_presence_permissions(current_user)
+    target_id = cadet_id or current_user.id
+    
+    activities = await db.activities.find(
+        {"cadet_ids": target_id, "active": True},
+        {"_id": 0, "id": 1, "nom": 1, "description": 1, "type": 1, "next_date": 1,
+         "planned_date": 1, "recurrence_interval": 1, "recurrence_unit": 1}
+    ).to_list(None)
+    
+    today = date.today()
+    occurrences = heapq.merge(*(
+        [(occurrence, activity["nom"], activity) for occurrence in get_activity_occurrences(activity, today)]
+        for activity in activities
+    ), key=lambda item: (item[0], item[1]))
+    
+    return [
+        {
+            "activity_id": activity["id"],
+            "nom": activity["nom"],
+            "description": activity.get("description"),
+            "type": activity["type"],
+            "date": occurrence.isoformat()
+        }
+        for occurrence, _, activity in itertools.islice(occurrences, limit)
+    ]
+
 @api_router.get("/activities/{activity_id}", response_model=ActivityResponse)
 async def get_activity(
     activity_id: str,
-    current_user: User = Depends(require_admin_or_encadrement)
+    current_user: User = Depends(require_admin_or_encadrement),
+    loader: RequestLoader = Depends(get_request_loader)
 ):
     activity = await db.activities.find_one({"id": activity_id})
     if not activity:
@@ -1826,10 +2515,11 @@ async def get_activity(
             detail="Activité non trouvée"
         )
     
-    # Récupérer les noms des cadets (actifs et non actifs)
+    # Récupérer les noms des cadets (actifs et non actifs) en une seule requête
+    cadets_by_id = await loader.users(activity["cadet_ids"])
     cadet_names = []
     for cadet_id in activity["cadet_ids"]:
-        cadet = await db.users.find_one({"id": cadet_id})
+        cadet = cadets_by_id.get(cadet_id)
         if cadet:
             status_indicator = "" if cadet.get("actif", False) else " (non confirmé)"
             cadet_names.append(f"{cadet['prenom']} {cadet['nom']}{status_indicator}")
@@ -1863,6 +2553,7 @@ async def get_activity(
         type=ActivityType(activity["type"]),
         cadet_ids=activity["cadet_ids"],
         cadet_names=cadet_names,
+        participant_count=activity_participant_count(activity),
         recurrence_interval=activity.get("recurrence_interval"),
         recurrence_unit=activity.get("recurrence_unit"),
         next_date=next_date,
@@ -1887,13 +2578,7 @@ async def update_activity(
         )
     
     # Vérifier que tous les cadets existent
-    for cadet_id in activity_update.cadet_ids:
-        cadet = await db.users.find_one({"id": cadet_id, "actif": True})
-        if not cadet:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Cadet {cadet_id} non trouvé"
-            )
+    await validate_activity_cadets(activity_update.cadet_ids, active_only=True)
     
     # Mettre à jour
     update_data = {
@@ -1901,6 +2586,7 @@ async def update_activity(
         "description": activity_update.description,
         "type": activity_update.type.value,
         "cadet_ids": activity_update.cadet_ids,
+        "participant_count": len(set(activity_update.cadet_ids)),
         "recurrence_interval": activity_update.recurrence_interval,
         "recurrence_unit": activity_update.recurrence_unit,
         "next_date": activity_update.next_date if activity_update.next_date else None,
@@ -1958,6 +2644,7 @@ async def create_role(
     role_dict = role_data.dict()
     role_dict['created_at'] = role_data.created_at.isoformat()
     await db.roles.insert_one(role_dict)
+    await bump_data_version("roles")
     return role_data
 
 @api_router.put("/roles/{role_id}")
@@ -2009,6 +2696,7 @@ async def update_role(
             {"id": role_id},
             {"$set": update_data}
         )
+        await bump_data_version("roles")
     
     return {"message": "Rôle mis à jour avec succès"}
 
@@ -2049,6 +2737,7 @@ async def delete_role(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Rôle non trouvé"
         )
+    await bump_data_version("roles")
     
     return {"message": "Rôle supprimé avec succès"}
 
@@ -2096,17 +2785,21 @@ async def calculate_consecutive_absences(
 
 @api_router.get("/alerts", response_model=List[AlertResponse])
 async def get_alerts(
-    current_user: User = Depends(require_admin_or_encadrement)
+    current_user: User = Depends(require_admin_or_encadrement),
+    loader: RequestLoader = Depends(get_request_loader)
 ):
     """Récupérer toutes les alertes actives"""
     
     # Récupérer les alertes depuis la base de données
     alerts = await db.alerts.find().sort("created_at", -1).to_list(1000)
     
+    # Récupérer les cadets concernés en une seule requête
+    cadets_by_id = await loader.users([alert["cadet_id"] for alert in alerts])
+    
     enriched_alerts = []
     for alert in alerts:
         # Récupérer les informations du cadet
-        cadet = await db.users.find_one({"id": alert["cadet_id"]})
+        cadet = cadets_by_id.get(alert["cadet_id"])
         if not cadet:
             continue
         
@@ -2532,14 +3225,7 @@ async def sync_offline_data(
                 inspection_id = str(uuid.uuid4())
             
             # Calculer le score total
-            total_criteria = len(offline_inspection.criteria_scores)
-            if total_criteria == 0:
-                total_score = 0.0
-                max_score = 0
-            else:
-                obtained_score = sum(offline_inspection.criteria_scores.values())
-                max_score = total_criteria * 4
-                total_score = round((obtained_score / max_score) * 100, 2) if max_score > 0 else 0.0
+            total_score, max_score = compute_inspection_score(offline_inspection.criteria_scores)
             
             inspection_data = {
                 "id": inspection_id,
@@ -2579,10 +3265,20 @@ async def sync_offline_data(
                 action="error"
             ))
     
+    if any(r.success and r.action in ("created", "updated_by_older") for r in inspection_results):
+        await bump_data_version("uniform_inspections")
+    if any(r.success for r in presence_results + inspection_results):
+        # Présences synchronisées ou marquées automatiquement par les inspections
+        await bump_data_version("presences")
+    
     # Calculer les statistiques
     total_synced = sum(1 for r in presence_results + inspection_results if r.success)
     total_errors = sum(1 for r in presence_results + inspection_results if not r.success)
     
+    for kind, results in (("presence", presence_results), ("inspection", inspection_results)):
+        for result in results:
+            metrics.inc("cadet_sync_items_total", kind=kind, action=result.action or "unknown")
+    
     return SyncBatchResponse(
         presence_results=presence_results,
         inspection_results=inspection_results,
@@ -2698,6 +3394,11 @@ class UniformInspectionCreate(BaseModel):
     criteria_scores: Dict[str, int]  # Critère -> Score (0-4)
     commentaire: Optional[str] = None
 
+class UniformInspectionBatchCreate(BaseModel):
+    """Inspections d'une section entière pour une même date"""
+    date: date
+    inspections: List[UniformInspectionCreate]
+
 class UniformInspectionResponse(BaseModel):
     id: str
     cadet_id: str
@@ -2758,33 +3459,85 @@ async def require_uniform_schedule_permissions(current_user: User = Depends(get_
         detail="Accès refusé. Permissions requises: Adjudants, Officiers ou Encadrement."
     )
 
+# Cache des paramètres de l'application (instantané en mémoire du processus)
+# Intervalle (secondes) entre deux vérifications de la version en base
+SETTINGS_VERSION_CHECK_INTERVAL = float(os.environ.get("SETTINGS_VERSION_CHECK_INTERVAL", "5"))
+# Durée de mise en cache HTTP de /version-info
+VERSION_INFO_MAX_AGE = int(os.environ.get("VERSION_INFO_MAX_AGE", "60"))
+
+class SettingsSnapshot:
+    """Paramètres chargés depuis MongoDB avec le numéro de version correspondant"""
+
+    def __init__(self, settings: Settings, version: int):
+        self.settings = settings
+        self.version = version
+        self.checked_at = time.monotonic()
+
+settings_snapshot: Optional[SettingsSnapshot] = None
+settings_snapshot_lock = asyncio.Lock()
+
+def settings_from_document(settings_doc: Optional[dict]) -> Settings:
+    """Convertit le document MongoDB en modèle Settings"""
+    if not settings_doc:
+        # Paramètres par défaut si aucun n'existe
+        return Settings()
+    
+    return Settings(
+        escadronName=settings_doc.get("escadronName", ""),
+        address=settings_doc.get("address", ""),
+        contactEmail=settings_doc.get("contactEmail", ""),
+        allowMotivatedAbsences=settings_doc.get("allowMotivatedAbsences", True),
+        consecutiveAbsenceThreshold=settings_doc.get("consecutiveAbsenceThreshold", 3),
+        inspectionCriteria=settings_doc.get("inspectionCriteria", {}),
+        autoBackup=settings_doc.get("autoBackup", True),
+        currentApkVersion=settings_doc.get("currentApkVersion", "1.0.0"),
+        minimumSupportedVersion=settings_doc.get("minimumSupportedVersion", "1.0.0"),
+        apkDownloadUrl=settings_doc.get("apkDownloadUrl", ""),
+        forceUpdate=settings_doc.get("forceUpdate", False),
+        releaseNotes=settings_doc.get("releaseNotes", [])
+    )
+
+async def reload_settings_snapshot() -> SettingsSnapshot:
+    """Recharge les paramètres et remplace l'instantané en une seule affectation"""
+    global settings_snapshot
+    # Lire la version avant le document: le document est au moins aussi récent que la version
+    version = (await get_data_versions("settings"))["settings"]
+    settings_doc = await db.settings.find_one({"type": "app_settings"})
+    settings_snapshot = SettingsSnapshot(settings_from_document(settings_doc), version)
+    return settings_snapshot
+
+async def get_settings_snapshot() -> SettingsSnapshot:
+    """
+    Retourne l'instantané courant des paramètres
+    La version en base est revérifiée au plus toutes les SETTINGS_VERSION_CHECK_INTERVAL
+    secondes pour prendre en compte les sauvegardes faites par d'autres workers
+    """
+    snapshot = settings_snapshot
+    if snapshot is not None and time.monotonic() - snapshot.checked_at < SETTINGS_VERSION_CHECK_INTERVAL:
+        return snapshot
+    
+    async with settings_snapshot_lock:
+        snapshot = settings_snapshot
+        if snapshot is None:
+            return await reload_settings_snapshot()
+        if time.monotonic() - snapshot.checked_at < SETTINGS_VERSION_CHECK_INTERVAL:
+            return snapshot
+        
+        version = (await get_data_versions("settings"))["settings"]
+        if version != snapshot.version:
+            return await reload_settings_snapshot()
+        snapshot.checked_at = time.monotonic()
+        return snapshot
+
+async def get_app_settings() -> Settings:
+    """Paramètres de l'application depuis le cache en mémoire"""
+    return (await get_settings_snapshot()).settings
+
 # Routes pour les paramètres
 @api_router.get("/settings", response_model=Settings)
 async def get_settings(current_user: User = Depends(require_inspection_permissions)):
     """Récupérer les paramètres de l'application - accessible aux inspecteurs"""
-    settings_doc = await db.settings.find_one({"type": "app_settings"})
-    
-    if not settings_doc:
-        # Retourner les paramètres par défaut si aucun n'existe
-        return Settings()
-    
-    # Convertir le document MongoDB en modèle Settings
-    settings_dict = {
-        "escadronName": settings_doc.get("escadronName", ""),
-        "address": settings_doc.get("address", ""),
-        "contactEmail": settings_doc.get("contactEmail", ""),
-        "allowMotivatedAbsences": settings_doc.get("allowMotivatedAbsences", True),
-        "consecutiveAbsenceThreshold": settings_doc.get("consecutiveAbsenceThreshold", 3),
-        "inspectionCriteria": settings_doc.get("inspectionCriteria", {}),
-        "autoBackup": settings_doc.get("autoBackup", True),
-        "currentApkVersion": settings_doc.get("currentApkVersion", "1.0.0"),
-        "minimumSupportedVersion": settings_doc.get("minimumSupportedVersion", "1.0.0"),
-        "apkDownloadUrl": settings_doc.get("apkDownloadUrl", ""),
-        "forceUpdate": settings_doc.get("forceUpdate", False),
-        "releaseNotes": settings_doc.get("releaseNotes", [])
-    }
-    
-    return Settings(**settings_dict)
+    return await get_app_settings()
 
 @api_router.post("/settings")
 async def save_settings(
@@ -2804,6 +3557,11 @@ async def save_settings(
         upsert=True
     )
     
+    # Nouvelle version pour les autres workers, puis remplacement de l'instantané local
+    await bump_data_version("settings")
+    async with settings_snapshot_lock:
+        await reload_settings_snapshot()
+    
     return {"message": "Paramètres sauvegardés avec succès"}
 
 # Routes pour la planification des tenues
@@ -2837,6 +3595,93 @@ async def get_uniform_schedule(
         "set_at": schedule["set_at"]
     }
 
+# Cache mensuel des tenues programmées pour le calendrier
+UNIFORM_SCHEDULE_MAX_RANGE_DAYS = 400
+uniform_schedule_months = LRUCache(max_entries=120)  # "YYYY-MM" -> planifications du mois
+uniform_schedule_cache_version: Optional[int] = None
+
+def schedule_month_key(value) -> str:
+    """Clé de mois "YYYY-MM" pour une date ou une chaîne ISO"""
+    return value.isoformat()[:7] if isinstance(value, date) else str(value)[:7]
+
+def next_month_start(month_start: date) -> date:
+    return date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+
+def invalidate_uniform_schedule_month(value) -> None:
+    uniform_schedule_months.discard(schedule_month_key(value))
+
+@api_router.get("/uniform-schedule/range")
+async def get_uniform_schedule_range(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Récupérer les tenues programmées entre deux dates (incluses)
+    Les mois sont mis en cache en mémoire et invalidés à chaque modification
+    """
+    global uniform_schedule_cache_version
+    
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La date de fin doit être postérieure à la date de début"
+        )
+    if (to_date - from_date).days > UNIFORM_SCHEDULE_MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Plage limitée à {UNIFORM_SCHEDULE_MAX_RANGE_DAYS} jours"
+        )
+    
+    # Modifications faites par un autre worker: vider le cache local
+    version = (await get_data_versions("uniform_schedules"))["uniform_schedules"]
+    if version != uniform_schedule_cache_version:
+        uniform_schedule_months.clear()
+        uniform_schedule_cache_version = version
+    
+    # Mois couverts par la plage demandée
+    months = []
+    month_start = from_date.replace(day=1)
+    while month_start <= to_date:
+        months.append(month_start)
+        month_start = next_month_start(month_start)
+    
+    missing = [m for m in months if uniform_schedule_months.get(schedule_month_key(m)) is None]
+    if missing:
+        # Une seule requête pour tous les mois manquants
+        schedules = await db.uniform_schedules.find(
+            {"date": {
+                "$gte": missing[0].isoformat(),
+                "$lt": next_month_start(missing[-1]).isoformat()
+            }},
+            {"_id": 0}
+        ).to_list(None)
+        
+        fetched = {schedule_month_key(m): [] for m in months if missing[0] <= m <= missing[-1]}
+        for schedule in schedules:
+            fetched.setdefault(schedule_month_key(schedule["date"]), []).append(schedule)
+        for key, month_schedules in fetched.items():
+            uniform_schedule_months.set(key, sorted(month_schedules, key=lambda sch: sch["date"]))
+    
+    start, end = from_date.isoformat(), to_date.isoformat()
+    results = []
+    for m in months:
+        for schedule in uniform_schedule_months.get(schedule_month_key(m)) or []:
+            if start <= schedule["date"] <= end:
+                results.append({
+                    "id": schedule["id"],
+                    "date": schedule["date"],
+                    "uniform_type": schedule["uniform_type"],
+                    "set_by": schedule["set_by"],
+                    "set_at": schedule["set_at"]
+                })
+    
+    return {
+        "from": start,
+        "to": end,
+        "schedules": results
+    }
+
 @api_router.post("/uniform-schedule")
 async def set_uniform_schedule(
     schedule_data: UniformScheduleCreate,
@@ -2861,6 +3706,8 @@ async def set_uniform_schedule(
                 "set_at": datetime.utcnow().isoformat()
             }}
         )
+        invalidate_uniform_schedule_month(schedule_data.date)
+        await bump_data_version("uniform_schedules")
         return {"message": "Tenue mise à jour avec succès", "id": existing_schedule["id"]}
     else:
         # Créer une nouvelle planification
@@ -2875,6 +3722,8 @@ async def set_uniform_schedule(
         schedule_dict["set_at"] = schedule_dict["set_at"].isoformat()
         
         await db.uniform_schedules.insert_one(schedule_dict)
+        invalidate_uniform_schedule_month(schedule_data.date)
+        await bump_data_version("uniform_schedules")
         return {"message": "Tenue programmée avec succès", "id": schedule.id}
 
 @api_router.delete("/uniform-schedule/{schedule_id}")
@@ -2883,16 +3732,47 @@ async def delete_uniform_schedule(
     current_user: User = Depends(require_uniform_schedule_permissions)
 ):
     """Supprimer une planification de tenue"""
-    result = await db.uniform_schedules.delete_one({"id": schedule_id})
+    deleted = await db.uniform_schedules.find_one_and_delete({"id": schedule_id})
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Planification non trouvée"
         )
     
+    invalidate_uniform_schedule_month(deleted["date"])
+    await bump_data_version("uniform_schedules")
+    
     return {"message": "Planification supprimée avec succès"}
 
+# Fonctions utilitaires pour les inspections d'uniformes
+def compute_inspection_score(criteria_scores: Dict[str, int]):
+    """Calcule (score en pourcentage, score maximum) selon le barème 0-4 par critère"""
+    total_criteria = len(criteria_scores)
+    if total_criteria == 0:
+        return 0.0, 0
+    # Chaque critère est noté de 0 à 4
+    obtained_score = sum(criteria_scores.values())
+    max_score = total_criteria * 4  # Score maximum possible
+    total_score = round((obtained_score / max_score) * 100, 2) if max_score > 0 else 0.0
+    return total_score, max_score
+
+def is_section_leader(current_user: User) -> bool:
+    """
+    Détermine si l'inspecteur est un chef de section (limité à sa section)
+    État-Major (Adjudants d'escadron) peut inspecter n'importe qui sauf lui-même
+    """
+    user_role_lower = current_user.role.lower() if isinstance(current_user.role, str) else current_user.role.value.lower()
+    
+    if 'adjudant' in user_role_lower and 'escadron' in user_role_lower:
+        return False  # État-Major, pas de restriction de section
+    
+    # Chefs de section (Commandant de section, Sergent de section, Commandant de la Garde)
+    return (('commandant' in user_role_lower and 'section' in user_role_lower) or
+            ('sergent' in user_role_lower and 'section' in user_role_lower) or
+            ('commandant' in user_role_lower and 'garde' in user_role_lower)) and \
+        current_user.section_id is not None
+
 # Routes pour les inspections d'uniformes
 @api_router.post("/uniform-inspections")
 async def create_uniform_inspection(
@@ -2924,25 +3804,8 @@ async def create_uniform_inspection(
             detail="Vous ne pouvez pas inspecter votre propre uniforme"
         )
     
-    # Vérifier les permissions selon le rôle
-    user_role_lower = current_user.role.lower() if isinstance(current_user.role, str) else current_user.role.value.lower()
-    
-    # Déterminer si l'utilisateur est un chef de section (limité à sa section)
-    is_section_leader = False
-    
-    # État-Major (Adjudants d'escadron) peuvent inspecter n'importe qui sauf eux-mêmes
-    if 'adjudant' in user_role_lower and 'escadron' in user_role_lower:
-        is_section_leader = False  # État-Major, pas de restriction de section
-    
-    # Chefs de section (Commandant de section, Sergent de section, Commandant de la Garde)
-    elif (('commandant' in user_role_lower and 'section' in user_role_lower) or
-          ('sergent' in user_role_lower and 'section' in user_role_lower) or
-          ('commandant' in user_role_lower and 'garde' in user_role_lower)) and \
-          current_user.section_id is not None:
-        is_section_leader = True
-    
     # Si c'est un chef de section, vérifier qu'il n'inspecte que sa section
-    if is_section_leader:
+    if is_section_leader(current_user):
         if cadet.get("section_id") != current_user.section_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -2950,15 +3813,7 @@ async def create_uniform_inspection(
             )
     
     # Calculer le score total basé sur le barème (0-4 points par critère)
-    total_criteria = len(inspection.criteria_scores)
-    if total_criteria == 0:
-        total_score = 0.0
-        max_score = 0
-    else:
-        # Chaque critère est noté de 0 à 4
-        obtained_score = sum(inspection.criteria_scores.values())
-        max_score = total_criteria * 4  # Score maximum possible
-        total_score = round((obtained_score / max_score) * 100, 2) if max_score > 0 else 0.0
+    total_score, max_score = compute_inspection_score(inspection.criteria_scores)
     
     # Vérifier la présence du cadet pour cette date
     existing_presence = await db.presences.find_one({
@@ -3016,6 +3871,7 @@ async def create_uniform_inspection(
     inspection_dict["inspection_time"] = inspection_dict["inspection_time"].isoformat()
     
     await db.uniform_inspections.insert_one(inspection_dict)
+    await bump_data_version("uniform_inspections", "presences")
     
     result = {
         "message": "Inspection enregistrée avec succès",
@@ -3026,16 +3882,139 @@ async def create_uniform_inspection(
     if auto_marked_present:
         result["auto_marked_present"] = True
         result["presence_message"] = "Le cadet a été automatiquement marqué présent"
-    
+
     return result
 
+@api_router.post("/uniform-inspections/batch")
+async def create_uniform_inspections_batch(
+    batch: UniformInspectionBatchCreate,
+    current_user: User = Depends(require_inspection_permissions)
+):
+    """
+    Enregistrer les inspections de toute une section pour une date
+    - Permissions vérifiées une seule fois, cadets et présences préchargés en bloc
+    - Inspections et présences automatiques écrites avec bulk_write
+    - Retourne le résultat (score ou erreur) pour chaque cadet
+    """
+    inspection_date = batch.date.isoformat()
+    section_leader = is_section_leader(current_user)
+    cadet_ids = list({inspection.cadet_id for inspection in batch.inspections})
+
+    # Précharger les cadets et les présences du jour
+    cadets = await db.users.find(
+        {"id": {"$in": cadet_ids}, "actif": True},
+        {"_id": 0, "id": 1, "nom": 1, "prenom": 1, "section_id": 1}
+    ).to_list(None)
+    cadets_by_id = {cadet["id"]: cadet for cadet in cadets}
+
+    presences = await db.presences.find(
+        {"cadet_id": {"$in": cadet_ids}, "date": inspection_date}
+    ).to_list(None)
+    presences_by_cadet = {presence["cadet_id"]: presence for presence in presences}
+
+    presence_ops = []
+    inspection_ops = []
+    results = []
+    seen_cadets = set()
+    now = datetime.utcnow().isoformat()
+
+    for inspection in batch.inspections:
+        cadet = cadets_by_id.get(inspection.cadet_id)
+        error = None
+        if inspection.cadet_id in seen_cadets:
+            error = "Inspection en double pour ce cadet dans le lot"
+        elif not cadet:
+            error = "Cadet non trouvé"
+        elif inspection.cadet_id == current_user.id:
+            error = "Vous ne pouvez pas inspecter votre propre uniforme"
+        elif section_leader and cadet.get("section_id") != current_user.section_id:
+            error = "Vous ne pouvez inspecter que les cadets de votre section"
+
+        if error:
+            results.append({"cadet_id": inspection.cadet_id, "success": False, "error": error})
+            continue
+        seen_cadets.add(inspection.cadet_id)
+
+        total_score, max_score = compute_inspection_score(inspection.criteria_scores)
+
+        # Même logique de présence automatique que pour une inspection individuelle
+        existing_presence = presences_by_cadet.get(inspection.cadet_id)
+        auto_marked_present = False
+        if not existing_presence:
+            presence_ops.append(InsertOne({
+                "id": str(uuid.uuid4()),
+                "cadet_id": inspection.cadet_id,
+                "date": inspection_date,
+                "status": "present",
+                "commentaire": "Présence automatique suite à inspection uniforme",
+                "enregistre_par": current_user.id,
+                "heure_enregistrement": now,
+                "section_id": cadet.get("section_id"),
+                "activite": f"Inspection uniforme - {inspection.uniform_type}"
+            }))
+            auto_marked_present = True
+        elif existing_presence.get("status") == "absent":
+            presence_ops.append(UpdateOne(
+                {"id": existing_presence["id"]},
+                {"$set": {
+                    "status": "present",
+                    "commentaire": f"Modifié automatiquement suite à inspection uniforme. Ancien commentaire: {existing_presence.get('commentaire', '')}",
+                    "enregistre_par": current_user.id,
+                    "heure_enregistrement": now
+                }}
+            ))
+            auto_marked_present = True
+
+        inspection_data = UniformInspection(
+            cadet_id=inspection.cadet_id,
+            date=batch.date,
+            uniform_type=inspection.uniform_type,
+            criteria_scores=inspection.criteria_scores,
+            max_score=max_score,
+            total_score=total_score,
+            commentaire=inspection.commentaire,
+            inspected_by=current_user.id,
+            section_id=cadet.get("section_id"),
+            auto_marked_present=auto_marked_present
+        )
+        inspection_dict = inspection_data.dict()
+        inspection_dict["date"] = inspection_date
+        inspection_dict["inspection_time"] = inspection_dict["inspection_time"].isoformat()
+        inspection_ops.append(InsertOne(inspection_dict))
+
+        results.append({
+            "cadet_id": inspection.cadet_id,
+            "cadet_nom": cadet["nom"],
+            "cadet_prenom": cadet["prenom"],
+            "success": True,
+            "inspection_id": inspection_data.id,
+            "total_score": total_score,
+            "auto_marked_present": auto_marked_present
+        })
+
+    if presence_ops:
+        await db.presences.bulk_write(presence_ops, ordered=False)
+        await bump_data_version("presences")
+    if inspection_ops:
+        await db.uniform_inspections.bulk_write(inspection_ops, ordered=False)
+        await bump_data_version("uniform_inspections")
+
+    return {
+        "date": inspection_date,
+        "created_count": len(inspection_ops),
+        "auto_marked_present_count": sum(1 for r in results if r.get("auto_marked_present")),
+        "error_count": sum(1 for r in results if not r["success"]),
+        "results": results
+    }
+
 @api_router.get("/uniform-inspections", response_model=List[UniformInspectionResponse])
 async def get_uniform_inspections(
     date: Optional[date] = None,
     cadet_id: Optional[str] = None,
     section_id: Optional[str] = None,
     limit: int = 100,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    loader: RequestLoader = Depends(get_request_loader)
 ):
     """Récupérer les inspections d'uniformes avec filtres"""
     # Construire le filtre selon les permissions
@@ -3064,22 +4043,28 @@ async def get_uniform_inspections(
     inspections_cursor = db.uniform_inspections.find(filter_dict).limit(limit).sort("date", -1)
     inspections = await inspections_cursor.to_list(limit)
     
+    # Résoudre cadets, inspecteurs et sections en une requête par collection
+    users_by_id = await loader.users(
+        [insp["cadet_id"] for insp in inspections] + [insp["inspected_by"] for insp in inspections]
+    )
+    sections_by_id = await loader.sections([insp.get("section_id") for insp in inspections])
+    
     # Enrichir avec les informations des cadets, inspecteurs et sections
     enriched_inspections = []
     for inspection in inspections:
         # Récupérer les infos du cadet
-        cadet = await db.users.find_one({"id": inspection["cadet_id"]})
+        cadet = users_by_id.get(inspection["cadet_id"])
         if not cadet:
             continue
         
         # Récupérer les infos de l'inspecteur
-        inspector = await db.users.find_one({"id": inspection["inspected_by"]})
+        inspector = users_by_id.get(inspection["inspected_by"])
         inspector_name = f"{inspector['prenom']} {inspector['nom']}" if inspector else "Inconnu"
         
         # Récupérer les infos de la section si applicable
         section_nom = None
         if inspection.get("section_id"):
-            section = await db.sections.find_one({"id": inspection["section_id"]})
+            section = sections_by_id.get(inspection["section_id"])
             if section:
                 section_nom = section["nom"]
         
@@ -3107,7 +4092,10 @@ async def get_uniform_inspections(
     return enriched_inspections
 
 @api_router.get("/uniform-inspections/stats/me", response_model=InspectionStatsResponse)
-async def get_my_inspection_stats(current_user: User = Depends(get_current_user)):
+async def get_my_inspection_stats(
+    current_user: User = Depends(get_current_user),
+    loader: RequestLoader = Depends(get_request_loader)
+):
     """
     Récupérer les statistiques d'inspection personnelles d'un cadet
     et les comparer avec les moyennes de section et d'escadron
@@ -3146,16 +4134,20 @@ async def get_my_inspection_stats(current_user: User = Depends(get_current_user)
         squadron_average = total_squadron_score / len(squadron_inspections)
     
     # Préparer les 10 dernières inspections avec enrichissement
+    recent = my_inspections[:10]
+    inspectors_by_id = await loader.users([insp["inspected_by"] for insp in recent])
+    sections_by_id = await loader.sections([insp.get("section_id") for insp in recent])
+    
     recent_inspections = []
-    for inspection in my_inspections[:10]:
+    for inspection in recent:
         # Récupérer les infos de l'inspecteur
-        inspector = await db.users.find_one({"id": inspection["inspected_by"]})
+        inspector = inspectors_by_id.get(inspection["inspected_by"])
         inspector_name = f"{inspector['prenom']} {inspector['nom']}" if inspector else "Inconnu"
         
         # Récupérer les infos de la section
         section_nom = None
         if inspection.get("section_id"):
-            section = await db.sections.find_one({"id": inspection["section_id"]})
+            section = sections_by_id.get(inspection["section_id"])
             if section:
                 section_nom = section["nom"]
         
@@ -3193,70 +4185,260 @@ async def get_my_inspection_stats(current_user: User = Depends(get_current_user)
         worst_score=round(worst_score, 2) if total_inspections > 0 else 0.0
     )
 
-@api_router.get("/organigram/public")
-async def get_public_organigram(current_user: User = Depends(get_current_user)):
+# Analyse des critères d'inspection
+# Regroupement temporel appliqué à la date (chaîne YYYY-MM-DD) des inspections
+CRITERIA_ANALYTICS_PERIODS = {
+    "day": "$date",
+    "week": {"$dateToString": {"format": "%G-W%V", "date": {"$dateFromString": {"dateString": "$date"}}}},
+    "month": {"$substrBytes": ["$date", 0, 7]},
+    "year": {"$substrBytes": ["$date", 0, 4]},
+    "all": {"$literal": "all"},
+}
+
+criteria_analytics_cache = LRUCache(max_entries=64)
+
+@api_router.get("/uniform-inspections/analytics/criteria")
+async def get_criteria_analytics(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    section_id: Optional[str] = None,
+    uniform_type: Optional[str] = None,
+    period: str = "month",
+    failure_threshold: int = 2,
+    current_user: User = Depends(require_inspection_permissions),
+    loader: RequestLoader = Depends(get_request_loader)
+):
     """
-    Récupérer les données de l'organigrame pour tous les utilisateurs authentifiés (lecture seule)
-    Retourne: users, sections, roles, subgroups
+    Analyse par critère des inspections d'uniformes
+    - Taux d'échec (score < failure_threshold) et score moyen par critère
+    - Ventilation par section, type de tenue et période (day, week, month, year, all)
+    - Résultat mis en cache tant que les inspections et sections ne changent pas
+    - Les chefs de section ne voient que leur section
     """
-    try:
-        # Récupérer tous les utilisateurs actifs
-        users_cursor = db.users.find({"actif": True})
-        users_list = await users_cursor.to_list(1000)
-        
-        # Récupérer toutes les sections
-        sections_cursor = db.sections.find()
-        sections_list = await sections_cursor.to_list(1000)
-        
-        # Récupérer tous les rôles
-        roles_cursor = db.roles.find()
-        roles_list = await roles_cursor.to_list(1000)
-        
-        # Récupérer tous les sous-groupes
-        all_subgroups = []
-        for section in sections_list:
-            subgroups_cursor = db.subgroups.find({"section_id": section["id"]})
-            subgroups = await subgroups_cursor.to_list(1000)
-            all_subgroups.extend(subgroups)
-        
-        # Supprimer le champ _id de MongoDB pour éviter les erreurs de sérialisation
-        for item in users_list:
-            item.pop('_id', None)
-        for item in sections_list:
-            item.pop('_id', None)
-        for item in roles_list:
-            item.pop('_id', None)
-        for item in all_subgroups:
-            item.pop('_id', None)
-        
-        return {
-            "users": users_list,
-            "sections": sections_list,
-            "roles": roles_list,
-            "subgroups": all_subgroups
-        }
-    except Exception as e:
-        logger.error(f"Erreur lors de la récupération de l'organigrame: {e}")
+    if period not in CRITERIA_ANALYTICS_PERIODS:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Erreur lors de la récupération de l'organigrame"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Période invalide. Valeurs possibles: {', '.join(CRITERIA_ANALYTICS_PERIODS)}"
         )
+    
+    if is_section_leader(current_user):
+        if section_id and section_id != current_user.section_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Vous ne pouvez consulter que les inspections de votre section"
+            )
+        section_id = current_user.section_id
 
-# Route de test
-@api_router.get("/")
-async def root():
-    return {"message": "API Gestion Escadron Cadets - v1.0.0"}
+    versions = await get_data_versions("uniform_inspections", "sections")
+    cache_key = (
+        start_date, end_date, section_id, uniform_type, period, failure_threshold,
+        tuple(sorted(versions.items()))
+    )
+    cached = criteria_analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    match = {}
+    if start_date or end_date:
+        match["date"] = {}
+        if start_date:
+            match["date"]["$gte"] = start_date.isoformat()
+        if end_date:
+            match["date"]["$lte"] = end_date.isoformat()
+    if section_id:
+        match["section_id"] = section_id
+    if uniform_type:
+        match["uniform_type"] = uniform_type
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "section_id": 1,
+            "uniform_type": 1,
+            "period": CRITERIA_ANALYTICS_PERIODS[period],
+            "criteria": {"$objectToArray": {"$ifNull": ["$criteria_scores", {}]}}
+        }},
+        {"$unwind": "$criteria"},
+        {"$group": {
+            "_id": {
+                "criterion": "$criteria.k",
+                "section_id": "$section_id",
+                "uniform_type": "$uniform_type",
+                "period": "$period"
+            },
+            "evaluations": {"$sum": 1},
+            "failures": {"$sum": {"$cond": [{"$lt": ["$criteria.v", failure_threshold]}, 1, 0]}},
+            "total_score": {"$sum": "$criteria.v"}
+        }},
+        {"$sort": {"_id.period": 1, "_id.criterion": 1}}
+    ]
+    groups = await db.uniform_inspections.aggregate(pipeline).to_list(None)
+
+    sections_by_id = await loader.sections([g["_id"].get("section_id") for g in groups])
+
+    breakdown = []
+    by_criterion = {}
+    for group in groups:
+        key = group["_id"]
+        evaluations = group["evaluations"]
+        section_ref = key.get("section_id")
+        if section_ref == "etat-major-virtual":
+            section_nom = "⭐ État-Major"
+        else:
+            section_nom = sections_by_id[section_ref]["nom"] if section_ref in sections_by_id else None
+
+        breakdown.append({
+            "criterion": key["criterion"],
+            "section_id": section_ref,
+            "section_nom": section_nom,
+            "uniform_type": key.get("uniform_type"),
+            "period": key.get("period"),
+            "evaluations": evaluations,
+            "failures": group["failures"],
+            "failure_rate": round(group["failures"] / evaluations * 100, 2),
+            "mean_score": round(group["total_score"] / evaluations, 2)
+        })
 
-# ============================================================================
+        totals = by_criterion.setdefault(key["criterion"], {"evaluations": 0, "failures": 0, "total_score": 0})
+        totals["evaluations"] += evaluations
+        totals["failures"] += group["failures"]
+        totals["total_score"] += group["total_score"]
 
-# ============================================================================
-# SYSTÈME D'IMPORT/EXPORT EXCEL
-# ============================================================================
+    criteria = [
+        {
+            "criterion": criterion,
+            "evaluations": totals["evaluations"],
+            "failures": totals["failures"],
+            "failure_rate": round(totals["failures"] / totals["evaluations"] * 100, 2),
+            "mean_score": round(totals["total_score"] / totals["evaluations"], 2)
+        }
+        for criterion, totals in by_criterion.items()
+    ]
+    # Les critères les plus souvent échoués en premier
+    criteria.sort(key=lambda c: (-c["failure_rate"], c["mean_score"]))
 
-# Mapping des acronymes vers les grades du système
-GRADE_MAPPING = {
-    "cdt": "cadet",
-    "cdt 1": "cadet_air_1re_classe",
+    result = {
+        "period": period,
+        "failure_threshold": failure_threshold,
+        "criteria": criteria,
+        "breakdown": breakdown,
+        "data_version": versions["uniform_inspections"]
+    }
+    criteria_analytics_cache.set(cache_key, result)
+    return result
+
+# Organigramme: arbre section → sous-groupe → membres construit une fois par version des données
+ORGANIGRAM_USER_FIELDS = {
+    "_id": 0, "id": 1, "nom": 1, "prenom": 1, "username": 1, "email": 1, "grade": 1,
+    "role": 1, "section_id": 1, "subgroup_id": 1, "actif": 1, "has_admin_privileges": 1
+}
+ORGANIGRAM_COLLECTIONS = ("users", "sections", "subgroups", "roles")
+
+organigram_cache = LRUCache(max_entries=4)
+organigram_lock = asyncio.Lock()
+
+def build_organigram_tree(users: List[dict], sections: List[dict], subgroups: List[dict]) -> dict:
+    """Assemble l'arbre imbriqué; les membres sont triés par nom puis prénom"""
+    def member_sort_key(user: dict):
+        return (user.get("nom", "").lower(), user.get("prenom", "").lower())
+    
+    members_by_section: Dict[Optional[str], List[dict]] = {}
+    members_by_subgroup: Dict[str, List[dict]] = {}
+    subgroup_ids = {subgroup["id"] for subgroup in subgroups}
+    for user in sorted(users, key=member_sort_key):
+        if user.get("subgroup_id") in subgroup_ids:
+            members_by_subgroup.setdefault(user["subgroup_id"], []).append(user)
+        else:
+            members_by_section.setdefault(user.get("section_id"), []).append(user)
+    
+    subgroups_by_section: Dict[str, List[dict]] = {}
+    for subgroup in sorted(subgroups, key=lambda sg: sg.get("nom", "").lower()):
+        subgroups_by_section.setdefault(subgroup["section_id"], []).append({
+            **subgroup,
+            "members": members_by_subgroup.get(subgroup["id"], []),
+            "member_count": len(members_by_subgroup.get(subgroup["id"], []))
+        })
+    
+    tree_sections = []
+    for section in sorted(sections, key=lambda s: s.get("nom", "").lower()):
+        section_subgroups = subgroups_by_section.get(section["id"], [])
+        members = members_by_section.get(section["id"], [])
+        tree_sections.append({
+            **section,
+            "members": members,
+            "subgroups": section_subgroups,
+            "member_count": len(members) + sum(sg["member_count"] for sg in section_subgroups)
+        })
+    
+    section_ids = {section["id"] for section in sections}
+    unassigned = [
+        user for section_id, members in members_by_section.items()
+        if section_id not in section_ids for user in members
+    ]
+    return {"sections": tree_sections, "unassigned": sorted(unassigned, key=member_sort_key)}
+
+async def load_organigram(versions: Dict[str, int]) -> dict:
+    """Une requête par collection: utilisateurs projetés, sections, sous-groupes ($in) et rôles"""
+    users_list = await db.users.find({"actif": True}, ORGANIGRAM_USER_FIELDS).to_list(None)
+    sections_list = await db.sections.find({}, {"_id": 0}).to_list(None)
+    roles_list = await db.roles.find({}, {"_id": 0}).to_list(None)
+    subgroups_list = await db.subgroups.find(
+        {"section_id": {"$in": [section["id"] for section in sections_list]}}, {"_id": 0}
+    ).to_list(None)
+    
+    return {
+        "users": users_list,
+        "sections": sections_list,
+        "roles": roles_list,
+        "subgroups": subgroups_list,
+        "tree": build_organigram_tree(users_list, sections_list, subgroups_list),
+        "data_version": versions
+    }
+
+@api_router.get("/organigram/public")
+async def get_public_organigram(current_user: User = Depends(get_current_user)):
+    """
+    Récupérer les données de l'organigrame pour tous les utilisateurs authentifiés (lecture seule)
+    Retourne: users, sections, roles, subgroups (listes plates) et tree (arbre imbriqué)
+    Mis en cache jusqu'à la prochaine écriture sur les utilisateurs, sections, sous-groupes ou rôles
+    """
+    try:
+        versions = await get_data_versions(*ORGANIGRAM_COLLECTIONS)
+        cache_key = tuple(versions[name] for name in ORGANIGRAM_COLLECTIONS)
+        organigram = organigram_cache.get(cache_key)
+        if organigram is not None:
+            return organigram
+        
+        # Une seule construction à la fois: les requêtes concurrentes réutilisent le résultat
+        async with organigram_lock:
+            organigram = organigram_cache.get(cache_key)
+            if organigram is None:
+                organigram = await load_organigram(versions)
+                organigram_cache.set(cache_key, organigram)
+        return organigram
+    except Exception as e:
+        logger.error(f"Erreur lors de la récupération de l'organigrame: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Erreur lors de la récupération de l'organigrame"
+        )
+
+# Route de test
+@api_router.get("/")
+async def root():
+    return {"message": "API Gestion Escadron Cadets - v1.0.0"}
+
+# ============================================================================
+
+# ============================================================================
+# SYSTÈME D'IMPORT/EXPORT EXCEL
+# ============================================================================
+
+# Mapping des acronymes vers les grades du système
+GRADE_MAPPING = {
+    "cdt": "cadet",
+    "cdt 1": "cadet_air_1re_classe",
     "cpl": "caporal",
     "cpls": "caporal_section",
     "sgt": "sergent",
@@ -3274,7 +4456,9 @@ class ImportPreviewResponse(BaseModel):
     new_sections: List[str]
 
 class ImportConfirmRequest(BaseModel):
-    changes: List[Dict]
+    import_token: Optional[str] = None  # Session créée par la prévisualisation
+    excluded_rows: List[int] = []  # Lignes du fichier à ne pas appliquer
+    changes: Optional[List[Dict]] = None  # Ancien format: plan complet renvoyé par le client
     create_sections: bool = True
 
 class IndividualReportRequest(BaseModel):
@@ -3301,23 +4485,175 @@ async def generate_unique_username(prenom: str, nom: str, db_instance) -> str:
             return new_username
         counter += 1
 
-# Fonction pour parser le fichier Excel
-async def parse_excel_file(file_content: bytes) -> List[Dict]:
+# Import: colonnes attendues et limites
+IMPORT_REQUIRED_COLUMNS = ['Nom', 'Prénom', 'Grade', 'Groupe']
+IMPORT_MAX_UPLOAD_BYTES = int(os.environ.get('IMPORT_MAX_UPLOAD_MB', 10)) * 1024 * 1024
+IMPORT_SESSION_TTL_MINUTES = int(os.environ.get('IMPORT_SESSION_TTL_MINUTES', 30))
+IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', 5000))
+# Une annulation "reverting" plus ancienne est considérée interrompue et peut être reprise
+IMPORT_REVERT_LEASE_MINUTES = int(os.environ.get('IMPORT_REVERT_LEASE_MINUTES', 10))
+ETAT_MAJOR_ALIASES = ['état major', 'etat major', 'état-major', 'etat-major']
+
+class ImportParseResult:
+    """Lignes valides et erreurs trouvées lors de la lecture du fichier"""
+    
+    def __init__(self):
+        self.rows: List[Dict] = []
+        self.errors: List[Dict] = []
+        self.total_rows = 0
+
+def detect_import_format(fileobj) -> str:
+    signature = fileobj.read(8)
+    fileobj.seek(0)
+    if signature.startswith(b"PK"):
+        return "xlsx"
+    if signature.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    return "csv"
+
+def iter_xlsx_rows(fileobj):
+    # read_only: les lignes sont lues au fil de l'eau depuis l'archive
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
     try:
-        df = pd.read_excel(BytesIO(file_content))
-        required_cols = ['Nom', 'Prénom', 'Grade', 'Groupe']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        
-        if missing_cols:
-            raise ValueError(f"Colonnes manquantes: {', '.join(missing_cols)}")
-        
-        df = df[required_cols]
-        df = df.dropna(subset=['Nom', 'Prénom', 'Grade', 'Groupe'])
-        cadets = df.to_dict('records')
-        
-        return cadets
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+def iter_xls_rows(fileobj):
+    # Ancien format binaire: xlrd doit charger le fichier (limité à 65 536 lignes)
+    try:
+        import xlrd
+    except ImportError:
+        raise ValueError("format .xls non pris en charge, utilisez .xlsx")
+    book = xlrd.open_workbook(file_contents=fileobj.read(), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        for index in range(sheet.nrows):
+            yield sheet.row_values(index)
+    finally:
+        book.release_resources()
+
+def iter_csv_rows(fileobj):
+    # UTF-8 (avec ou sans BOM), sinon Windows-1252 (export Excel français)
+    sample = fileobj.read(64 * 1024)
+    fileobj.seek(0)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "cp1252"
+    
+    text = io.TextIOWrapper(fileobj, encoding=encoding, newline="")
+    try:
+        try:
+            dialect = csv.Sniffer().sniff(text.read(4096), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        text.seek(0)
+        for row in csv.reader(text, dialect):
+            yield row
+    finally:
+        # Ne pas fermer le fichier téléversé avec le wrapper
+        text.detach()
+
+def import_cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return unicodedata.normalize('NFC', str(value)).strip()
+
+def validate_import_row(row_number: int, record: Dict[str, str], result: ImportParseResult) -> None:
+    nom, prenom = record['Nom'], record['Prénom']
+    
+    missing = [col for col in IMPORT_REQUIRED_COLUMNS if not record[col]]
+    if missing:
+        result.errors.append({
+            'row': row_number,
+            'nom': nom,
+            'prenom': prenom,
+            'error': f"Champs manquants: {', '.join(missing)}"
+        })
+        return
+    
+    grade_acronym = record['Grade']
+    if grade_acronym not in GRADE_MAPPING:
+        result.errors.append({
+            'row': row_number,
+            'nom': nom,
+            'prenom': prenom,
+            'error': f"Grade inconnu: {grade_acronym}"
+        })
+        return
+    
+    # Mapper "État major" (avec espace) vers "État-Major" (avec tiret)
+    # Pour correspondre au groupe virtuel déjà créé
+    section_name = record['Groupe']
+    if section_name.lower() in ETAT_MAJOR_ALIASES:
+        section_name = 'État-Major'
+    
+    result.rows.append({
+        'row': row_number,
+        'nom': nom,
+        'prenom': prenom,
+        'grade': GRADE_MAPPING[grade_acronym],
+        'section': section_name
+    })
+
+def parse_import_file(fileobj) -> ImportParseResult:
+    """
+    Lit un fichier xlsx, xls ou csv ligne par ligne et valide chaque ligne
+    Fonction bloquante: à exécuter hors de la boucle d'événements
+    Toute erreur de lecture (archive tronquée, CSV mal formé, .xls endommagé)
+    est convertie en ValueError, présentée comme une erreur 400
+    """
+    try:
+        return read_import_rows(fileobj)
+    except ValueError:
+        raise
     except Exception as e:
-        raise ValueError(f"Erreur lors de la lecture du fichier Excel: {str(e)}")
+        raise ValueError(f"Fichier illisible ou corrompu: {str(e)}")
+
+def read_import_rows(fileobj) -> ImportParseResult:
+    readers = {"xlsx": iter_xlsx_rows, "xls": iter_xls_rows, "csv": iter_csv_rows}
+    rows = readers[detect_import_format(fileobj)](fileobj)
+    
+    result = ImportParseResult()
+    columns = None
+    try:
+        for row_number, values in enumerate(rows, start=1):
+            cells = [import_cell_text(value) for value in values]
+            
+            # La première ligne contient les en-têtes
+            if columns is None:
+                columns = {}
+                for index, name in enumerate(cells):
+                    if name and name not in columns:
+                        columns[name] = index
+                missing_cols = [col for col in IMPORT_REQUIRED_COLUMNS if col not in columns]
+                if missing_cols:
+                    raise ValueError(f"Colonnes manquantes: {', '.join(missing_cols)}")
+                continue
+            
+            record = {
+                col: cells[columns[col]] if columns[col] < len(cells) else ""
+                for col in IMPORT_REQUIRED_COLUMNS
+            }
+            if not any(record.values()):
+                continue  # Ligne vide
+            
+            result.total_rows += 1
+            if result.total_rows > IMPORT_MAX_ROWS:
+                raise ValueError(f"Fichier trop volumineux: {IMPORT_MAX_ROWS} lignes maximum")
+            
+            validate_import_row(row_number, record, result)
+    finally:
+        rows.close()
+    
+    if columns is None:
+        raise ValueError("Fichier vide")
+    return result
 
 # Endpoint: Prévisualiser l'import Excel
 @api_router.post("/import/cadets/preview")
@@ -3325,60 +4661,68 @@ async def preview_import_cadets(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
-    """Prévisualise l'import d'un fichier Excel de cadets"""
+    """
+    Prévisualise l'import d'un fichier de cadets (xlsx, xls ou csv)
+    Le fichier téléversé est déjà mis en tampon sur disque par Starlette:
+    il est lu directement, par blocs, dans un thread de travail
+    """
     # Vérifier les permissions
     if not any(role in current_user.role.lower() for role in ['cadet_admin', 'encadrement']):
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
     try:
         logger.info(f"Import preview - Fichier reçu: {file.filename}, type: {file.content_type}")
-        content = await file.read()
-        logger.info(f"Import preview - Taille du fichier: {len(content)} bytes")
-        cadets_data = await parse_excel_file(content)
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+        file.file.seek(0)
+        logger.info(f"Import preview - Taille du fichier: {size} bytes")
+        
+        if size > IMPORT_MAX_UPLOAD_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Fichier trop volumineux ({IMPORT_MAX_UPLOAD_BYTES // (1024 * 1024)} Mo maximum)"
+            )
         
-        existing_users = await db.users.find().to_list(1000)
+        try:
+            parsed = await asyncio.to_thread(parse_import_file, file.file)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Erreur lors de la lecture du fichier: {str(e)}")
+        
+        # Seuls les utilisateurs dont la clé de nom figure dans le fichier sont chargés (index name_key),
+        # plus ceux encore sans clé (créés par un script avant le rattrapage au démarrage)
+        name_keys = list({make_name_key(row['prenom'], row['nom']) for row in parsed.rows})
+        existing_users = await db.users.find(
+            {"$or": [{"name_key": {"$in": name_keys}}, {"name_key": {"$exists": False}}]},
+            {"_id": 0, "name_key": 1, "prenom": 1, "nom": 1, "username": 1, "grade": 1, "section_id": 1}
+        ).to_list(None)
         existing_sections = await db.sections.find().to_list(100)
         
-        users_by_name = {f"{u['prenom'].lower()}.{u['nom'].lower()}": u for u in existing_users}
+        users_by_name = {
+            u.get('name_key') or make_name_key(u.get('prenom'), u.get('nom')): u
+            for u in existing_users
+        }
         sections_by_name = {s['nom'].lower(): s for s in existing_sections}
         
         new_cadets = []
         updated_cadets = []
-        errors = []
+        errors = list(parsed.errors)
         new_sections = set()
         
-        for idx, cadet_data in enumerate(cadets_data, start=2):
+        for cadet_data in parsed.rows:
+            idx = cadet_data['row']
             try:
-                nom = cadet_data['Nom'].strip()
-                prenom = cadet_data['Prénom'].strip()
-                grade_acronym = cadet_data['Grade'].strip()
-                section_name_raw = cadet_data['Groupe'].strip()
+                nom = cadet_data['nom']
+                prenom = cadet_data['prenom']
+                grade = cadet_data['grade']
+                section_name = cadet_data['section']
                 
-                # Mapper "État major" (avec espace) vers "État-Major" (avec tiret)
-                # Pour correspondre au groupe virtuel déjà créé
-                if section_name_raw.lower() in ['état major', 'etat major', 'état-major', 'etat-major']:
-                    section_name = 'État-Major'
-                else:
-                    section_name = section_name_raw
-                
-                if grade_acronym not in GRADE_MAPPING:
-                    errors.append({
-                        'row': idx,
-                        'nom': nom,
-                        'prenom': prenom,
-                        'error': f"Grade inconnu: {grade_acronym}"
-                    })
-                    continue
-                
-                grade = GRADE_MAPPING[grade_acronym]
                 section_lower = section_name.lower()
                 section_exists = section_lower in sections_by_name
                 
                 if not section_exists:
                     new_sections.add(section_name)
                 
-                key = f"{prenom.lower()}.{nom.lower()}"
-                existing_user = users_by_name.get(key)
+                existing_user = users_by_name.get(make_name_key(prenom, nom))
                 
                 if existing_user:
                     changes = []
@@ -3422,14 +4766,43 @@ async def preview_import_cadets(
                     'error': f"Erreur: {str(e)}"
                 })
         
+        errors.sort(key=lambda error: error['row'])
+        
+        # Plan validé conservé côté serveur: la confirmation n'envoie que le jeton
+        import_token = secrets.token_urlsafe(32)
+        expires_at = datetime.utcnow() + timedelta(minutes=IMPORT_SESSION_TTL_MINUTES)
+        await db.import_sessions.insert_one({
+            "token": import_token,
+            "status": "pending",
+            "created_by": current_user.id,
+            "created_at": datetime.utcnow().isoformat(),
+            "expires_at": expires_at,
+            "changes": [
+                {"type": "new", **cadet} for cadet in new_cadets
+            ] + [
+                {
+                    "type": "update",
+                    "row": cadet['row'],
+                    "username": cadet['username'],
+                    "new_grade": cadet['new_grade'],
+                    "new_section": cadet['new_section']
+                }
+                for cadet in updated_cadets
+            ]
+        })
+        
         return {
-            "total_rows": len(cadets_data),
+            "import_token": import_token,
+            "import_token_expires_at": expires_at.isoformat(),
+            "total_rows": parsed.total_rows,
             "new_cadets": new_cadets,
             "updated_cadets": updated_cadets,
             "errors": errors,
             "new_sections": list(new_sections)
         }
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur prévisualisation import: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
@@ -3440,39 +4813,86 @@ async def confirm_import_cadets(
     request: ImportConfirmRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """Confirme et applique l'import de cadets"""
+    """
+    Confirme et applique l'import de cadets
+    Avec import_token, le plan enregistré lors de la prévisualisation est appliqué
+    tel quel (moins les lignes exclues); l'ancien format `changes` reste accepté.
+    Les écritures sont groupées (bulk_write non ordonné par collection) et chaque
+    document touché est marqué avec l'identifiant du lot pour permettre l'annulation
+    """
     # Vérifier les permissions
     if not any(role in current_user.role.lower() for role in ['cadet_admin', 'encadrement']):
         raise HTTPException(status_code=403, detail="Permissions insuffisantes")
     
+    session = None
+    if request.import_token:
+        # Réservation atomique: une session ne peut être appliquée qu'une fois
+        session = await db.import_sessions.find_one_and_update(
+            {
+                "token": request.import_token,
+                "created_by": current_user.id,
+                "status": "pending",
+                "expires_at": {"$gt": datetime.utcnow()}
+            },
+            {"$set": {"status": "applying"}}
+        )
+        if not session:
+            raise HTTPException(status_code=404, detail="Session d'import introuvable ou expirée, veuillez relancer la prévisualisation")
+        excluded_rows = set(request.excluded_rows)
+        changes = [c for c in session["changes"] if c.get('row') not in excluded_rows]
+    elif request.changes is not None:
+        changes = request.changes
+    else:
+        raise HTTPException(status_code=400, detail="import_token ou changes requis")
+    
     try:
+        batch_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        
         existing_sections = await db.sections.find().to_list(100)
         sections_by_name = {s['nom'].lower(): s for s in existing_sections}
         
         new_sections_created = []
-        cadets_created = []
-        cadets_updated = []
+        created_section_ids = []
+        section_ops = []
         
         if request.create_sections:
             new_section_names = set()
-            for change in request.changes:
+            for change in changes:
                 if change.get('type') in ['new', 'update']:
-                    section_name = change.get('section')
+                    section_name = change.get('section') or change.get('new_section')
                     if section_name and section_name.lower() not in sections_by_name:
                         new_section_names.add(section_name)
             
-            for section_name in new_section_names:
-                section_id = str(uuid.uuid4())
+            for section_name in sorted(new_section_names):
                 new_section = {
-                    "id": section_id,
+                    "id": str(uuid.uuid4()),
                     "nom": section_name,
-                    "created_at": datetime.now().isoformat()
+                    "created_at": now,
+                    "import_batch_id": batch_id
                 }
-                await db.sections.insert_one(new_section)
+                section_ops.append(InsertOne(new_section))
+                created_section_ids.append(new_section['id'])
                 sections_by_name[section_name.lower()] = new_section
                 new_sections_created.append(section_name)
         
-        for change in request.changes:
+        # Utilisateurs existants visés par des mises à jour (une seule requête)
+        update_usernames = [c['username'] for c in changes if c.get('type') == 'update']
+        users_by_username = {}
+        if update_usernames:
+            existing_users = await db.users.find(
+                {"username": {"$in": update_usernames}},
+                {"_id": 0, "id": 1, "username": 1, "grade": 1, "section_id": 1, "import_batch_id": 1}
+            ).to_list(None)
+            users_by_username = {u['username']: u for u in existing_users}
+        
+        user_ops = []
+        cadets_created = []
+        created_user_ids = []
+        cadets_updated = []
+        pre_images = []
+        
+        for change in changes:
             change_type = change.get('type')
             
             if change_type == 'new':
@@ -3492,6 +4912,7 @@ async def confirm_import_cadets(
                     "email": None,  # Email optionnel - non utilisé pour les cadets importés
                     "nom": nom,
                     "prenom": prenom,
+                    **make_name_keys(prenom, nom),
                     "grade": grade,
                     "role": "cadet",
                     "section_id": section_id,
@@ -3501,17 +4922,23 @@ async def confirm_import_cadets(
                     "has_admin_privileges": False,
                     "hashed_password": None,
                     "must_change_password": True,
-                    "created_at": datetime.now().isoformat(),
+                    "created_at": now,
                     "invitation_token": None,
                     "invitation_expires": None,
-                    "created_by": current_user.username
+                    "created_by": current_user.username,
+                    "import_batch_id": batch_id
                 }
                 
-                await db.users.insert_one(new_user)
+                user_ops.append(InsertOne(new_user))
                 cadets_created.append(username)
+                created_user_ids.append(user_id)
                 
             elif change_type == 'update':
                 username = change['username']
+                existing_user = users_by_username.get(username)
+                if not existing_user:
+                    continue
+                
                 new_grade = change.get('new_grade')
                 new_section = change.get('new_section')
                 
@@ -3526,14 +4953,55 @@ async def confirm_import_cadets(
                         update_fields['section_id'] = section['id']
                 
                 if update_fields:
-                    await db.users.update_one(
-                        {"username": username},
-                        {"$set": update_fields}
-                    )
+                    # Pré-image: valeurs d'avant l'import pour pouvoir les restaurer,
+                    # et valeurs appliquées pour détecter les modifications ultérieures
+                    restored_fields = list(update_fields) + ['import_batch_id']
+                    pre_images.append({
+                        "id": existing_user['id'],
+                        "set": {f: existing_user[f] for f in restored_fields if f in existing_user},
+                        "unset": [f for f in restored_fields if f not in existing_user],
+                        "applied": update_fields
+                    })
+                    user_ops.append(UpdateOne(
+                        {"id": existing_user['id']},
+                        {"$set": {**update_fields, "import_batch_id": batch_id}}
+                    ))
                     cadets_updated.append(username)
         
+        # Le lot est enregistré avant les écritures: un import interrompu reste annulable
+        await db.import_batches.insert_one({
+            "id": batch_id,
+            "status": "applying",
+            "created_at": now,
+            "created_by": current_user.id,
+            "created_section_ids": created_section_ids,
+            "created_user_ids": created_user_ids,
+            "pre_images": pre_images,
+            "cadets_created": len(cadets_created),
+            "cadets_updated": len(cadets_updated),
+            "sections_created": len(new_sections_created)
+        })
+        
+        if section_ops:
+            await db.sections.bulk_write(section_ops, ordered=False)
+            await bump_data_version("sections")
+        if user_ops:
+            await db.users.bulk_write(user_ops, ordered=False)
+            await bump_data_version("users")
+        
+        await db.import_batches.update_one(
+            {"id": batch_id},
+            {"$set": {"status": "applied"}}
+        )
+        if session:
+            await db.import_sessions.update_one(
+                {"token": session["token"]},
+                {"$set": {"status": "applied", "import_batch_id": batch_id}}
+            )
+        
         return {
             "success": True,
+            "import_batch_id": batch_id,
             "new_sections_created": new_sections_created,
             "cadets_created": len(cadets_created),
             "cadets_updated": len(cadets_updated),
@@ -3544,9 +5012,154 @@ async def confirm_import_cadets(
         }
         
     except Exception as e:
+        if session:
+            # Libérer la session pour permettre une nouvelle tentative
+            await db.import_sessions.update_one(
+                {"token": session["token"], "status": "applying"},
+                {"$set": {"status": "pending"}}
+            )
         logger.error(f"Erreur confirmation import: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
+@api_router.get("/import/batches")
+async def get_import_batches(
+    limit: int = 20,
+    current_user: User = Depends(require_admin_or_encadrement)
+):
+    """Derniers lots d'import (les plus récents d'abord)"""
+    batches = await db.import_batches.find(
+        {},
+        {"_id": 0, "pre_images": 0, "created_user_ids": 0, "created_section_ids": 0}
+    ).sort("created_at", -1).to_list(min(max(limit, 1), 100))
+    return batches
+
+@api_router.post("/import/batches/{batch_id}/revert")
+async def revert_import_batch(
+    batch_id: str,
+    current_user: User = Depends(require_admin_or_encadrement)
+):
+    """
+    Annule un import complet
+    - Supprime les cadets créés (avec leurs présences, comme une suppression manuelle)
+    - Restaure les valeurs d'avant l'import des cadets mis à jour, seulement si
+      leurs valeurs actuelles sont encore celles appliquées par ce lot; les cadets
+      modifiés depuis (manuellement ou par un autre import) sont signalés en conflit
+    - Supprime les sections créées qui ne sont plus utilisées
+    Chaque étape filtre sur import_batch_id: relancer une annulation interrompue
+    ne modifie pas deux fois le même document. Une annulation en cours ("reverting")
+    n'est reprise qu'après expiration de son bail (IMPORT_REVERT_LEASE_MINUTES)
+    """
+    now = datetime.utcnow()
+    lease_expired_before = now - timedelta(minutes=IMPORT_REVERT_LEASE_MINUTES)
+    batch = await db.import_batches.find_one_and_update(
+        {"id": batch_id, "$or": [
+            {"status": {"$in": ["applying", "applied"]}},
+            {"status": "reverting", "reverting_at": {"$lt": lease_expired_before}},
+            {"status": "reverting", "reverting_at": {"$exists": False}}
+        ]},
+        {"$set": {"status": "reverting", "reverting_at": now}}
+    )
+    if not batch:
+        existing = await db.import_batches.find_one({"id": batch_id}, {"status": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Lot d'import non trouvé")
+        if existing["status"] == "reverting":
+            raise HTTPException(status_code=409, detail="Annulation de ce lot déjà en cours")
+        raise HTTPException(status_code=409, detail=f"Lot d'import déjà traité (statut: {existing['status']})")
+    
+    try:
+        users_deleted = 0
+        # Seuls les cadets encore marqués par ce lot sont supprimés: un cadet repris
+        # depuis par un autre import garde son compte, ses présences et ses activités
+        created_user_ids = []
+        if batch.get("created_user_ids"):
+            created_user_ids = await db.users.distinct("id", {
+                "id": {"$in": batch["created_user_ids"]},
+                "import_batch_id": batch_id
+            })
+        if created_user_ids:
+            await db.presences.delete_many({"cadet_id": {"$in": created_user_ids}})
+            await remove_activity_participants(created_user_ids)
+            # Supprimés en dernier: une reprise retrouve les cadets restants
+            result = await db.users.delete_many({
+                "id": {"$in": created_user_ids},
+                "import_batch_id": batch_id
+            })
+            users_deleted = result.deleted_count
+        
+        pre_images = batch.get("pre_images", [])
+        restore_ops = []
+        for pre_image in pre_images:
+            update = {}
+            if pre_image["set"]:
+                update["$set"] = pre_image["set"]
+            if pre_image["unset"]:
+                update["$unset"] = {field: "" for field in pre_image["unset"]}
+            # Le document n'est restauré que s'il n'a pas changé depuis l'import
+            restore_ops.append(UpdateOne(
+                {"id": pre_image["id"], "import_batch_id": batch_id, **pre_image.get("applied", {})},
+                update
+            ))
+        
+        users_restored = 0
+        conflicts = []
+        if restore_ops:
+            result = await db.users.bulk_write(restore_ops, ordered=False)
+            users_restored = result.modified_count
+            
+            # Conflits: cadets qui ne sont pas revenus à leur état d'avant l'import
+            # (les cadets déjà restaurés par une tentative précédente n'en font pas partie)
+            expected_batch_ids = {p["id"]: p["set"].get("import_batch_id") for p in pre_images}
+            current_users = await db.users.find(
+                {"id": {"$in": list(expected_batch_ids)}},
+                {"_id": 0, "id": 1, "username": 1, "import_batch_id": 1}
+            ).to_list(None)
+            conflicts = [
+                u["username"] for u in current_users
+                if u.get("import_batch_id") != expected_batch_ids[u["id"]]
+            ]
+        
+        sections_deleted = 0
+        created_section_ids = batch.get("created_section_ids", [])
+        if created_section_ids:
+            used_section_ids = await db.users.distinct("section_id", {"section_id": {"$in": created_section_ids}})
+            result = await db.sections.delete_many({
+                "id": {"$in": [sid for sid in created_section_ids if sid not in used_section_ids]},
+                "import_batch_id": batch_id
+            })
+            sections_deleted = result.deleted_count
+        
+        await bump_data_version("users", "sections", "presences")
+        
+        await db.import_batches.update_one(
+            {"id": batch_id},
+            {"$set": {
+                "status": "reverted",
+                "reverted_at": datetime.now().isoformat(),
+                "reverted_by": current_user.id,
+                "revert_conflicts": conflicts
+            }}
+        )
+        
+        return {
+            "success": True,
+            "import_batch_id": batch_id,
+            "cadets_deleted": users_deleted,
+            "cadets_restored": users_restored,
+            "sections_deleted": sections_deleted,
+            "conflicts": conflicts
+        }
+    
+    except Exception as e:
+        # Remettre le lot dans son état précédent et libérer le bail pour permettre
+        # une nouvelle tentative immédiate
+        await db.import_batches.update_one(
+            {"id": batch_id, "reverting_at": now},
+            {"$set": {"status": batch["status"]}, "$unset": {"reverting_at": ""}}
+        )
+        logger.error(f"Erreur annulation import: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
+
 # SYSTÈME DE RAPPORTS - Endpoints pour générer des rapports
 # ============================================================================
 
@@ -3555,12 +5168,22 @@ from reportlab.lib.pagesizes import letter, A4, landscape
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as ReportLabImage, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as ReportLabImage, PageBreak, Flowable
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas as pdf_canvas
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.linecharts import HorizontalLineChart
 import openpyxl
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from tempfile import SpooledTemporaryFile
+import shutil
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import zipfile
+from pypdf import PdfReader, PdfWriter
 
 # Modèles pour les requêtes de rapports
 class CadetsListRequest(BaseModel):
@@ -3582,29 +5205,105 @@ class InspectionStatsRequest(BaseModel):
 # Configuration
 LOGO_PATH = ROOT_DIR / "logo.png"
 
+# Exports volumineux: gardés en mémoire jusqu'à cette taille, puis sur disque
+REPORT_SPOOL_MAX_BYTES = int(os.environ.get('REPORT_SPOOL_MAX_MB', 8)) * 1024 * 1024
+REPORT_STREAM_CHUNK_SIZE = 64 * 1024
+
+# ============================================================================
+# OUTILS DE RENDU PARTAGÉS
+# ============================================================================
+
+# Logo réduit une seule fois par processus (150 px = 1 inch à 150 dpi, suffisant
+# pour l'impression) au lieu de relire et réencoder logo.png à chaque page
+REPORT_LOGO_PX = 150
+REPORT_LOGO_FORM = "report_logo"
+
+_report_logo_png: Optional[bytes] = None
+_report_logo_loaded = False
+
+# Feuille de styles de base et styles dérivés, construits une fois par processus
+REPORT_STYLES = getSampleStyleSheet()
+_report_style_cache: Dict[tuple, ParagraphStyle] = {}
+
+def get_report_logo_png() -> Optional[bytes]:
+    """PNG du logo redimensionné (None si le logo est absent)"""
+    global _report_logo_png, _report_logo_loaded
+    if not _report_logo_loaded:
+        _report_logo_loaded = True
+        if LOGO_PATH.exists():
+            try:
+                from PIL import Image as PILImage
+                with PILImage.open(LOGO_PATH) as logo:
+                    logo = logo.convert("RGBA")
+                    logo.thumbnail((REPORT_LOGO_PX, REPORT_LOGO_PX), PILImage.LANCZOS)
+                    output = BytesIO()
+                    logo.save(output, format="PNG", optimize=True)
+                _report_logo_png = output.getvalue()
+            except Exception:
+                _report_logo_png = LOGO_PATH.read_bytes()
+    return _report_logo_png
+
+def draw_report_logo(canvas, x: float, y: float, size: float) -> None:
+    """
+    Dessine le logo via un XObject de formulaire: l'image est intégrée une seule
+    fois par document et simplement référencée sur les pages suivantes
+    """
+    logo_png = get_report_logo_png()
+    if logo_png is None:
+        return
+    if not canvas.hasForm(REPORT_LOGO_FORM):
+        canvas.beginForm(REPORT_LOGO_FORM)
+        canvas.drawImage(ImageReader(BytesIO(logo_png)), 0, 0, width=inch, height=inch,
+                         preserveAspectRatio=True, mask='auto')
+        canvas.endForm()
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.scale(size / inch, size / inch)
+    canvas.doForm(REPORT_LOGO_FORM)
+    canvas.restoreState()
+
+def report_logo_flowable(size: float):
+    logo_png = get_report_logo_png()
+    if logo_png is None:
+        return None
+    return ReportLabImage(BytesIO(logo_png), width=size, height=size)
+
+def report_style(name: str, parent: str, **attrs) -> ParagraphStyle:
+    """ParagraphStyle dérivé d'un style de base, mis en cache par paramètres"""
+    key = (name, parent, tuple(sorted((k, repr(v)) for k, v in attrs.items())))
+    style = _report_style_cache.get(key)
+    if style is None:
+        style = ParagraphStyle(name, parent=REPORT_STYLES[parent], **attrs)
+        _report_style_cache[key] = style
+    return style
+
 # Fonctions utilitaires pour génération PDF
-def add_header_footer(canvas, doc, title: str):
-    """Ajoute en-tête et pied de page à chaque page"""
+def add_header_footer(canvas, doc, title: str, page_numbers: bool = True,
+                      generated_at: Optional[str] = None):
+    """
+    Ajoute en-tête et pied de page à chaque page
+    page_numbers=False: numérotation ajoutée après fusion (stamp_page_numbers)
+    """
     canvas.saveState()
     
     # En-tête
-    if LOGO_PATH.exists():
-        canvas.drawImage(str(LOGO_PATH), 0.75*inch, doc.height + 1.5*inch, width=0.75*inch, height=0.75*inch, preserveAspectRatio=True)
+    draw_report_logo(canvas, 0.75*inch, doc.height + 1.5*inch, 0.75*inch)
     
     canvas.setFont('Helvetica-Bold', 14)
     canvas.drawCentredString(doc.width/2 + doc.leftMargin, doc.height + 1.75*inch, title)
     
     canvas.setFont('Helvetica', 9)
-    date_str = datetime.now().strftime("%d/%m/%Y %H:%M")
+    date_str = generated_at or datetime.now().strftime("%d/%m/%Y %H:%M")
     canvas.drawCentredString(doc.width/2 + doc.leftMargin, doc.height + 1.5*inch, f"Généré le {date_str}")
     
     # Pied de page
-    canvas.setFont('Helvetica', 8)
-    canvas.drawCentredString(doc.width/2 + doc.leftMargin, 0.5*inch, f"Page {doc.page}")
+    if page_numbers:
+        canvas.setFont('Helvetica', 8)
+        canvas.drawCentredString(doc.width/2 + doc.leftMargin, 0.5*inch, f"Page {doc.page}")
     
     canvas.restoreState()
 
-async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], filter_info: str) -> BytesIO:
+def render_cadets_list_pdf(cadets: List[dict], sections: List[dict], filter_info: str) -> bytes:
     """Génère un PDF avec la liste des cadets - VERSION CORRIGÉE"""
     buffer = BytesIO()
     
@@ -3614,12 +5313,12 @@ async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], fil
                             leftMargin=1*inch, rightMargin=1*inch)  # Marges augmentées
     
     elements = []
-    styles = getSampleStyleSheet()
+    styles = REPORT_STYLES
     
     # Titre
-    title_style = ParagraphStyle(
+    title_style = report_style(
         'CustomTitle',
-        parent=styles['Heading1'],
+        'Heading1',
         fontSize=18,
         textColor=colors.HexColor('#1f2937'),
         spaceAfter=6,
@@ -3632,9 +5331,9 @@ async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], fil
     
     # FIX #1: Vérifier qu'il y a des cadets
     if not cadets or len(cadets) == 0:
-        no_data_style = ParagraphStyle(
+        no_data_style = report_style(
             'NoData',
-            parent=styles['Normal'],
+            'Normal',
             fontSize=14,
             textColor=colors.HexColor('#6b7280'),
             alignment=TA_CENTER
@@ -3644,8 +5343,7 @@ async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], fil
         # Build PDF
         doc.build(elements, onFirstPage=lambda c, d: add_header_footer(c, d, "LISTE DES CADETS"),
                   onLaterPages=lambda c, d: add_header_footer(c, d, "LISTE DES CADETS"))
-        buffer.seek(0)
-        return buffer
+        return buffer.getvalue()
     
     # Créer un dictionnaire des sections pour lookup rapide
     section_map = {s['id']: s['nom'] for s in sections}
@@ -3664,9 +5362,9 @@ async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], fil
         section_name = section_map.get(section_id, 'Sans section')
         
         # Titre de section
-        section_style = ParagraphStyle(
+        section_style = report_style(
             'SectionTitle',
-            parent=styles['Heading2'],
+            'Heading2',
             fontSize=14,
             textColor=colors.HexColor('#3b82f6'),
             spaceAfter=12
@@ -3724,14 +5422,41 @@ async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], fil
     doc.build(elements, onFirstPage=lambda c, d: add_header_footer(c, d, "LISTE DES CADETS"),
               onLaterPages=lambda c, d: add_header_footer(c, d, "LISTE DES CADETS"))
     
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
+
+
 
+# Au-delà de ce nombre de cadets, une section est suivie d'un saut de page
+INSPECTION_SHEET_PAGE_BREAK_CADETS = 20
+# À partir de ce nombre de cadets, chaque section est rendue en parallèle (une section par page)
+INSPECTION_SHEET_PARALLEL_MIN_CADETS = int(os.environ.get('INSPECTION_SHEET_PARALLEL_MIN_CADETS', 100))
 
+class OutlineBookmark(Flowable):
+    """Signet PDF sans encombrement, posé sur la page où commence l'élément suivant"""
+    
+    def __init__(self, key: str, title: str):
+        super().__init__()
+        self.key = key
+        self.title = title
+        self.keepWithNext = True
+    
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+    
+    def draw(self):
+        self.canv.bookmarkPage(self.key)
+        self.canv.addOutlineEntry(self.title, self.key, level=0)
+        self.canv.showOutline()
 
-async def generate_inspection_sheet_pdf(cadets: List[dict], uniform_type: str, 
-                                       criteria: List[str], sections: List[dict]) -> BytesIO:
-    """Génère une feuille d'inspection vierge - VERSION CORRIGÉE EN PAYSAGE"""
+def render_inspection_sheet_pdf(cadets: List[dict], uniform_type: str, 
+                                criteria: List[str], sections: List[dict],
+                                include_intro: bool = True, page_numbers: bool = True,
+                                generated_at: Optional[str] = None) -> bytes:
+    """
+    Génère une feuille d'inspection vierge - VERSION CORRIGÉE EN PAYSAGE
+    Un signet par section, à sa page de début
+    include_intro/page_numbers=False servent au rendu par section (generate_inspection_sheet_pdf)
+    """
     buffer = BytesIO()
     
     # FIX #3: Format PAYSAGE pour plus d'espace horizontal
@@ -3740,40 +5465,42 @@ async def generate_inspection_sheet_pdf(cadets: List[dict], uniform_type: str,
                             leftMargin=0.75*inch, rightMargin=0.75*inch)
     
     elements = []
-    styles = getSampleStyleSheet()
+    styles = REPORT_STYLES
     
     # Créer un dictionnaire des sections
     section_map = {s['id']: s['nom'] for s in sections}
     section_map['etat-major-virtual'] = '⭐ État-Major'
     
     # Titre
-    title_style = ParagraphStyle(
+    title_style = report_style(
         'CustomTitle',
-        parent=styles['Heading1'],
+        'Heading1',
         fontSize=16,
         textColor=colors.HexColor('#1f2937'),
         spaceAfter=6,
         alignment=TA_CENTER
     )
     
-    elements.append(Paragraph(f"Feuille d'Inspection - {uniform_type}", title_style))
-    elements.append(Spacer(1, 0.2*inch))
-    
-    # Informations
-    info_style = styles['Normal']
-    elements.append(Paragraph(f"<b>Date:</b> _________________________  <b>Inspecteur:</b> _________________________", info_style))
-    elements.append(Spacer(1, 0.15*inch))
+    if include_intro:
+        elements.append(Paragraph(f"Feuille d'Inspection - {uniform_type}", title_style))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        # Informations
+        info_style = styles['Normal']
+        elements.append(Paragraph(f"<b>Date:</b> _________________________  <b>Inspecteur:</b> _________________________", info_style))
+        elements.append(Spacer(1, 0.15*inch))
     
     # Légende du barème
-    legend_style = ParagraphStyle(
+    legend_style = report_style(
         'Legend',
-        parent=styles['Normal'],
+        'Normal',
         fontSize=9,
         textColor=colors.HexColor('#4b5563'),
         spaceAfter=10
     )
-    elements.append(Paragraph("<b>Barème:</b> 0 = Très mauvais | 1 = Mauvais | 2 = Passable | 3 = Bon | 4 = Excellent", legend_style))
-    elements.append(Spacer(1, 0.1*inch))
+    if include_intro:
+        elements.append(Paragraph("<b>Barème:</b> 0 = Très mauvais | 1 = Mauvais | 2 = Passable | 3 = Bon | 4 = Excellent", legend_style))
+        elements.append(Spacer(1, 0.1*inch))
     
     # Grouper par section
     cadets_by_section = {}
@@ -3798,23 +5525,25 @@ async def generate_inspection_sheet_pdf(cadets: List[dict], uniform_type: str,
                 criteria_legend.append(f"{crit[:12]}: {crit}")
     
     # Afficher la légende des critères si nécessaire
-    if criteria_legend:
+    if criteria_legend and include_intro:
         legend_text = "<b>Critères:</b> " + " | ".join(criteria_legend)
         elements.append(Paragraph(legend_text, legend_style))
         elements.append(Spacer(1, 0.1*inch))
     
     # Tableau pour chaque section
-    for section_id, section_cadets in sorted(cadets_by_section.items()):
+    sorted_sections = sorted(cadets_by_section.items())
+    for index, (section_id, section_cadets) in enumerate(sorted_sections):
         section_name = section_map.get(section_id, 'Sans section')
         
-        # Titre de section
-        section_style = ParagraphStyle(
+        # Titre de section (avec son signet)
+        section_style = report_style(
             'SectionTitle',
-            parent=styles['Heading3'],
+            'Heading3',
             fontSize=11,
             textColor=colors.HexColor('#3b82f6'),
             spaceAfter=6
         )
+        elements.append(OutlineBookmark(f"section-{section_id}", section_name))
         elements.append(Paragraph(section_name, section_style))
         
         # En-tête du tableau avec abréviations
@@ -3870,21 +5599,20 @@ async def generate_inspection_sheet_pdf(cadets: List[dict], uniform_type: str,
         elements.append(table)
         elements.append(Spacer(1, 0.2*inch))
         
-        # Page break entre sections si beaucoup de cadets
-        if len(section_cadets) > 20:
+        # Page break entre sections si beaucoup de cadets (pas de page vide en fin de document)
+        if len(section_cadets) > INSPECTION_SHEET_PAGE_BREAK_CADETS and index < len(sorted_sections) - 1:
             elements.append(PageBreak())
     
     # Build PDF
-    doc.build(elements, onFirstPage=lambda c, d: add_header_footer(c, d, f"FEUILLE D'INSPECTION - {uniform_type.upper()}"),
-              onLaterPages=lambda c, d: add_header_footer(c, d, f"FEUILLE D'INSPECTION - {uniform_type.upper()}"))
+    title = f"FEUILLE D'INSPECTION - {uniform_type.upper()}"
+    doc.build(elements, onFirstPage=lambda c, d: add_header_footer(c, d, title, page_numbers, generated_at),
+              onLaterPages=lambda c, d: add_header_footer(c, d, title, page_numbers, generated_at))
     
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
 
 
-async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict, 
-                                       period_info: str, sections: List[dict]) -> BytesIO:
+def render_inspection_stats_pdf(stats: dict, period_info: str, sections: List[dict]) -> bytes:
     """Génère un rapport détaillé avec GRAPHIQUE d'évolution"""
     buffer = BytesIO()
     
@@ -3893,12 +5621,12 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
                             leftMargin=0.75*inch, rightMargin=0.75*inch)
     
     elements = []
-    styles = getSampleStyleSheet()
+    styles = REPORT_STYLES
     
     # Titre
-    title_style = ParagraphStyle(
+    title_style = report_style(
         'CustomTitle',
-        parent=styles['Heading1'],
+        'Heading1',
         fontSize=18,
         textColor=colors.HexColor('#1f2937'),
         spaceAfter=6,
@@ -3910,9 +5638,9 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
     elements.append(Spacer(1, 0.3*inch))
     
     # Statistiques globales
-    summary_style = ParagraphStyle(
+    summary_style = report_style(
         'Summary',
-        parent=styles['Heading2'],
+        'Heading2',
         fontSize=14,
         textColor=colors.HexColor('#3b82f6'),
         spaceAfter=12
@@ -3948,21 +5676,12 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
     elements.append(Spacer(1, 0.3*inch))
     
     # FIX #4: GRAPHIQUE D'ÉVOLUTION
-    if inspections and len(inspections) > 0:
+    if stats.get('daily_series'):
         elements.append(Paragraph("📈 Évolution des Scores dans le Temps", summary_style))
         
-        # Préparer les données pour le graphique
-        # Grouper par date et calculer la moyenne
-        inspections_by_date = {}
-        for insp in inspections:
-            date_str = insp['date']
-            if date_str not in inspections_by_date:
-                inspections_by_date[date_str] = []
-            inspections_by_date[date_str].append(insp['total_score'])
-        
-        # Calculer les moyennes par date
-        dates = sorted(inspections_by_date.keys())
-        averages = [sum(inspections_by_date[d]) / len(inspections_by_date[d]) for d in dates]
+        # Moyennes par date calculées par l'agrégation
+        dates = [point['date'] for point in stats['daily_series']]
+        averages = [point['average'] for point in stats['daily_series']]
         
         # Limiter à 15 points max pour lisibilité
         if len(dates) > 15:
@@ -4030,9 +5749,9 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
     
     # Cadets nécessitant un suivi
     if stats.get('cadets_needing_attention'):
-        attention_style = ParagraphStyle(
+        attention_style = report_style(
             'Attention',
-            parent=styles['Heading2'],
+            'Heading2',
             fontSize=14,
             textColor=colors.HexColor('#ef4444'),
             spaceAfter=12
@@ -4069,9 +5788,9 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
     
     # Top 10 cadets
     if stats.get('top_cadets'):
-        top_style = ParagraphStyle(
+        top_style = report_style(
             'Top',
-            parent=styles['Heading2'],
+            'Heading2',
             fontSize=14,
             textColor=colors.HexColor('#10b981'),
             spaceAfter=12
@@ -4106,10 +5825,10 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
         elements.append(top_table)
     
     # NOUVEAU: Analyse des critères problématiques
-    if inspections and len(inspections) > 0 and stats.get('cadets_needing_attention'):
-        criteria_style = ParagraphStyle(
+    if stats.get('cadets_needing_attention'):
+        criteria_style = report_style(
             'Criteria',
-            parent=styles['Heading2'],
+            'Heading2',
             fontSize=14,
             textColor=colors.HexColor('#f59e0b'),
             spaceAfter=12
@@ -4120,203 +5839,217 @@ async def generate_inspection_stats_pdf(inspections: List[dict], stats: dict,
         
         # Analyser les critères problématiques pour chaque cadet en difficulté
         for cadet in stats['cadets_needing_attention'][:10]:  # Limiter aux 10 premiers
-            cadet_inspections = [insp for insp in inspections 
-                                if insp['cadet_nom'] == cadet['nom'] and insp['cadet_prenom'] == cadet['prenom']]
+            # Critères faibles (<50%) calculés par l'agrégation
+            weak_criteria = [f"{c['criterion']} ({c['average_percent']:.0f}%)" for c in cadet.get('weak_criteria', [])]
             
-            if cadet_inspections:
-                # Calculer le score moyen par critère
-                criteria_scores = {}
-                criteria_counts = {}
-                
-                for insp in cadet_inspections:
-                    for criterion, score in insp.get('criteria_scores', {}).items():
-                        if criterion not in criteria_scores:
-                            criteria_scores[criterion] = 0
-                            criteria_counts[criterion] = 0
-                        criteria_scores[criterion] += score
-                        criteria_counts[criterion] += 1
+            if weak_criteria:
+                cadet_info = f"<b>{cadet['nom']} {cadet['prenom']}</b> ({cadet['section_name']}): "
+                weak_criteria_text = ", ".join(weak_criteria)
                 
-                # Calculer les moyennes et identifier les critères faibles (<50%)
-                weak_criteria = []
-                for criterion, total_score in criteria_scores.items():
-                    avg_score = (total_score / criteria_counts[criterion]) / 4 * 100  # Score sur 4 converti en %
-                    if avg_score < 50:
-                        weak_criteria.append(f"{criterion} ({avg_score:.0f}%)")
-                
-                if weak_criteria:
-                    cadet_info = f"<b>{cadet['nom']} {cadet['prenom']}</b> ({cadet['section_name']}): "
-                    weak_criteria_text = ", ".join(weak_criteria)
-                    
-                    criteria_para_style = ParagraphStyle(
-                        'CriteriaPara',
-                        parent=styles['Normal'],
-                        fontSize=9,
-                        leftIndent=20,
-                        spaceAfter=6
-                    )
-                    elements.append(Paragraph(cadet_info + weak_criteria_text, criteria_para_style))
+                criteria_para_style = report_style(
+                    'CriteriaPara',
+                    'Normal',
+                    fontSize=9,
+                    leftIndent=20,
+                    spaceAfter=6
+                )
+                elements.append(Paragraph(cadet_info + weak_criteria_text, criteria_para_style))
     
     # NOUVEAU: Commentaires notables
-    if inspections and len(inspections) > 0:
-        # Filtrer les inspections avec commentaires
-        inspections_with_comments = [insp for insp in inspections if insp.get('commentaire') and insp['commentaire'].strip()]
-        
-        if inspections_with_comments:
-            comments_style = ParagraphStyle(
-                'Comments',
-                parent=styles['Heading2'],
-                fontSize=14,
-                textColor=colors.HexColor('#8b5cf6'),
-                spaceAfter=12
-            )
-            
-            elements.append(Spacer(1, 0.3*inch))
-            elements.append(Paragraph("💬 Commentaires des Inspecteurs", comments_style))
-            
-            # Limiter aux 15 commentaires les plus récents
-            recent_comments = sorted(inspections_with_comments, 
-                                   key=lambda x: x.get('date', ''), 
-                                   reverse=True)[:15]
-            
-            comments_data = [['Date', 'Cadet', 'Inspecteur', 'Commentaire']]
-            
-            for insp in recent_comments:
-                # Limiter la longueur du commentaire pour le PDF
-                comment = insp['commentaire'][:100] + '...' if len(insp['commentaire']) > 100 else insp['commentaire']
-                
-                comments_data.append([
-                    insp['date'][5:],  # Format MM-DD
-                    f"{insp['cadet_nom']} {insp['cadet_prenom']}"[:20],
-                    insp['inspector_name'][:15],
-                    comment
-                ])
-            
-            comments_table = Table(comments_data, colWidths=[0.8*inch, 1.5*inch, 1.2*inch, 3.5*inch])
-            comments_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8b5cf6')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (2, -1), 'LEFT'),
-                ('ALIGN', (3, 1), (3, -1), 'LEFT'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 7),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('TOPPADDING', (0, 1), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')])
-            ]))
+    # 15 commentaires les plus récents, sélectionnés par l'agrégation
+    recent_comments = stats.get('recent_comments', [])
+    
+    if recent_comments:
+        comments_style = report_style(
+            'Comments',
+            'Heading2',
+            fontSize=14,
+            textColor=colors.HexColor('#8b5cf6'),
+            spaceAfter=12
+        )
+        
+        elements.append(Spacer(1, 0.3*inch))
+        elements.append(Paragraph("💬 Commentaires des Inspecteurs", comments_style))
+        
+        comments_data = [['Date', 'Cadet', 'Inspecteur', 'Commentaire']]
+        
+        for insp in recent_comments:
+            # Limiter la longueur du commentaire pour le PDF
+            comment = insp['commentaire'][:100] + '...' if len(insp['commentaire']) > 100 else insp['commentaire']
             
-            elements.append(comments_table)
+            comments_data.append([
+                insp['date'][5:],  # Format MM-DD
+                f"{insp['cadet_nom']} {insp['cadet_prenom']}"[:20],
+                insp['inspector_name'][:15],
+                comment
+            ])
+        
+        comments_table = Table(comments_data, colWidths=[0.8*inch, 1.5*inch, 1.2*inch, 3.5*inch])
+        comments_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8b5cf6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('ALIGN', (0, 1), (2, -1), 'LEFT'),
+            ('ALIGN', (3, 1), (3, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f4f6')])
+        ]))
+        
+        elements.append(comments_table)
     
     # Build PDF
     doc.build(elements, onFirstPage=lambda c, d: add_header_footer(c, d, "RAPPORT D'INSPECTIONS"),
               onLaterPages=lambda c, d: add_header_footer(c, d, "RAPPORT D'INSPECTIONS"))
     
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
-async def generate_inspection_stats_excel(inspections: List[dict], stats: dict, period_info: str) -> BytesIO:
-    """Génère un fichier Excel avec les statistiques d'inspection"""
-    buffer = BytesIO()
-    workbook = openpyxl.Workbook()
-    
-    # Feuille 1: Vue d'ensemble
-    ws_overview = workbook.active
-    ws_overview.title = "Vue d'ensemble"
-    
-    # En-tête
-    ws_overview['A1'] = "Rapport d'Inspections d'Uniformes"
-    ws_overview['A1'].font = Font(bold=True, size=16, color="1F2937")
-    ws_overview['A2'] = period_info
-    ws_overview['A2'].font = Font(italic=True, size=11, color="6B7280")
-    
-    # Statistiques globales
-    ws_overview['A4'] = "Statistiques Globales"
-    ws_overview['A4'].font = Font(bold=True, size=14, color="3B82F6")
-    
-    headers_overview = ['Métrique', 'Valeur']
-    for col, header in enumerate(headers_overview, 1):
-        cell = ws_overview.cell(row=5, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-    
-    metrics = [
-        ('Total d\'inspections', stats.get('total_inspections', 0)),
-        ('Moyenne escadron', f"{stats.get('squadron_average', 0):.1f}%"),
-        ('Meilleur score', f"{stats.get('best_score', 0):.1f}%"),
-        ('Score le plus bas', f"{stats.get('worst_score', 0):.1f}%"),
-        ('Nombre de cadets inspectés', stats.get('cadets_inspected', 0))
-    ]
-    
-    for row, (metric, value) in enumerate(metrics, 6):
-        ws_overview.cell(row=row, column=1, value=metric).font = Font(bold=True)
-        ws_overview.cell(row=row, column=2, value=value)
-    
-    # Feuille 2: Détails des inspections
-    ws_details = workbook.create_sheet("Détails")
-    
-    headers_details = ['Date', 'Cadet', 'Section', 'Tenue', 'Score', 'Inspecteur', 'Commentaire']
-    for col, header in enumerate(headers_details, 1):
-        cell = ws_details.cell(row=1, column=col, value=header)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+# Styles partagés des exports Excel (mode write_only: style appliqué par cellule)
+EXCEL_HEADER_FONT = Font(bold=True, color="FFFFFF")
+EXCEL_HEADER_FILL = PatternFill(start_color="3B82F6", end_color="3B82F6", fill_type="solid")
+EXCEL_SCORE_FILLS = {
+    "good": PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid"),
+    "average": PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid"),
+    "poor": PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid"),
+}
+
+# Largeurs fixes: en mode write_only, elles doivent être connues avant la première ligne
+EXCEL_OVERVIEW_WIDTHS = {'A': 35, 'B': 20}
+EXCEL_DETAILS_WIDTHS = {'A': 12, 'B': 30, 'C': 22, 'D': 22, 'E': 10, 'F': 28, 'G': 50}
+
+def excel_cell(worksheet, value, font=None, fill=None) -> WriteOnlyCell:
+    cell = WriteOnlyCell(worksheet, value=value)
+    if font is not None:
+        cell.font = font
+    if fill is not None:
+        cell.fill = fill
+    return cell
+
+def excel_header_row(worksheet, headers: List[str]) -> List[WriteOnlyCell]:
+    return [excel_cell(worksheet, header, EXCEL_HEADER_FONT, EXCEL_HEADER_FILL) for header in headers]
+
+def excel_score_fill(score: float) -> PatternFill:
+    if score >= 80:
+        return EXCEL_SCORE_FILLS["good"]
+    if score >= 60:
+        return EXCEL_SCORE_FILLS["average"]
+    return EXCEL_SCORE_FILLS["poor"]
+
+class InspectionStatsWorkbook:
+    """
+    Classeur des statistiques d'inspection en mode write_only
+    Les lignes sont écrites au fil de l'eau (openpyxl les stocke sur disque),
+    la vue d'ensemble est calculée de façon incrémentale
+    """
     
-    for row, insp in enumerate(inspections, 2):
-        ws_details.cell(row=row, column=1, value=str(insp.get('date', '-')))
-        ws_details.cell(row=row, column=2, value=f"{insp.get('cadet_nom', '')} {insp.get('cadet_prenom', '')}")
-        ws_details.cell(row=row, column=3, value=insp.get('section_nom', '-'))
-        ws_details.cell(row=row, column=4, value=insp.get('uniform_type', '-'))
-        
-        score_cell = ws_details.cell(row=row, column=5, value=f"{insp.get('total_score', 0):.1f}%")
-        # Coloration selon le score
+    def __init__(self, period_info: str):
+        self.period_info = period_info
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.ws_overview = self.workbook.create_sheet("Vue d'ensemble")
+        self.ws_details = self.workbook.create_sheet("Détails")
+        for ws, widths in ((self.ws_overview, EXCEL_OVERVIEW_WIDTHS), (self.ws_details, EXCEL_DETAILS_WIDTHS)):
+            for column_letter, width in widths.items():
+                ws.column_dimensions[column_letter].width = width
+        
+        self.ws_details.append(excel_header_row(
+            self.ws_details,
+            ['Date', 'Cadet', 'Section', 'Tenue', 'Score', 'Inspecteur', 'Commentaire']
+        ))
+        
+        self.count = 0
+        self.score_sum = 0.0
+        self.best_score = None
+        self.worst_score = None
+        self.cadets = set()
+    
+    def add_inspection(self, insp: dict) -> None:
         score = insp.get('total_score', 0)
-        if score >= 80:
-            score_cell.fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
-        elif score >= 60:
-            score_cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-        else:
-            score_cell.fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-        
-        ws_details.cell(row=row, column=6, value=insp.get('inspector_name', '-'))
-        ws_details.cell(row=row, column=7, value=insp.get('commentaire', ''))
+        ws = self.ws_details
+        ws.append([
+            str(insp.get('date', '-')),
+            f"{insp.get('cadet_nom', '')} {insp.get('cadet_prenom', '')}",
+            insp.get('section_nom', '-'),
+            insp.get('uniform_type', '-'),
+            excel_cell(ws, f"{score:.1f}%", fill=excel_score_fill(score)),
+            insp.get('inspector_name', '-'),
+            insp.get('commentaire', '')
+        ])
+        
+        self.count += 1
+        self.score_sum += score
+        self.best_score = score if self.best_score is None else max(self.best_score, score)
+        self.worst_score = score if self.worst_score is None else min(self.worst_score, score)
+        self.cadets.add(insp.get('cadet_nom', '') + insp.get('cadet_prenom', ''))
+    
+    def stats(self) -> dict:
+        return {
+            'total_inspections': self.count,
+            'squadron_average': self.score_sum / self.count if self.count else 0,
+            'best_score': self.best_score or 0,
+            'worst_score': self.worst_score or 0,
+            'cadets_inspected': len(self.cadets)
+        }
     
-    # Ajuster les largeurs de colonnes
-    for ws in [ws_overview, ws_details]:
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(cell.value)
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-    
-    workbook.save(buffer)
-    buffer.seek(0)
-    return buffer
-
-async def generate_cadet_individual_pdf(cadet: dict, section_name: str, inspections: List[dict], 
-                                        presence_stats: dict, inspection_stats: dict) -> BytesIO:
+    def save(self) -> SpooledTemporaryFile:
+        """Écrit la vue d'ensemble et sérialise le classeur (opération bloquante)"""
+        ws = self.ws_overview
+        stats = self.stats()
+        
+        ws.append([excel_cell(ws, "Rapport d'Inspections d'Uniformes", Font(bold=True, size=16, color="1F2937"))])
+        ws.append([excel_cell(ws, self.period_info, Font(italic=True, size=11, color="6B7280"))])
+        ws.append([])
+        ws.append([excel_cell(ws, "Statistiques Globales", Font(bold=True, size=14, color="3B82F6"))])
+        ws.append(excel_header_row(ws, ['Métrique', 'Valeur']))
+        
+        metrics = [
+            ('Total d\'inspections', stats['total_inspections']),
+            ('Moyenne escadron', f"{stats['squadron_average']:.1f}%"),
+            ('Meilleur score', f"{stats['best_score']:.1f}%"),
+            ('Score le plus bas', f"{stats['worst_score']:.1f}%"),
+            ('Nombre de cadets inspectés', stats['cadets_inspected'])
+        ]
+        for metric, value in metrics:
+            ws.append([excel_cell(ws, metric, Font(bold=True)), value])
+        
+        spool = SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES)
+        self.workbook.save(spool)
+        spool.seek(0)
+        return spool
+
+async def generate_inspection_stats_excel(inspections, period_info: str) -> SpooledTemporaryFile:
+    """
+    Génère un fichier Excel avec les statistiques d'inspection
+    `inspections` peut être une liste ou un itérable asynchrone (curseur Mongo enrichi)
+    """
+    workbook = InspectionStatsWorkbook(period_info)
+    if hasattr(inspections, "__aiter__"):
+        async for insp in inspections:
+            workbook.add_inspection(insp)
+    else:
+        for insp in inspections:
+            workbook.add_inspection(insp)
+    return await asyncio.to_thread(workbook.save)
+
+def render_cadet_individual_pdf(cadet: dict, section_name: str, inspections: List[dict], 
+                                presence_stats: dict, inspection_stats: dict) -> bytes:
     """Génère un PDF complet pour un cadet individuel"""
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
     elements = []
-    styles = getSampleStyleSheet()
+    styles = REPORT_STYLES
     
     # Style titre
-    title_style = ParagraphStyle(
+    title_style = report_style(
         'CustomTitle',
-        parent=styles['Heading1'],
+        'Heading1',
         fontSize=20,
         textColor=colors.HexColor('#1a365d'),
         spaceAfter=30,
@@ -4324,14 +6057,10 @@ async def generate_cadet_individual_pdf(cadet: dict, section_name: str, inspecti
     )
     
     # Header avec logo
-    try:
-        logo_path = Path(__file__).parent / "logo.png"
-        if logo_path.exists():
-            logo = ReportLabImage(str(logo_path), width=1*inch, height=1*inch)
-            elements.append(logo)
-            elements.append(Spacer(1, 0.2*inch))
-    except:
-        pass
+    logo = report_logo_flowable(1*inch)
+    if logo is not None:
+        elements.append(logo)
+        elements.append(Spacer(1, 0.2*inch))
     
     # Titre
     elements.append(Paragraph(f"Rapport Individuel - {cadet['prenom']} {cadet['nom']}", title_style))
@@ -4457,9 +6186,9 @@ async def generate_cadet_individual_pdf(cadet: dict, section_name: str, inspecti
     
     # Footer
     elements.append(Spacer(1, 0.5*inch))
-    footer_style = ParagraphStyle(
+    footer_style = report_style(
         'Footer',
-        parent=styles['Normal'],
+        'Normal',
         fontSize=8,
         textColor=colors.grey,
         alignment=TA_CENTER
@@ -4470,13 +6199,922 @@ async def generate_cadet_individual_pdf(cadet: dict, section_name: str, inspecti
     ))
     
     doc.build(elements)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
-@api_router.post("/reports/cadets-list")
-async def generate_cadets_list_report(
-    request: CadetsListRequest,
-    format: str = "pdf",  # pdf ou web
+# ============================================================================
+# RENDU DES PDF HORS DE LA BOUCLE D'ÉVÉNEMENTS
+# ============================================================================
+
+# doc.build() de ReportLab est purement CPU: on l'exécute dans un pool de processus
+# borné pour ne pas bloquer les autres requêtes (présences, inspections...)
+REPORT_RENDER_WORKERS = int(os.environ.get('REPORT_RENDER_WORKERS', max(1, min(4, (os.cpu_count() or 2) - 1))))
+REPORT_RENDER_MAX_CONCURRENCY = int(os.environ.get('REPORT_RENDER_MAX_CONCURRENCY', REPORT_RENDER_WORKERS * 2))
+
+report_render_executor: Optional[ProcessPoolExecutor] = None
+report_render_semaphore = asyncio.Semaphore(REPORT_RENDER_MAX_CONCURRENCY)
+report_render_metrics: Dict[str, Dict[str, float]] = {}
+
+# Champs inutiles au rendu (volumineux ou sensibles) retirés avant l'envoi au pool
+REPORT_EXCLUDED_FIELDS = {"_id", "photo_base64", "hashed_password", "invitation_token"}
+
+def get_report_render_executor() -> ProcessPoolExecutor:
+    """Crée le pool à la demande (spawn: pas de fork du client Mongo ni de la boucle)"""
+    global report_render_executor
+    if report_render_executor is None:
+        report_render_executor = ProcessPoolExecutor(
+            max_workers=REPORT_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return report_render_executor
+
+def shutdown_report_render_executor() -> None:
+    global report_render_executor
+    if report_render_executor is not None:
+        report_render_executor.shutdown(wait=False, cancel_futures=True)
+        report_render_executor = None
+
+def report_payload(docs: List[dict]) -> List[dict]:
+    """Copie allégée et sérialisable des documents transmis au pool"""
+    return [{k: v for k, v in doc.items() if k not in REPORT_EXCLUDED_FIELDS} for doc in docs]
+
+def timed_render(func, args: tuple):
+    """Exécuté dans le processus de rendu: retourne le PDF et la durée de rendu"""
+    started = time.perf_counter()
+    content = func(*args)
+    return content, time.perf_counter() - started
+
+def record_report_render(name: str, queue_time: float, render_time: float, size: int) -> None:
+    metric = report_render_metrics.setdefault(name, {
+        "count": 0,
+        "queue_time_total": 0.0,
+        "queue_time_max": 0.0,
+        "render_time_total": 0.0,
+        "render_time_max": 0.0,
+        "bytes_total": 0
+    })
+    metric["count"] += 1
+    metric["queue_time_total"] += queue_time
+    metric["queue_time_max"] = max(metric["queue_time_max"], queue_time)
+    metric["render_time_total"] += render_time
+    metric["render_time_max"] = max(metric["render_time_max"], render_time)
+    metric["bytes_total"] += size
+    logger.info(f"Rendu {name}: attente {queue_time * 1000:.0f} ms, rendu {render_time * 1000:.0f} ms, {size} octets")
+
+async def run_report_render(func, *args) -> bytes:
+    """Soumet un rendu au pool en respectant la limite de concurrence"""
+    submitted = time.perf_counter()
+    async with report_render_semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            content, render_time = await loop.run_in_executor(
+                get_report_render_executor(), timed_render, func, args
+            )
+        except BrokenProcessPool:
+            # Un processus de rendu est mort: recréer le pool au prochain appel
+            shutdown_report_render_executor()
+            raise
+    queue_time = max(0.0, time.perf_counter() - submitted - render_time)
+    record_report_render(func.__name__, queue_time, render_time, len(content))
+    return content
+
+async def generate_cadets_list_pdf(cadets: List[dict], sections: List[dict], filter_info: str) -> BytesIO:
+    return BytesIO(await run_report_render(
+        render_cadets_list_pdf, report_payload(cadets), report_payload(sections), filter_info
+    ))
+
+def inspection_sheet_sections(cadets: List[dict]) -> List[List[dict]]:
+    """Cadets groupés par section, dans l'ordre du rendu (render_inspection_sheet_pdf)"""
+    cadets_by_section: Dict[str, List[dict]] = {}
+    for cadet in cadets:
+        cadets_by_section.setdefault(cadet.get('section_id') or 'no_section', []).append(cadet)
+    return [section_cadets for _, section_cadets in sorted(cadets_by_section.items())]
+
+async def generate_inspection_sheet_pdf(cadets: List[dict], uniform_type: str,
+                                        criteria: List[str], sections: List[dict]) -> BytesIO:
+    """
+    Petits effectifs: un seul document, les petites sections se partagent les pages.
+    Au-delà de INSPECTION_SHEET_PARALLEL_MIN_CADETS, chaque section est rendue en
+    parallèle dans le pool (elle commence alors sur une nouvelle page), puis les
+    parties sont fusionnées avec une numérotation continue. Titre et légendes ne
+    figurent qu'en tête de la première section; les signets par section posés par
+    le rendu sont repris tels quels à la fusion.
+    """
+    cadets = report_payload(cadets)
+    sections = report_payload(sections)
+    criteria = list(criteria)
+    
+    section_groups = inspection_sheet_sections(cadets)
+    if len(section_groups) <= 1 or len(cadets) < INSPECTION_SHEET_PARALLEL_MIN_CADETS:
+        return BytesIO(await run_report_render(
+            render_inspection_sheet_pdf, cadets, uniform_type, criteria, sections
+        ))
+    
+    generated_at = datetime.now().strftime("%d/%m/%Y %H:%M")
+    contents = await asyncio.gather(*[
+        run_report_render(
+            render_inspection_sheet_pdf,
+            section_cadets, uniform_type, criteria, sections, index == 0, False, generated_at
+        )
+        for index, section_cadets in enumerate(section_groups)
+    ])
+    
+    # Pas de signet ajouté à la fusion: chaque partie apporte déjà celui de sa section
+    parts = [(None, content) for content in contents]
+    return BytesIO(await run_report_render(merge_pdf_documents, parts, True))
+
+async def generate_inspection_stats_pdf(stats: dict, period_info: str, sections: List[dict]) -> BytesIO:
+    return BytesIO(await run_report_render(
+        render_inspection_stats_pdf, stats, period_info, report_payload(sections)
+    ))
+
+async def generate_cadet_individual_pdf(cadet: dict, section_name: str, inspections: List[dict],
+                                        presence_stats: dict, inspection_stats: dict) -> BytesIO:
+    return BytesIO(await run_report_render(
+        render_cadet_individual_pdf, report_payload([cadet])[0], section_name, inspections,
+        presence_stats, inspection_stats
+    ))
+
+# ============================================================================
+# PRODUCTEURS DE RAPPORTS
+# ============================================================================
+
+PDF_MEDIA_TYPE = "application/pdf"
+EXCEL_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+ZIP_MEDIA_TYPE = "application/zip"
+
+# Rôles exclus des rapports de cadets
+REPORT_EXCLUDED_ROLE_KEYWORDS = ['encadrement', 'admin', 'lieutenant', 'capitaine', 'major', 'colonel']
+
+# Portée d'accès des inspecteurs et supérieurs (les cadets n'ont que "self:<id>")
+REPORT_SCOPE_RESPONSIBLE = "reports"
+
+class CadetReportRequest(BaseModel):
+    cadet_id: str
+
+class CadetsBulkReportRequest(BaseModel):
+    section_id: Optional[str] = None  # None = tout l'escadron
+    output: str = "zip"  # zip ou pdf (fusionné avec signets)
+
+class ReportArtifact:
+    """
+    Rapport généré: contenu, type MIME et nom de fichier
+    Le contenu est soit en mémoire (content), soit dans un fichier temporaire
+    (fileobj) lu par blocs; un fichier temporaire ne peut être lu qu'une fois
+    """
+    
+    def __init__(self, content: Optional[bytes], media_type: str, filename: str, fileobj=None):
+        self.content = content
+        self.fileobj = fileobj
+        self.media_type = media_type
+        self.filename = filename
+    
+    @property
+    def size(self) -> int:
+        if self.content is not None:
+            return len(self.content)
+        self.fileobj.seek(0, os.SEEK_END)
+        return self.fileobj.tell()
+    
+    def materialize(self) -> bytes:
+        """Charge le fichier temporaire en mémoire (pour la mise en cache)"""
+        if self.content is None:
+            self.fileobj.seek(0)
+            self.content = self.fileobj.read()
+            self.fileobj.close()
+            self.fileobj = None
+        return self.content
+    
+    def iter_chunks(self):
+        if self.content is not None:
+            yield self.content
+            return
+        try:
+            self.fileobj.seek(0)
+            while True:
+                chunk = self.fileobj.read(REPORT_STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.fileobj.close()
+    
+    def write_to(self, path: Path) -> None:
+        if self.content is not None:
+            path.write_bytes(self.content)
+            return
+        self.fileobj.seek(0)
+        with open(path, "wb") as f:
+            shutil.copyfileobj(self.fileobj, f, REPORT_STREAM_CHUNK_SIZE)
+        self.fileobj.close()
+    
+    def to_response(self) -> StreamingResponse:
+        return StreamingResponse(
+            self.iter_chunks(),
+            media_type=self.media_type,
+            headers={
+                "Content-Disposition": f"attachment; filename={self.filename}",
+                "Content-Length": str(self.size)
+            }
+        )
+
+def is_report_cadet(user: dict) -> bool:
+    role = user.get('role', '').lower()
+    return not any(keyword in role for keyword in REPORT_EXCLUDED_ROLE_KEYWORDS)
+
+async def check_cadet_report_access(current_user: User, cadet_id: str) -> str:
+    """
+    Rapport individuel accessible:
+    - Aux responsables de rapports (inspecteurs et supérieurs)
+    - Au cadet lui-même (pour son propre rapport)
+    Retourne la portée d'accès utilisée pour le cache des rapports
+    """
+    try:
+        await require_inspection_permissions(current_user)
+        return REPORT_SCOPE_RESPONSIBLE
+    except HTTPException:
+        pass
+    
+    if current_user.id != cadet_id:
+        raise HTTPException(
+            status_code=403,
+            detail="Vous ne pouvez consulter que votre propre rapport"
+        )
+    return f"self:{current_user.id}"
+
+async def load_cadets_list_data(request: CadetsListRequest):
+    """Cadets filtrés, sections et libellé du filtre pour la liste des cadets"""
+    filter_dict = {}
+    
+    if request.filter_type == "section" and request.section_id:
+        filter_dict["section_id"] = request.section_id
+    elif request.filter_type == "role" and request.role:
+        filter_dict["role"] = request.role
+    
+    # Récupérer les cadets (exclure encadrement/officiers)
+    cadets = await db.users.find(filter_dict).to_list(1000)
+    filtered_cadets = [c for c in cadets if is_report_cadet(c)]
+    
+    sections = await db.sections.find().to_list(100)
+    
+    if request.filter_type == "section" and request.section_id:
+        section = next((s for s in sections if s['id'] == request.section_id), None)
+        filter_info = f"Section: {section['nom'] if section else 'Inconnue'}"
+    elif request.filter_type == "role" and request.role:
+        filter_info = f"Rôle: {request.role}"
+    else:
+        filter_info = "Tous les cadets"
+    
+    return filtered_cadets, sections, filter_info
+
+async def produce_cadets_list_report(request: CadetsListRequest) -> ReportArtifact:
+    filtered_cadets, sections, filter_info = await load_cadets_list_data(request)
+    pdf_buffer = await generate_cadets_list_pdf(filtered_cadets, sections, filter_info)
+    return ReportArtifact(
+        pdf_buffer.getvalue(),
+        PDF_MEDIA_TYPE,
+        f"liste_cadets_{datetime.now().strftime('%Y%m%d')}.pdf"
+    )
+
+async def produce_inspection_sheet_report(request: InspectionSheetRequest) -> ReportArtifact:
+    # Récupérer les critères pour ce type d'uniforme
+    app_settings = await get_app_settings()
+    if not app_settings.inspectionCriteria:
+        raise HTTPException(status_code=404, detail="Critères d'inspection non configurés")
+    
+    inspection_criteria = app_settings.inspectionCriteria
+    
+    if request.uniform_type not in inspection_criteria:
+        raise HTTPException(status_code=404, detail=f"Critères non trouvés pour {request.uniform_type}")
+    
+    criteria = inspection_criteria[request.uniform_type]
+    
+    # Construire le filtre pour les cadets
+    filter_dict = {}
+    if request.section_id:
+        filter_dict["section_id"] = request.section_id
+    
+    # Récupérer les cadets (exclure encadrement/officiers)
+    all_cadets = await db.users.find(filter_dict).to_list(1000)
+    filtered_cadets = [c for c in all_cadets if is_report_cadet(c)]
+    
+    # Assigner section virtuelle État-Major si nécessaire
+    for cadet in filtered_cadets:
+        role_lower = cadet.get('role', '').lower()
+        if not cadet.get('section_id') and any(keyword in role_lower for keyword in ['adjudant d\'escadron', 'adjudant-chef d\'escadron']):
+            cadet['section_id'] = 'etat-major-virtual'
+    
+    sections = await db.sections.find().to_list(100)
+    
+    pdf_buffer = await generate_inspection_sheet_pdf(filtered_cadets, request.uniform_type, criteria, sections)
+    return ReportArtifact(
+        pdf_buffer.getvalue(),
+        PDF_MEDIA_TYPE,
+        f"feuille_inspection_{request.uniform_type.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
+    )
+
+async def iter_enriched_inspections(filter_dict: dict):
+    """Inspections enrichies (noms du cadet, de la section et de l'inspecteur) lues au fil du curseur"""
+    users = await db.users.find({}, {"_id": 0, "id": 1, "nom": 1, "prenom": 1}).to_list(None)
+    sections = await db.sections.find({}, {"_id": 0, "id": 1, "nom": 1}).to_list(None)
+    
+    user_map = {u['id']: u for u in users}
+    section_map = {s['id']: s['nom'] for s in sections}
+    section_map['etat-major-virtual'] = '⭐ État-Major'
+    
+    cursor = db.uniform_inspections.find(
+        filter_dict,
+        {"_id": 0, "criteria_scores": 0}
+    ).sort("date", 1).batch_size(500)
+    
+    async for insp in cursor:
+        cadet = user_map.get(insp['cadet_id'])
+        inspector = user_map.get(insp['inspected_by'])
+        
+        if cadet and inspector:
+            yield {
+                'date': insp['date'],
+                'cadet_nom': cadet['nom'],
+                'cadet_prenom': cadet['prenom'],
+                'section_id': insp.get('section_id'),
+                'section_nom': section_map.get(insp.get('section_id'), '-'),
+                'uniform_type': insp['uniform_type'],
+                'total_score': insp['total_score'],
+                'inspector_name': f"{inspector['prenom']} {inspector['nom']}",
+                'commentaire': insp.get('commentaire')
+            }
+
+async def produce_inspection_stats_excel(filter_dict: dict, period_info: str) -> ReportArtifact:
+    """Export Excel en mémoire bornée: curseur -> classeur write_only -> fichier temporaire"""
+    if not await db.uniform_inspections.find_one(filter_dict, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Aucune inspection trouvée pour cette période")
+    
+    spool = await generate_inspection_stats_excel(iter_enriched_inspections(filter_dict), period_info)
+    return ReportArtifact(
+        None,
+        EXCEL_MEDIA_TYPE,
+        f"rapport_inspections_{datetime.now().strftime('%Y%m%d')}.xlsx",
+        fileobj=spool
+    )
+
+def inspection_stats_pipeline(filter_dict: dict, include_comparisons: bool) -> List[dict]:
+    """
+    Agrégation unique des statistiques d'inspection
+    Seules les lignes agrégées sont renvoyées à l'application; les noms sont
+    résolus ensuite (voir aggregate_inspection_stats)
+    """
+    facets = {
+        "summary": [
+            {"$group": {
+                "_id": None,
+                "total_inspections": {"$sum": 1},
+                "squadron_average": {"$avg": "$total_score"},
+                "best_score": {"$max": "$total_score"},
+                "worst_score": {"$min": "$total_score"},
+                "cadets": {"$addToSet": "$cadet_id"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "total_inspections": 1,
+                "squadron_average": 1,
+                "best_score": 1,
+                "worst_score": 1,
+                "cadets_inspected": {"$size": "$cadets"}
+            }}
+        ],
+        # Série quotidienne du graphique d'évolution
+        "daily_series": [
+            {"$group": {"_id": "$date", "average": {"$avg": "$total_score"}}},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "date": "$_id", "average": 1}}
+        ],
+        "recent_comments": [
+            {"$match": {"$expr": {"$gt": [
+                {"$strLenCP": {"$trim": {"input": {"$ifNull": ["$commentaire", ""]}}}}, 0
+            ]}}},
+            {"$sort": {"date": -1}},
+            {"$limit": 15},
+            {"$project": {
+                "_id": 0,
+                "date": 1,
+                "cadet_id": 1,
+                "inspected_by": 1,
+                "commentaire": 1
+            }}
+        ]
+    }
+    
+    if include_comparisons:
+        facets["by_section"] = [
+            {"$group": {
+                "_id": "$section_id",
+                "total_inspections": {"$sum": 1},
+                "average_score": {"$avg": "$total_score"},
+                "cadets": {"$addToSet": "$cadet_id"}
+            }},
+            {"$project": {
+                "_id": 0,
+                "section_id": "$_id",
+                "total_inspections": 1,
+                "average_score": 1,
+                "cadets_count": {"$size": "$cadets"}
+            }}
+        ]
+        facets["by_cadet"] = [
+            {"$group": {
+                "_id": "$cadet_id",
+                "section_id": {"$first": "$section_id"},
+                "average_score": {"$avg": "$total_score"},
+                "inspection_count": {"$sum": 1}
+            }}
+        ]
+        # Critères faibles par cadet: moyenne < 2/4 (50%)
+        facets["weak_criteria"] = [
+            {"$project": {
+                "cadet_id": 1,
+                "criteria": {"$objectToArray": {"$ifNull": ["$criteria_scores", {}]}}
+            }},
+            {"$unwind": "$criteria"},
+            {"$group": {
+                "_id": {"cadet_id": "$cadet_id", "criterion": "$criteria.k"},
+                "average": {"$avg": "$criteria.v"}
+            }},
+            {"$match": {"average": {"$lt": 2}}}
+        ]
+    
+    return [
+        {"$match": filter_dict},
+        {"$project": {
+            "_id": 0,
+            "cadet_id": 1,
+            "inspected_by": 1,
+            "section_id": 1,
+            "date": 1,
+            "total_score": 1,
+            "criteria_scores": 1,
+            "commentaire": 1
+        }},
+        {"$facet": facets}
+    ]
+
+async def load_inspection_participants(filter_dict: dict) -> Dict[str, dict]:
+    """
+    Cadets et inspecteurs encore existants des inspections filtrées
+    Une agrégation pour les ids distincts, puis une requête $in sur users (index users.id)
+    """
+    ids = await db.uniform_inspections.aggregate([
+        {"$match": filter_dict},
+        {"$group": {
+            "_id": None,
+            "cadet_ids": {"$addToSet": "$cadet_id"},
+            "inspector_ids": {"$addToSet": "$inspected_by"}
+        }}
+    ]).to_list(1)
+    if not ids:
+        return {}
+    
+    user_ids = list(set(ids[0]["cadet_ids"]) | set(ids[0]["inspector_ids"]))
+    users = await db.users.find(
+        {"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "nom": 1, "prenom": 1}
+    ).to_list(None)
+    return {user["id"]: user for user in users}
+
+async def aggregate_inspection_stats(filter_dict: dict, include_comparisons: bool, section_map: Dict[str, str]) -> dict:
+    users_by_id = await load_inspection_participants(filter_dict)
+    
+    # Comme auparavant, les inspections d'un cadet ou inspecteur supprimé sont ignorées
+    existing_ids = list(users_by_id)
+    stats_filter = {**filter_dict, "cadet_id": {"$in": existing_ids}, "inspected_by": {"$in": existing_ids}}
+    
+    results = await db.uniform_inspections.aggregate(
+        inspection_stats_pipeline(stats_filter, include_comparisons),
+        allowDiskUse=True
+    ).to_list(1)
+    facets = results[0] if results else {}
+    
+    recent_comments = []
+    for row in facets.get("recent_comments", []):
+        cadet = users_by_id[row['cadet_id']]
+        inspector = users_by_id[row['inspected_by']]
+        recent_comments.append({
+            'date': row['date'],
+            'cadet_nom': cadet['nom'],
+            'cadet_prenom': cadet['prenom'],
+            'inspector_name': f"{inspector['prenom']} {inspector['nom']}",
+            'commentaire': row['commentaire']
+        })
+    
+    summary = (facets.get("summary") or [{}])[0]
+    stats = {
+        'total_inspections': summary.get('total_inspections', 0),
+        'squadron_average': summary.get('squadron_average') or 0,
+        'best_score': summary.get('best_score') or 0,
+        'worst_score': summary.get('worst_score') or 0,
+        'cadets_inspected': summary.get('cadets_inspected', 0),
+        'daily_series': facets.get("daily_series", []),
+        'recent_comments': recent_comments
+    }
+    
+    if include_comparisons:
+        stats['by_section'] = sorted([
+            {
+                'section_name': section_map.get(row['section_id'], '-'),
+                'total_inspections': row['total_inspections'],
+                'average_score': row['average_score'] or 0,
+                'cadets_count': row['cadets_count']
+            }
+            for row in facets.get("by_section", [])
+        ], key=lambda x: x['section_name'])
+        
+        weak_by_cadet: Dict[str, List[dict]] = {}
+        for row in facets.get("weak_criteria", []):
+            weak_by_cadet.setdefault(row['_id']['cadet_id'], []).append({
+                'criterion': row['_id']['criterion'],
+                'average_percent': row['average'] / 4 * 100  # Score sur 4 converti en %
+            })
+        
+        cadets = [
+            {
+                'nom': users_by_id[row['_id']]['nom'],
+                'prenom': users_by_id[row['_id']]['prenom'],
+                'section_name': section_map.get(row['section_id'], '-'),
+                'average_score': row['average_score'] or 0,
+                'inspection_count': row['inspection_count'],
+                'weak_criteria': sorted(weak_by_cadet.get(row['_id'], []), key=lambda x: x['criterion'])
+            }
+            for row in facets.get("by_cadet", [])
+        ]
+        
+        stats['cadets_needing_attention'] = sorted(
+            [c for c in cadets if c['average_score'] < 60],
+            key=lambda x: x['average_score']
+        )
+        stats['top_cadets'] = sorted(cadets, key=lambda x: x['average_score'], reverse=True)[:10]
+    
+    return stats
+
+async def produce_inspection_stats_report(request: InspectionStatsRequest) -> ReportArtifact:
+    # Construire le filtre de dates
+    filter_dict = {}
+    
+    start_date = request.start_date or (date.today() - timedelta(days=30))
+    end_date = request.end_date or date.today()
+    
+    filter_dict["date"] = {
+        "$gte": start_date.isoformat(),
+        "$lte": end_date.isoformat()
+    }
+    
+    if request.section_id:
+        filter_dict["section_id"] = request.section_id
+    
+    # Informations de période
+    period_info = f"Période: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
+    
+    if request.export_format == "excel":
+        return await produce_inspection_stats_excel(filter_dict, period_info)
+    
+    sections = await db.sections.find({}, {"_id": 0, "id": 1, "nom": 1}).to_list(None)
+    section_map = {s['id']: s['nom'] for s in sections}
+    section_map['etat-major-virtual'] = '⭐ État-Major'
+    
+    stats = await aggregate_inspection_stats(filter_dict, request.include_comparisons, section_map)
+    
+    if not stats['total_inspections']:
+        raise HTTPException(status_code=404, detail="Aucune inspection trouvée pour cette période")
+    
+    pdf_buffer = await generate_inspection_stats_pdf(stats, period_info, sections)
+    return ReportArtifact(
+        pdf_buffer.getvalue(),
+        PDF_MEDIA_TYPE,
+        f"rapport_inspections_{datetime.now().strftime('%Y%m%d')}.pdf"
+    )
+
+async def load_presence_counts(cadet_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    """Nombre de présences par cadet et par statut (une seule agrégation)"""
+    counts: Dict[str, Dict[str, int]] = {cadet_id: {} for cadet_id in cadet_ids}
+    pipeline = [
+        {"$match": {"cadet_id": {"$in": cadet_ids}}},
+        {"$group": {"_id": {"cadet_id": "$cadet_id", "status": "$status"}, "count": {"$sum": 1}}}
+    ]
+    async for row in db.presences.aggregate(pipeline):
+        counts.setdefault(row["_id"]["cadet_id"], {})[row["_id"]["status"]] = row["count"]
+    return counts
+
+async def load_inspector_names(inspections: List[dict]) -> Dict[str, str]:
+    """Noms des inspecteurs référencés par les inspections"""
+    inspector_ids = list({insp['inspected_by'] for insp in inspections if insp.get('inspected_by')})
+    if not inspector_ids:
+        return {}
+    inspectors = await db.users.find(
+        {"id": {"$in": inspector_ids}},
+        {"_id": 0, "id": 1, "nom": 1, "prenom": 1}
+    ).to_list(None)
+    return {u['id']: f"{u['prenom']} {u['nom']}" for u in inspectors}
+
+def cadet_report_section_name(cadet: dict, section_map: Dict[str, str]) -> str:
+    if not cadet.get('section_id'):
+        return "-"
+    if cadet['section_id'] == 'etat-major-virtual':
+        return "⭐ État-Major"
+    return section_map.get(cadet['section_id'], "-")
+
+def build_cadet_report_args(cadet: dict, section_name: str, inspections: List[dict],
+                            presence_counts: Dict[str, int], inspector_names: Dict[str, str]) -> tuple:
+    """Arguments de render_cadet_individual_pdf à partir des données brutes d'un cadet"""
+    enriched_inspections = []
+    for insp in inspections:
+        enriched_inspections.append({
+            'date': insp['date'],
+            'uniform_type': insp['uniform_type'],
+            'total_score': insp['total_score'],
+            'max_score': insp.get('max_score', 100),
+            'criteria_scores': insp.get('criteria_scores', {}),
+            'inspector_name': inspector_names.get(insp['inspected_by'], "Inconnu"),
+            'commentaire': insp.get('commentaire', '')
+        })
+    
+    # Trier par date décroissante
+    enriched_inspections.sort(key=lambda x: x['date'], reverse=True)
+    
+    # Calculer les statistiques de présence
+    total_presences = sum(presence_counts.values())
+    presences_present = presence_counts.get('present', 0)
+    presence_rate = (presences_present / total_presences * 100) if total_presences > 0 else 0
+    
+    # Calculer les statistiques d'inspection
+    inspection_avg = sum(i['total_score'] for i in enriched_inspections) / len(enriched_inspections) if enriched_inspections else 0
+    best_score = max((i['total_score'] for i in enriched_inspections), default=0)
+    worst_score = min((i['total_score'] for i in enriched_inspections), default=0)
+    
+    return (
+        report_payload([cadet])[0],
+        section_name,
+        enriched_inspections,
+        {
+            'total': total_presences,
+            'present': presences_present,
+            'absent': presence_counts.get('absent', 0),
+            'justified': presence_counts.get('justified_absent', 0),
+            'sick': presence_counts.get('sick', 0),
+            'rate': presence_rate
+        },
+        {
+            'total': len(enriched_inspections),
+            'average': inspection_avg,
+            'best': best_score,
+            'worst': worst_score
+        }
+    )
+
+async def produce_cadet_individual_report(request: CadetReportRequest) -> ReportArtifact:
+    cadet_id = request.cadet_id
+    
+    # Récupérer les informations du cadet
+    cadet = await db.users.find_one({"id": cadet_id}, {"_id": 0, "photo_base64": 0, "hashed_password": 0})
+    if not cadet:
+        raise HTTPException(status_code=404, detail="Cadet non trouvé")
+    
+    # Récupérer la section
+    section_map = {}
+    if cadet.get('section_id') and cadet['section_id'] != 'etat-major-virtual':
+        section = await db.sections.find_one({"id": cadet['section_id']})
+        if section:
+            section_map[section['id']] = section['nom']
+    
+    inspections = await db.uniform_inspections.find({"cadet_id": cadet_id}).to_list(None)
+    presence_counts = await load_presence_counts([cadet_id])
+    inspector_names = await load_inspector_names(inspections)
+    
+    pdf_buffer = await generate_cadet_individual_pdf(*build_cadet_report_args(
+        cadet,
+        cadet_report_section_name(cadet, section_map),
+        inspections,
+        presence_counts[cadet_id],
+        inspector_names
+    ))
+    
+    return ReportArtifact(
+        pdf_buffer.getvalue(),
+        PDF_MEDIA_TYPE,
+        f"rapport_{cadet['prenom']}_{cadet['nom']}_{datetime.now().strftime('%Y%m%d')}.pdf"
+    )
+
+def cadet_report_entry_name(cadet: dict) -> str:
+    base = f"{cadet.get('nom', '')}_{cadet.get('prenom', '')}".replace('/', '-').replace('\\', '-').replace(' ', '_')
+    return f"rapport_{base}_{cadet['id'][:8]}.pdf"
+
+def build_zip_archive(entries: List[tuple]) -> bytes:
+    """Archive ZIP des PDF (stockés sans recompression: déjà compressés)"""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, content in entries:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+def stamp_page_numbers(writer: PdfWriter) -> None:
+    """Numérote les pages fusionnées au même emplacement que add_header_footer"""
+    overlay_buffer = BytesIO()
+    overlay = pdf_canvas.Canvas(overlay_buffer)
+    for number, page in enumerate(writer.pages, 1):
+        width, height = float(page.mediabox.width), float(page.mediabox.height)
+        overlay.setPageSize((width, height))
+        overlay.setFont('Helvetica', 8)
+        overlay.drawCentredString(width / 2, 0.5*inch, f"Page {number}")
+        overlay.showPage()
+    overlay.save()
+    
+    overlay_pages = PdfReader(overlay_buffer).pages
+    for page, overlay_page in zip(writer.pages, overlay_pages):
+        page.merge_page(overlay_page)
+
+def merge_pdf_documents(parts: List[tuple], number_pages: bool = False) -> bytes:
+    """
+    Fusionne des PDF (titre, contenu) en un seul document avec un signet par partie
+    (titre None: pas de signet ajouté, les signets propres à la partie sont conservés)
+    number_pages=True: numérotation continue (parties rendues sans numéro de page)
+    """
+    writer = PdfWriter()
+    for title, content in parts:
+        writer.append(PdfReader(BytesIO(content)), outline_item=title)
+    writer.page_mode = "/UseOutlines"
+    if number_pages:
+        stamp_page_numbers(writer)
+    # Le logo et les polices de chaque partie ne sont conservés qu'une fois
+    writer.compress_identical_objects()
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+async def produce_cadets_bulk_report(request: CadetsBulkReportRequest) -> ReportArtifact:
+    """
+    Rapports individuels de toute une section (ou de l'escadron)
+    Données chargées en quelques requêtes ensemblistes, PDF rendus en parallèle
+    """
+    if request.output not in ("zip", "pdf"):
+        raise HTTPException(status_code=400, detail="Format de sortie invalide (zip ou pdf)")
+    
+    filter_dict = {}
+    if request.section_id:
+        filter_dict["section_id"] = request.section_id
+    
+    users = await db.users.find(
+        filter_dict,
+        {"_id": 0, "photo_base64": 0, "hashed_password": 0, "invitation_token": 0}
+    ).to_list(None)
+    cadets = sorted(
+        [u for u in users if is_report_cadet(u)],
+        key=lambda c: (c.get('nom') or '', c.get('prenom') or '')
+    )
+    if not cadets:
+        raise HTTPException(status_code=404, detail="Aucun cadet trouvé avec ces critères")
+    
+    cadet_ids = [c['id'] for c in cadets]
+    sections = await db.sections.find({}, {"_id": 0, "id": 1, "nom": 1}).to_list(None)
+    section_map = {s['id']: s['nom'] for s in sections}
+    
+    inspections_by_cadet: Dict[str, List[dict]] = {cadet_id: [] for cadet_id in cadet_ids}
+    async for insp in db.uniform_inspections.find({"cadet_id": {"$in": cadet_ids}}, {"_id": 0}):
+        inspections_by_cadet[insp['cadet_id']].append(insp)
+    
+    presence_counts = await load_presence_counts(cadet_ids)
+    inspector_names = await load_inspector_names(
+        [insp for inspections in inspections_by_cadet.values() for insp in inspections]
+    )
+    
+    # Rendu parallèle dans le pool (borné par le sémaphore de rendu)
+    contents = await asyncio.gather(*[
+        run_report_render(render_cadet_individual_pdf, *build_cadet_report_args(
+            cadet,
+            cadet_report_section_name(cadet, section_map),
+            inspections_by_cadet[cadet['id']],
+            presence_counts.get(cadet['id'], {}),
+            inspector_names
+        ))
+        for cadet in cadets
+    ])
+    
+    scope_name = section_map.get(request.section_id, "section") if request.section_id else "escadron"
+    scope_name = scope_name.replace(' ', '_').replace('/', '-')
+    date_str = datetime.now().strftime('%Y%m%d')
+    
+    if request.output == "pdf":
+        parts = [(f"{c.get('nom', '')} {c.get('prenom', '')}", content) for c, content in zip(cadets, contents)]
+        merged = await run_report_render(merge_pdf_documents, parts)
+        return ReportArtifact(merged, PDF_MEDIA_TYPE, f"rapports_cadets_{scope_name}_{date_str}.pdf")
+    
+    entries = [(cadet_report_entry_name(c), content) for c, content in zip(cadets, contents)]
+    archive = await asyncio.to_thread(build_zip_archive, entries)
+    return ReportArtifact(archive, ZIP_MEDIA_TYPE, f"rapports_cadets_{scope_name}_{date_str}.zip")
+
+# Type de rapport -> (modèle des paramètres, producteur)
+REPORT_TYPES = {
+    "cadets-list": (CadetsListRequest, produce_cadets_list_report),
+    "inspection-sheet": (InspectionSheetRequest, produce_inspection_sheet_report),
+    "inspection-stats": (InspectionStatsRequest, produce_inspection_stats_report),
+    "cadet": (CadetReportRequest, produce_cadet_individual_report),
+    "cadets-bulk": (CadetsBulkReportRequest, produce_cadets_bulk_report),
+}
+
+# ============================================================================
+# CACHE DES RAPPORTS (ADRESSÉ PAR LE CONTENU)
+# ============================================================================
+
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_MB', 64)) * 1024 * 1024
+# Au-delà, le rapport est diffusé depuis son fichier temporaire sans être mis en cache
+REPORT_CACHE_MAX_ENTRY_BYTES = REPORT_CACHE_MAX_BYTES // 8
+
+# Collections dont dépend chaque type de rapport: toute écriture change la clé
+REPORT_CACHE_COLLECTIONS = {
+    "cadets-list": ("users", "sections"),
+    "inspection-sheet": ("users", "sections", "settings"),
+    "inspection-stats": ("users", "sections", "uniform_inspections"),
+    "cadet": ("users", "sections", "uniform_inspections", "presences"),
+    "cadets-bulk": ("users", "sections", "uniform_inspections", "presences"),
+}
+
+class ReportCache:
+    """Cache LRU de rapports borné par la taille totale des contenus"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._data: "OrderedDict[str, ReportArtifact]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[ReportArtifact]:
+        artifact = self._data.get(key)
+        if artifact is not None:
+            self._data.move_to_end(key)
+        return artifact
+    
+    def set(self, key: str, artifact: ReportArtifact) -> None:
+        size = artifact.size
+        if size > self.max_bytes:
+            return
+        previous = self._data.pop(key, None)
+        if previous is not None:
+            self.total_bytes -= previous.size
+        self._data[key] = artifact
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.total_bytes -= evicted.size
+    
+    def clear(self) -> None:
+        self._data.clear()
+        self.total_bytes = 0
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES)
+
+def normalize_report_params(report_type: str, request_model: BaseModel) -> dict:
+    """Paramètres explicites: deux requêtes équivalentes produisent la même clé"""
+    params = json.loads(request_model.json())
+    
+    if report_type == "inspection-stats":
+        # Les dates par défaut dépendent du jour: les figer dans la clé
+        params["start_date"] = params["start_date"] or (date.today() - timedelta(days=30)).isoformat()
+        params["end_date"] = params["end_date"] or date.today().isoformat()
+    elif report_type == "cadets-list":
+        if params["filter_type"] != "section":
+            params["section_id"] = None
+        if params["filter_type"] != "role":
+            params["role"] = None
+    
+    return params
+
+async def report_cache_key(report_type: str, request_model: BaseModel, scope: str) -> str:
+    versions = await get_data_versions(*REPORT_CACHE_COLLECTIONS[report_type])
+    payload = json.dumps({
+        "type": report_type,
+        "params": normalize_report_params(report_type, request_model),
+        "scope": scope,
+        "versions": versions,
+        # Le nom de fichier et la date de génération imprimée dépendent du jour
+        "day": datetime.now().date().isoformat()
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def produce_report_cached(report_type: str, request_model: BaseModel, scope: str) -> ReportArtifact:
+    """Retourne le rapport en cache si les données n'ont pas changé, sinon le génère"""
+    key = await report_cache_key(report_type, request_model, scope)
+    artifact = report_cache.get(key)
+    if artifact is not None:
+        return artifact
+    
+    _, producer = REPORT_TYPES[report_type]
+    artifact = await producer(request_model)
+    if artifact.size <= REPORT_CACHE_MAX_ENTRY_BYTES:
+        artifact.materialize()
+        report_cache.set(key, artifact)
+    return artifact
+
+# ============================================================================
+# ENDPOINTS DE RAPPORTS (RENDU SYNCHRONE)
+# ============================================================================
+
+@api_router.post("/reports/cadets-list")
+async def generate_cadets_list_report(
+    request: CadetsListRequest,
+    format: str = "pdf",  # pdf ou web
     current_user: User = Depends(require_inspection_permissions)
 ):
     """
@@ -4484,52 +7122,18 @@ async def generate_cadets_list_report(
     Accessible aux inspecteurs et supérieurs
     """
     try:
-        # Construire le filtre
-        filter_dict = {}
-        
-        if request.filter_type == "section" and request.section_id:
-            filter_dict["section_id"] = request.section_id
-        elif request.filter_type == "role" and request.role:
-            filter_dict["role"] = request.role
-        
-        # Récupérer les cadets
-        cadets = await db.users.find(filter_dict).to_list(1000)
-        
-        # Filtrer les cadets (exclure encadrement/officiers)
-        filtered_cadets = [c for c in cadets if not any(
-            keyword in c.get('role', '').lower() 
-            for keyword in ['encadrement', 'admin', 'lieutenant', 'capitaine', 'major', 'colonel']
-        )]
-        
-        # Récupérer les sections
-        sections = await db.sections.find().to_list(100)
-        
-        # Créer l'info de filtre
-        if request.filter_type == "section" and request.section_id:
-            section = next((s for s in sections if s['id'] == request.section_id), None)
-            filter_info = f"Section: {section['nom'] if section else 'Inconnue'}"
-        elif request.filter_type == "role" and request.role:
-            filter_info = f"Rôle: {request.role}"
-        else:
-            filter_info = "Tous les cadets"
-        
         if format == "pdf":
-            # Générer le PDF
-            pdf_buffer = await generate_cadets_list_pdf(filtered_cadets, sections, filter_info)
-            
-            return StreamingResponse(
-                pdf_buffer,
-                media_type="application/pdf",
-                headers={"Content-Disposition": f"attachment; filename=liste_cadets_{datetime.now().strftime('%Y%m%d')}.pdf"}
-            )
-        else:
-            # Retourner les données pour affichage web
-            return {
-                "cadets": filtered_cadets,
-                "sections": sections,
-                "filter_info": filter_info,
-                "total": len(filtered_cadets)
-            }
+            artifact = await produce_report_cached("cadets-list", request, REPORT_SCOPE_RESPONSIBLE)
+            return artifact.to_response()
+        
+        # Retourner les données pour affichage web
+        filtered_cadets, sections, filter_info = await load_cadets_list_data(request)
+        return {
+            "cadets": filtered_cadets,
+            "sections": sections,
+            "filter_info": filter_info,
+            "total": len(filtered_cadets)
+        }
     
     except Exception as e:
         import traceback
@@ -4547,47 +7151,8 @@ async def generate_inspection_sheet(
     Accessible aux inspecteurs et supérieurs
     """
     try:
-        # Récupérer les critères pour ce type d'uniforme
-        settings_doc = await db.settings.find_one({"type": "app_settings"})
-        if not settings_doc or 'inspectionCriteria' not in settings_doc:
-            raise HTTPException(status_code=404, detail="Critères d'inspection non configurés")
-        
-        inspection_criteria = settings_doc['inspectionCriteria']
-        
-        if request.uniform_type not in inspection_criteria:
-            raise HTTPException(status_code=404, detail=f"Critères non trouvés pour {request.uniform_type}")
-        
-        criteria = inspection_criteria[request.uniform_type]
-        
-        # Construire le filtre pour les cadets
-        filter_dict = {}
-        if request.section_id:
-            filter_dict["section_id"] = request.section_id
-        
-        # Récupérer les cadets (exclure encadrement/officiers)
-        all_cadets = await db.users.find(filter_dict).to_list(1000)
-        filtered_cadets = [c for c in all_cadets if not any(
-            keyword in c.get('role', '').lower() 
-            for keyword in ['encadrement', 'admin', 'lieutenant', 'capitaine', 'major', 'colonel']
-        )]
-        
-        # Assigner section virtuelle État-Major si nécessaire
-        for cadet in filtered_cadets:
-            role_lower = cadet.get('role', '').lower()
-            if not cadet.get('section_id') and any(keyword in role_lower for keyword in ['adjudant d\'escadron', 'adjudant-chef d\'escadron']):
-                cadet['section_id'] = 'etat-major-virtual'
-        
-        # Récupérer les sections
-        sections = await db.sections.find().to_list(100)
-        
-        # Générer le PDF
-        pdf_buffer = await generate_inspection_sheet_pdf(filtered_cadets, request.uniform_type, criteria, sections)
-        
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename=feuille_inspection_{request.uniform_type.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"}
-        )
+        artifact = await produce_report_cached("inspection-sheet", request, REPORT_SCOPE_RESPONSIBLE)
+        return artifact.to_response()
     
     except HTTPException:
         raise
@@ -4605,147 +7170,8 @@ async def generate_inspection_stats_report(
     Accessible aux inspecteurs et supérieurs
     """
     try:
-        # Construire le filtre de dates
-        filter_dict = {}
-        
-        start_date = request.start_date or (date.today() - timedelta(days=30))
-        end_date = request.end_date or date.today()
-        
-        filter_dict["date"] = {
-            "$gte": start_date.isoformat(),
-            "$lte": end_date.isoformat()
-        }
-        
-        if request.section_id:
-            filter_dict["section_id"] = request.section_id
-        
-        # Récupérer les inspections
-        inspections = await db.uniform_inspections.find(filter_dict).to_list(10000)
-        
-        if not inspections:
-            raise HTTPException(status_code=404, detail="Aucune inspection trouvée pour cette période")
-        
-        # Enrichir les données
-        users = await db.users.find().to_list(1000)
-        sections = await db.sections.find().to_list(100)
-        
-        user_map = {u['id']: u for u in users}
-        section_map = {s['id']: s['nom'] for s in sections}
-        section_map['etat-major-virtual'] = '⭐ État-Major'
-        
-        enriched_inspections = []
-        for insp in inspections:
-            cadet = user_map.get(insp['cadet_id'])
-            inspector = user_map.get(insp['inspected_by'])
-            
-            if cadet and inspector:
-                enriched_inspections.append({
-                    'date': insp['date'],
-                    'cadet_nom': cadet['nom'],
-                    'cadet_prenom': cadet['prenom'],
-                    'section_id': insp.get('section_id'),
-                    'section_nom': section_map.get(insp.get('section_id'), '-'),
-                    'uniform_type': insp['uniform_type'],
-                    'total_score': insp['total_score'],
-                    'inspector_name': f"{inspector['prenom']} {inspector['nom']}",
-                    'commentaire': insp.get('commentaire')
-                })
-        
-        # Calculer les statistiques
-        stats = {
-            'total_inspections': len(enriched_inspections),
-            'squadron_average': sum(i['total_score'] for i in enriched_inspections) / len(enriched_inspections) if enriched_inspections else 0,
-            'best_score': max((i['total_score'] for i in enriched_inspections), default=0),
-            'worst_score': min((i['total_score'] for i in enriched_inspections), default=0),
-            'cadets_inspected': len(set(i['cadet_nom'] + i['cadet_prenom'] for i in enriched_inspections))
-        }
-        
-        # Statistiques par section
-        if request.include_comparisons:
-            section_stats = {}
-            for insp in enriched_inspections:
-                section_id = insp['section_id']
-                section_name = insp['section_nom']
-                
-                if section_id not in section_stats:
-                    section_stats[section_id] = {
-                        'section_name': section_name,
-                        'total_inspections': 0,
-                        'scores': [],
-                        'cadets': set()
-                    }
-                
-                section_stats[section_id]['total_inspections'] += 1
-                section_stats[section_id]['scores'].append(insp['total_score'])
-                section_stats[section_id]['cadets'].add(insp['cadet_nom'] + insp['cadet_prenom'])
-            
-            stats['by_section'] = [
-                {
-                    'section_name': data['section_name'],
-                    'total_inspections': data['total_inspections'],
-                    'average_score': sum(data['scores']) / len(data['scores']) if data['scores'] else 0,
-                    'cadets_count': len(data['cadets'])
-                }
-                for data in section_stats.values()
-            ]
-            
-            # Cadets nécessitant un suivi (moyenne < 60%)
-            cadet_stats = {}
-            for insp in enriched_inspections:
-                cadet_key = (insp['cadet_nom'], insp['cadet_prenom'], insp['section_nom'])
-                
-                if cadet_key not in cadet_stats:
-                    cadet_stats[cadet_key] = {
-                        'nom': insp['cadet_nom'],
-                        'prenom': insp['cadet_prenom'],
-                        'section_name': insp['section_nom'],
-                        'scores': [],
-                        'inspection_count': 0
-                    }
-                
-                cadet_stats[cadet_key]['scores'].append(insp['total_score'])
-                cadet_stats[cadet_key]['inspection_count'] += 1
-            
-            # Calculer les moyennes et identifier ceux en difficulté
-            cadets_needing_attention = []
-            top_cadets = []
-            
-            for cadet_data in cadet_stats.values():
-                avg_score = sum(cadet_data['scores']) / len(cadet_data['scores']) if cadet_data['scores'] else 0
-                cadet_data['average_score'] = avg_score
-                
-                if avg_score < 60:
-                    cadets_needing_attention.append(cadet_data)
-                
-                top_cadets.append(cadet_data)
-            
-            # Trier top cadets par moyenne descendante
-            top_cadets.sort(key=lambda x: x['average_score'], reverse=True)
-            
-            stats['cadets_needing_attention'] = sorted(cadets_needing_attention, key=lambda x: x['average_score'])
-            stats['top_cadets'] = top_cadets[:10]
-        
-        # Informations de période
-        period_info = f"Période: {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"
-        
-        # Générer le format demandé
-        if request.export_format == "excel":
-            excel_buffer = await generate_inspection_stats_excel(enriched_inspections, stats, period_info)
-            
-            return StreamingResponse(
-                excel_buffer,
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                headers={"Content-Disposition": f"attachment; filename=rapport_inspections_{datetime.now().strftime('%Y%m%d')}.xlsx"}
-            )
-        else:
-            # PDF par défaut
-            pdf_buffer = await generate_inspection_stats_pdf(enriched_inspections, stats, period_info, sections)
-            
-            return StreamingResponse(
-                pdf_buffer,
-                media_type="application/pdf",
-                headers={"Content-Disposition": f"attachment; filename=rapport_inspections_{datetime.now().strftime('%Y%m%d')}.pdf"}
-            )
+        artifact = await produce_report_cached("inspection-stats", request, REPORT_SCOPE_RESPONSIBLE)
+        return artifact.to_response()
     
     except HTTPException:
         raise
@@ -4766,105 +7192,9 @@ async def generate_cadet_individual_report(
     - Au cadet lui-même (pour son propre rapport)
     """
     try:
-        # Vérifier les permissions
-        is_report_responsible = False
-        try:
-            # Vérifier si l'utilisateur a les droits d'inspection (inspecteurs)
-            await require_inspection_permissions(current_user)
-            is_report_responsible = True
-        except HTTPException:
-            pass
-        
-        # Si pas responsable de rapport, vérifier si c'est le cadet qui demande son propre rapport
-        if not is_report_responsible and current_user.id != cadet_id:
-            raise HTTPException(
-                status_code=403,
-                detail="Vous ne pouvez consulter que votre propre rapport"
-            )
-        
-        # Récupérer les informations du cadet
-        cadet = await db.users.find_one({"id": cadet_id})
-        if not cadet:
-            raise HTTPException(status_code=404, detail="Cadet non trouvé")
-        
-        # Récupérer la section
-        section_name = "-"
-        if cadet.get('section_id'):
-            if cadet['section_id'] == 'etat-major-virtual':
-                section_name = "⭐ État-Major"
-            else:
-                section = await db.sections.find_one({"id": cadet['section_id']})
-                if section:
-                    section_name = section['nom']
-        
-        # Récupérer toutes les inspections du cadet
-        inspections = await db.uniform_inspections.find({"cadet_id": cadet_id}).to_list(10000)
-        
-        # Récupérer toutes les présences du cadet
-        presences = await db.presences.find({"cadet_id": cadet_id}).to_list(10000)
-        
-        # Enrichir les données d'inspection avec les noms des inspecteurs
-        users = await db.users.find().to_list(1000)
-        user_map = {u['id']: u for u in users}
-        
-        enriched_inspections = []
-        for insp in inspections:
-            inspector = user_map.get(insp['inspected_by'])
-            enriched_inspections.append({
-                'date': insp['date'],
-                'uniform_type': insp['uniform_type'],
-                'total_score': insp['total_score'],
-                'max_score': insp.get('max_score', 100),
-                'criteria_scores': insp.get('criteria_scores', {}),
-                'inspector_name': f"{inspector['prenom']} {inspector['nom']}" if inspector else "Inconnu",
-                'commentaire': insp.get('commentaire', '')
-            })
-        
-        # Trier par date décroissante
-        enriched_inspections.sort(key=lambda x: x['date'], reverse=True)
-        
-        # Calculer les statistiques de présence
-        total_presences = len(presences)
-        presences_present = len([p for p in presences if p.get('status') == 'present'])
-        presences_absent = len([p for p in presences if p.get('status') == 'absent'])
-        presences_justified = len([p for p in presences if p.get('status') == 'justified_absent'])
-        presences_sick = len([p for p in presences if p.get('status') == 'sick'])
-        
-        presence_rate = (presences_present / total_presences * 100) if total_presences > 0 else 0
-        
-        # Calculer les statistiques d'inspection
-        inspection_avg = sum(i['total_score'] for i in enriched_inspections) / len(enriched_inspections) if enriched_inspections else 0
-        best_score = max((i['total_score'] for i in enriched_inspections), default=0)
-        worst_score = min((i['total_score'] for i in enriched_inspections), default=0)
-        
-        # Générer le PDF
-        pdf_buffer = await generate_cadet_individual_pdf(
-            cadet,
-            section_name,
-            enriched_inspections,
-            {
-                'total': total_presences,
-                'present': presences_present,
-                'absent': presences_absent,
-                'justified': presences_justified,
-                'sick': presences_sick,
-                'rate': presence_rate
-            },
-            {
-                'total': len(enriched_inspections),
-                'average': inspection_avg,
-                'best': best_score,
-                'worst': worst_score
-            }
-        )
-        
-        filename = f"rapport_{cadet['prenom']}_{cadet['nom']}_{datetime.now().strftime('%Y%m%d')}.pdf"
-        
-        return StreamingResponse(
-            pdf_buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        scope = await check_cadet_report_access(current_user, cadet_id)
+        artifact = await produce_report_cached("cadet", CadetReportRequest(cadet_id=cadet_id), scope)
+        return artifact.to_response()
     
     except HTTPException:
         raise
@@ -4872,9 +7202,596 @@ async def generate_cadet_individual_report(
         logger.error(f"Erreur génération rapport cadet: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la génération: {str(e)}")
 
+@api_router.post("/reports/cadets/bulk")
+async def generate_cadets_bulk_report(
+    request: CadetsBulkReportRequest,
+    current_user: User = Depends(require_inspection_permissions)
+):
+    """
+    Génère les rapports individuels de tous les cadets d'une section ou de l'escadron
+    Retourne une archive ZIP ou un PDF fusionné avec un signet par cadet
+    Pour les gros volumes, préférer POST /reports/jobs avec report_type="cadets-bulk"
+    """
+    try:
+        artifact = await produce_report_cached("cadets-bulk", request, REPORT_SCOPE_RESPONSIBLE)
+        return artifact.to_response()
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur génération rapports cadets: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la génération: {str(e)}")
+
+# ============================================================================
+# FILE DE TÂCHES DE RAPPORTS (RENDU ASYNCHRONE)
+# ============================================================================
+
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+REPORT_JOB_TTL_HOURS = int(os.environ.get('REPORT_JOB_TTL_HOURS', 24))
+REPORT_ARTIFACTS_DIR = Path(os.environ.get('REPORT_ARTIFACTS_DIR', ROOT_DIR / "report_artifacts"))
+REPORT_JOB_STALE_MINUTES = int(os.environ.get('REPORT_JOB_STALE_MINUTES', 15))
+
+REPORT_JOB_ACTIVE_STATUSES = ["queued", "running"]
+
+report_job_queue: Optional[asyncio.Queue] = None
+report_job_tasks: List[asyncio.Task] = []
+
+class ReportJobCreate(BaseModel):
+    report_type: str  # cadets-list, inspection-sheet, inspection-stats, cadet, cadets-bulk
+    params: Dict[str, Any] = {}
+
+def report_job_dedup_key(report_type: str, params: dict) -> str:
+    payload = json.dumps({"type": report_type, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def report_artifact_path(job_id: str) -> Path:
+    return REPORT_ARTIFACTS_DIR / f"{job_id}.bin"
+
+def serialize_report_job(job: dict) -> dict:
+    return {
+        "id": job["id"],
+        "report_type": job["report_type"],
+        "params": job["params"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "error": job.get("error"),
+        "filename": job.get("filename"),
+        "media_type": job.get("media_type"),
+        "size": job.get("size"),
+        "download_url": f"/api/reports/jobs/{job['id']}/download" if job["status"] == "done" else None
+    }
+
+async def process_report_job(job_id: str):
+    """Rendu d'une tâche: la réclamation atomique évite un double traitement entre workers"""
+    job = await db.report_jobs.find_one_and_update(
+        {"id": job_id, "status": "queued"},
+        {"$set": {"status": "running", "started_at": datetime.utcnow().isoformat()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if not job:
+        return
+    
+    model_cls, _ = REPORT_TYPES[job["report_type"]]
+    try:
+        artifact = await produce_report_cached(
+            job["report_type"],
+            model_cls(**job["params"]),
+            job.get("scope", REPORT_SCOPE_RESPONSIBLE)
+        )
+        size = artifact.size
+        await asyncio.to_thread(artifact.write_to, report_artifact_path(job_id))
+        
+        finished_at = datetime.utcnow()
+        await db.report_jobs.update_one(
+            {"id": job_id},
+            {"$set": {
+                "status": "done",
+                "active": False,
+                "finished_at": finished_at.isoformat(),
+                "filename": artifact.filename,
+                "media_type": artifact.media_type,
+                "size": size,
+                "expires_at": finished_at + timedelta(hours=REPORT_JOB_TTL_HOURS)
+            }}
+        )
+    except Exception as e:
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        if not isinstance(e, HTTPException):
+            logger.error(f"Erreur tâche de rapport {job_id}: {error}")
+        finished_at = datetime.utcnow()
+        await db.report_jobs.update_one(
+            {"id": job_id},
+            {"$set": {
+                "status": "failed",
+                "active": False,
+                "finished_at": finished_at.isoformat(),
+                "error": error,
+                "expires_at": finished_at + timedelta(hours=REPORT_JOB_TTL_HOURS)
+            }}
+        )
+
+async def report_job_worker():
+    while True:
+        job_id = await report_job_queue.get()
+        try:
+            await process_report_job(job_id)
+        except Exception as e:
+            logger.error(f"Erreur worker de rapports: {str(e)}")
+        finally:
+            report_job_queue.task_done()
+
+def purge_expired_report_artifacts() -> int:
+    """Supprime les fichiers plus anciens que la durée de conservation"""
+    cutoff = time.time() - REPORT_JOB_TTL_HOURS * 3600
+    removed = 0
+    for path in REPORT_ARTIFACTS_DIR.glob("*.bin"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+async def report_artifacts_cleanup_loop():
+    while True:
+        try:
+            await asyncio.to_thread(purge_expired_report_artifacts)
+        except Exception as e:
+            logger.warning(f"Nettoyage des rapports impossible: {e}")
+        await asyncio.sleep(3600)
+
+async def start_report_job_workers():
+    global report_job_queue
+    REPORT_ARTIFACTS_DIR.mkdir(parents=True, exist_ok=True)
+    report_job_queue = asyncio.Queue()
+    
+    # Reprendre les tâches interrompues par un redémarrage (sans toucher à celles
+    # qu'un autre worker est encore en train de rendre)
+    stale_before = (datetime.utcnow() - timedelta(minutes=REPORT_JOB_STALE_MINUTES)).isoformat()
+    await db.report_jobs.update_many(
+        {"status": "running", "started_at": {"$lt": stale_before}},
+        {"$set": {"status": "queued"}}
+    )
+    async for job in db.report_jobs.find({"status": "queued"}, {"id": 1}):
+        report_job_queue.put_nowait(job["id"])
+    
+    for _ in range(REPORT_JOB_WORKERS):
+        report_job_tasks.append(asyncio.create_task(report_job_worker()))
+    report_job_tasks.append(asyncio.create_task(report_artifacts_cleanup_loop()))
+
+def stop_report_job_workers():
+    for task in report_job_tasks:
+        task.cancel()
+    report_job_tasks.clear()
+
+async def get_accessible_report_job(job_id: str, current_user: User) -> dict:
+    job = await db.report_jobs.find_one({"id": job_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Tâche de rapport non trouvée")
+    
+    if current_user.id not in job.get("requested_by", []) and \
+            current_user.role not in [UserRole.CADET_ADMIN, UserRole.ENCADREMENT]:
+        raise HTTPException(status_code=403, detail="Accès refusé à cette tâche de rapport")
+    return job
+
+class RangeNotSatisfiable(Exception):
+    """Plage valide mais hors du fichier (réponse 416)"""
+
+def parse_range_header(range_header: str, size: int):
+    """
+    Analyse un en-tête Range "bytes=début-fin" (une seule plage)
+    Retourne None si l'en-tête est invalide ou non pris en charge (à ignorer: réponse 200
+    complète, RFC 9110) et lève RangeNotSatisfiable si la plage ne recoupe pas le fichier
+    """
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else size - 1
+        if match.group(2) and end < start:
+            return None
+        if start >= size:
+            raise RangeNotSatisfiable()
+    else:
+        # Suffixe: les N derniers octets
+        suffix_length = int(match.group(2))
+        if suffix_length == 0 or size == 0:
+            raise RangeNotSatisfiable()
+        start = max(0, size - suffix_length)
+        end = size - 1
+    
+    return start, min(end, size - 1)
+
+def iter_file_range(path: Path, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(REPORT_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@api_router.post("/reports/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_report_job(
+    job_data: ReportJobCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Met un rapport en file d'attente et retourne immédiatement l'identifiant de la tâche
+    Une tâche identique déjà en attente ou en cours est réutilisée
+    """
+    if job_data.report_type not in REPORT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Type de rapport inconnu: {job_data.report_type}")
+    
+    model_cls, _ = REPORT_TYPES[job_data.report_type]
+    try:
+        request_model = model_cls(**job_data.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Paramètres invalides: {str(e)}")
+    
+    if job_data.report_type == "cadet":
+        scope = await check_cadet_report_access(current_user, request_model.cadet_id)
+    else:
+        await require_inspection_permissions(current_user)
+        scope = REPORT_SCOPE_RESPONSIBLE
+    
+    # Paramètres normalisés (valeurs par défaut, dates ISO)
+    params = json.loads(request_model.json())
+    dedup_key = report_job_dedup_key(job_data.report_type, params)
+    
+    now = datetime.utcnow()
+    job_id = str(uuid.uuid4())
+    # Upsert sur la tâche active de même clé: l'index unique partiel (active=True)
+    # garantit qu'au plus une tâche identique est en attente ou en cours
+    for attempt in range(2):
+        try:
+            job = await db.report_jobs.find_one_and_update(
+                {"dedup_key": dedup_key, "active": True},
+                {
+                    "$addToSet": {"requested_by": current_user.id},
+                    "$setOnInsert": {
+                        "id": job_id,
+                        "report_type": job_data.report_type,
+                        "params": params,
+                        "status": "queued",
+                        "scope": scope,
+                        "created_at": now.isoformat()
+                        # Pas d'expires_at tant que la tâche est active: l'index TTL ne
+                        # doit pas supprimer une tâche en attente ou en cours de rendu
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            break
+        except DuplicateKeyError:
+            # Une requête concurrente a créé la tâche entre-temps: la réutiliser
+            if attempt:
+                raise
+    
+    deduplicated = job["id"] != job_id
+    if not deduplicated:
+        report_job_queue.put_nowait(job_id)
+    
+    return {**serialize_report_job(job), "deduplicated": deduplicated}
+
+@api_router.get("/reports/jobs/{job_id}")
+async def get_report_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Statut d'une tâche de rapport"""
+    job = await get_accessible_report_job(job_id, current_user)
+    return serialize_report_job(job)
+
+@api_router.get("/reports/jobs/{job_id}/download")
+async def download_report_job(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Télécharge le rapport généré
+    Supporte les requêtes partielles (Range) pour reprendre un téléchargement interrompu
+    """
+    job = await get_accessible_report_job(job_id, current_user)
+    
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="Le rapport n'est pas encore disponible")
+    
+    path = report_artifact_path(job_id)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail="Le rapport a expiré")
+    
+    size = path.stat().st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"attachment; filename={job['filename']}",
+        "ETag": f'"{job_id}"'
+    }
+    
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", headers["ETag"]) == headers["ETag"]:
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+    else:
+        byte_range = None
+    
+    if byte_range is not None:
+        start, end = byte_range
+        length = end - start + 1
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(length)
+        return StreamingResponse(
+            iter_file_range(path, start, length),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=job["media_type"],
+            headers=headers
+        )
+    
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(
+        iter_file_range(path, 0, size),
+        media_type=job["media_type"],
+        headers=headers
+    )
+
 # ============================================================================
 # FIN SYSTÈME DE RAPPORTS
 
+# ============================================================================
+# PROFILAGE À LA DEMANDE (ADMINISTRATEURS)
+# ============================================================================
+
+# Une requête est profilée (cProfile) si un administrateur envoie l'en-tête X-Profile: 1
+# ou si sa route a été activée via /admin/profiling/routes. Le profil pstats est écrit
+# sur disque et consultable via /admin/profiles.
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', ROOT_DIR / "profiles"))
+PROFILE_TTL_HOURS = int(os.environ.get('PROFILE_TTL_HOURS', 72))
+PROFILE_ROUTES_CHECK_INTERVAL = float(os.environ.get('PROFILE_ROUTES_CHECK_INTERVAL', 5))
+PROFILE_REPORT_LINES = 60
+
+# cProfile n'accepte qu'un profileur actif par thread: une seule requête profilée à la fois
+profiling_lock = asyncio.Lock()
+# (version, vérifiée à, {"GET /api/..."})
+profiled_routes_snapshot = (None, 0.0, frozenset())
+
+class ProfilingRouteToggle(BaseModel):
+    method: str
+    path: str  # Gabarit de la route, ex: /api/reports/inspection-stats
+    enabled: bool = True
+
+def profile_path(profile_id: str) -> Path:
+    return PROFILE_DIR / f"{profile_id}.prof"
+
+def find_route_template(scope) -> Optional[str]:
+    """Retrouve "MÉTHODE gabarit" de la route correspondant à la requête"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {getattr(route, 'path_format', route.path)}"
+    return None
+
+async def get_profiled_routes() -> frozenset:
+    """Routes activées, relues quand leur version change (au plus toutes les quelques secondes)"""
+    global profiled_routes_snapshot
+    version, checked_at, routes = profiled_routes_snapshot
+    if time.monotonic() - checked_at < PROFILE_ROUTES_CHECK_INTERVAL:
+        return routes
+    
+    current_version = (await get_data_versions("profiling_routes"))["profiling_routes"]
+    if current_version != version:
+        docs = await db.profiling_routes.find({}, {"_id": 0, "route": 1}).to_list(None)
+        routes = frozenset(doc["route"] for doc in docs)
+    profiled_routes_snapshot = (current_version, time.monotonic(), routes)
+    return routes
+
+async def get_profiling_admin_id(scope) -> Optional[str]:
+    """ID de l'administrateur authentifié par l'en-tête Authorization, sinon None"""
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(authorization[7:], SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    user = await db.users.find_one({"id": payload.get("sub")}, {"_id": 0, "id": 1, "role": 1})
+    if not user or user.get("role") not in [UserRole.CADET_ADMIN.value, UserRole.ENCADREMENT.value]:
+        return None
+    return user["id"]
+
+def purge_expired_profiles() -> int:
+    """Supprime les profils plus anciens que la durée de conservation"""
+    cutoff = time.time() - PROFILE_TTL_HOURS * 3600
+    removed = 0
+    for path in PROFILE_DIR.glob("*.prof"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def save_profile(profiler: cProfile.Profile, profile_id: str) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(str(profile_path(profile_id)))
+    purge_expired_profiles()
+
+class ProfilingMiddleware:
+    """
+    Exécute la requête sous cProfile quand elle est demandée
+    Le profileur couvre le thread de la boucle d'événements: les autres tâches
+    exécutées pendant la requête peuvent apparaître dans le profil
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        
+        trigger = None
+        requested_by = None
+        if dict(scope["headers"]).get(b"x-profile", b"") not in (b"", b"0"):
+            requested_by = await get_profiling_admin_id(scope)
+            if requested_by:
+                trigger = "header"
+        if trigger is None:
+            routes = await get_profiled_routes()
+            if routes and find_route_template(scope) in routes:
+                trigger = "route"
+        
+        if trigger is None or profiling_lock.locked():
+            await self.app(scope, receive, send)
+            return
+        
+        async with profiling_lock:
+            profile_id = str(uuid.uuid4())
+            status_code = 500
+            
+            async def profiled_send(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    message = {**message, "headers": list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode())
+                    ]}
+                await send(message)
+            
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, profiled_send)
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - started
+                try:
+                    await asyncio.to_thread(save_profile, profiler, profile_id)
+                    route = scope.get("route")
+                    await db.request_profiles.insert_one({
+                        "id": profile_id,
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": getattr(route, "path_format", None),
+                        "status_code": status_code,
+                        "duration_ms": round(duration * 1000, 1),
+                        "trigger": trigger,
+                        "requested_by": requested_by,
+                        "created_at": datetime.utcnow().isoformat(),
+                        "expires_at": datetime.utcnow() + timedelta(hours=PROFILE_TTL_HOURS)
+                    })
+                except Exception as e:
+                    logger.warning(f"Enregistrement du profil {profile_id} impossible: {e}")
+
+@api_router.get("/admin/profiling/routes")
+async def get_profiling_routes(current_user: User = Depends(require_admin_or_encadrement)):
+    """Routes profilées pour toutes les requêtes"""
+    return await db.profiling_routes.find({}, {"_id": 0}).to_list(None)
+
+@api_router.put("/admin/profiling/routes")
+async def set_profiling_route(
+    toggle: ProfilingRouteToggle,
+    current_user: User = Depends(require_admin_or_encadrement)
+):
+    """Active ou désactive le profilage d'une route (tous les workers, en quelques secondes)"""
+    method = toggle.method.upper()
+    known_routes = {
+        f"{route_method} {route.path_format}"
+        for route in app.router.routes if hasattr(route, "path_format")
+        for route_method in getattr(route, "methods", None) or []
+    }
+    route_key = f"{method} {toggle.path}"
+    if route_key not in known_routes:
+        raise HTTPException(status_code=404, detail=f"Route inconnue: {route_key}")
+    
+    if toggle.enabled:
+        await db.profiling_routes.update_one(
+            {"route": route_key},
+            {"$set": {
+                "route": route_key,
+                "enabled_by": current_user.id,
+                "enabled_at": datetime.utcnow().isoformat()
+            }},
+            upsert=True
+        )
+    else:
+        await db.profiling_routes.delete_one({"route": route_key})
+    await bump_data_version("profiling_routes")
+    
+    return {"route": route_key, "enabled": toggle.enabled}
+
+@api_router.get("/admin/profiles")
+async def get_request_profiles(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(require_admin_or_encadrement)
+):
+    """Profils enregistrés, les plus récents d'abord"""
+    return await db.request_profiles.find(
+        {}, {"_id": 0, "expires_at": 0}
+    ).sort("created_at", -1).to_list(limit)
+
+async def get_request_profile_file(profile_id: str) -> Path:
+    profile = await db.request_profiles.find_one({"id": profile_id}, {"_id": 0, "id": 1})
+    path = profile_path(profile_id)
+    if not profile or not path.exists():
+        raise HTTPException(status_code=404, detail="Profil non trouvé ou expiré")
+    return path
+
+def format_profile_report(path: Path, sort: str) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(str(path), stream=stream)
+    stats.sort_stats(sort).print_stats(PROFILE_REPORT_LINES)
+    return stream.getvalue()
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def get_request_profile_report(
+    profile_id: str,
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    current_user: User = Depends(require_admin_or_encadrement)
+):
+    """Résumé texte du profil (fonctions les plus coûteuses)"""
+    path = await get_request_profile_file(profile_id)
+    report = await asyncio.to_thread(format_profile_report, path, sort)
+    return Response(content=report, media_type="text/plain; charset=utf-8")
+
+@api_router.get("/admin/profiles/{profile_id}/download")
+async def download_request_profile(
+    profile_id: str,
+    current_user: User = Depends(require_admin_or_encadrement)
+):
+    """Fichier pstats brut (à ouvrir avec snakeviz, pstats ou gprof2dot)"""
+    path = await get_request_profile_file(profile_id)
+    content = await asyncio.to_thread(path.read_bytes)
+    return Response(
+        content=content,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+    )
+
+@api_router.get("/metrics")
+async def get_metrics(current_user: User = Depends(require_admin_or_encadrement)):
+    """Métriques du processus au format texte Prometheus (administrateurs seulement)"""
+    return Response(
+        content=render_metrics(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 # Include router
 app.include_router(api_router)
 
@@ -4887,6 +7804,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comptage des requêtes MongoDB par requête HTTP
+if QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware)
+
+# Profilage à la demande (autour du comptage MongoDB: ses propres lectures n'y figurent pas)
+app.add_middleware(ProfilingMiddleware)
+
+# Métriques: ajouté en dernier pour englober toute la pile (CORS compris)
+app.add_middleware(MetricsMiddleware)
+
 # ============================================================================
 
 # Configure logging
@@ -4896,6 +7823,122 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def backfill_name_keys(recompute: bool = False) -> int:
+    """
+    Ajoute name_key et nom_key aux utilisateurs qui n'en ont pas (insérés par d'anciens scripts)
+    recompute=True vérifie tous les utilisateurs et corrige aussi les clés périmées
+    """
+    query = {} if recompute else {"$or": [{"name_key": {"$exists": False}}, {"nom_key": {"$exists": False}}]}
+    users = await db.users.find(
+        query,
+        {"_id": 1, "prenom": 1, "nom": 1, "name_key": 1, "nom_key": 1}
+    ).to_list(None)
+    
+    operations = []
+    for user in users:
+        keys = make_name_keys(user.get("prenom"), user.get("nom"))
+        if any(user.get(field) != value for field, value in keys.items()):
+            operations.append(UpdateOne({"_id": user["_id"]}, {"$set": keys}))
+    
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+        await bump_data_version("users")
+    return len(operations)
+
+async def run_index_step(label: str, operation):
+    """Exécute une étape d'ensure_indexes: un échec est journalisé sans bloquer les suivantes"""
+    try:
+        return await operation
+    except Exception as e:
+        logger.warning(f"Création des index: échec de {label}: {e}")
+        return None
+
+async def drop_legacy_report_job_index():
+    # Ancien index de déduplication, remplacé par dedup_key_active_unique
+    if "dedup_key_1_status_1" in await db.report_jobs.index_information():
+        await db.report_jobs.drop_index("dedup_key_1_status_1")
+
+async def ensure_indexes():
+    """
+    Crée les index utilisés par les requêtes fréquentes
+    Chaque étape est indépendante: un index impossible à créer (ex. doublons d'id
+    dans d'anciennes données) n'empêche pas la création des suivants
+    """
+    # Base injoignable: inutile d'attendre le délai de sélection du serveur à chaque étape
+    try:
+        await db.command("ping")
+    except Exception as e:
+        logger.warning(f"Création des index impossible: {e}")
+        return
+    
+    await run_index_step("uniform_schedules.date", db.uniform_schedules.create_index("date"))
+    await run_index_step("import_batches.id", db.import_batches.create_index("id", unique=True))
+    
+    backfilled = await run_index_step("rattrapage des clés de nom", backfill_name_keys())
+    if backfilled:
+        logger.info(f"Clés de nom ajoutées à {backfilled} utilisateurs")
+    await run_index_step("users.name_key", db.users.create_index("name_key"))
+    await run_index_step("users.nom_key", db.users.create_index("nom_key"))
+    await run_index_step("users.username", db.users.create_index("username"))
+    await run_index_step("users.id", db.users.create_index("id", unique=True))
+    
+    await run_index_step(
+        "activities.cadet_ids/active",
+        db.activities.create_index([("cadet_ids", 1), ("active", 1)])
+    )
+    await run_index_step("import_sessions.token", db.import_sessions.create_index("token", unique=True))
+    await run_index_step(
+        "import_sessions.expires_at (TTL)",
+        db.import_sessions.create_index("expires_at", expireAfterSeconds=0)
+    )
+    
+    await run_index_step("report_jobs.id", db.report_jobs.create_index("id", unique=True))
+    # Anciennes tâches actives créées avant le drapeau "active"
+    await run_index_step("rattrapage de report_jobs.active", db.report_jobs.update_many(
+        {"status": {"$in": REPORT_JOB_ACTIVE_STATUSES}, "active": {"$exists": False}},
+        {"$set": {"active": True}}
+    ))
+    # L'échéance n'est fixée qu'à la fin du rendu (anciennes tâches: fixée à la création)
+    await run_index_step("retrait de report_jobs.expires_at des tâches actives", db.report_jobs.update_many(
+        {"active": True, "expires_at": {"$exists": True}},
+        {"$unset": {"expires_at": ""}}
+    ))
+    await run_index_step("suppression de report_jobs.dedup_key_1_status_1", drop_legacy_report_job_index())
+    await run_index_step("report_jobs.dedup_key_active_unique", db.report_jobs.create_index(
+        "dedup_key",
+        unique=True,
+        partialFilterExpression={"active": True},
+        name="dedup_key_active_unique"
+    ))
+    await run_index_step(
+        "report_jobs.expires_at (TTL)",
+        db.report_jobs.create_index("expires_at", expireAfterSeconds=0)
+    )
+    
+    await run_index_step("request_profiles.id", db.request_profiles.create_index("id", unique=True))
+    await run_index_step(
+        "request_profiles.expires_at (TTL)",
+        db.request_profiles.create_index("expires_at", expireAfterSeconds=0)
+    )
+
+@app.on_event("startup")
+async def create_indexes():
+    await ensure_indexes()
+
+@app.on_event("startup")
+async def load_settings_cache():
+    try:
+        await reload_settings_snapshot()
+    except Exception as e:
+        # Le cache sera chargé à la première requête
+        logger.warning(f"Chargement initial des paramètres impossible: {e}")
+
+@app.on_event("startup")
+async def start_report_jobs():
+    await start_report_job_workers()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    stop_report_job_workers()
+    shutdown_report_render_executor()
     client.close()
\ No newline at end of file
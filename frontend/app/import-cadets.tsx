@@ -23,6 +23,7 @@ interface User {
 }
 
 interface PreviewData {
+  import_token?: string;
   total_rows: number;
   new_cadets: any[];
   updated_cadets: any[];
@@ -191,8 +192,9 @@ export default function ImportCadets() {
     try {
       const token = await AsyncStorage.getItem('access_token');
       
-      // Préparer les changements
-      const changes = [
+      // Le plan est conservé côté serveur: seul le jeton est envoyé.
+      // Les changements complets ne servent qu'en repli (ancien serveur).
+      const changes = previewData.import_token ? [] : [
         ...previewData.new_cadets.map(c => ({
           type: 'new',
           nom: c.nom,
@@ -209,7 +211,7 @@ export default function ImportCadets() {
         }))
       ];
 
-      console.log('Envoi de', changes.length, 'changements au backend');
+      console.log(previewData.import_token ? 'Envoi du jeton d\'import au backend' : `Envoi de ${changes.length} changements au backend`);
 
       const response = await fetch(`${EXPO_PUBLIC_BACKEND_URL}/api/import/cadets/confirm`, {
                 method: 'POST',
@@ -217,10 +219,11 @@ export default function ImportCadets() {
                   'Content-Type': 'application/json',
                   'Authorization': `Bearer ${token}`,
                 },
-                body: JSON.stringify({
-                  changes: changes,
-                  create_sections: true
-                }),
+                body: JSON.stringify(
+                  previewData.import_token
+                    ? { import_token: previewData.import_token, excluded_rows: [], create_sections: true }
+                    : { changes: changes, create_sections: true }
+                ),
               });
 
               if (response.ok) {